@@ -0,0 +1,199 @@
+"""Benchmark HTTP/2 (via httpx) against HTTP/1.1 (via aiohttp) for many controllers.
+
+Every remote controller is reached through the same cloud host, so polling many of
+them at once over HTTP/1.1 requires many parallel TCP+TLS connections to one origin;
+HTTP/2 multiplexes them over a few. This spins up two local TLS servers that mimic the
+cloud's apiVer endpoint (one speaking HTTP/1.1, one speaking HTTP/2) and, for several
+rounds, polls NUM_CONTROLLERS controllers concurrently, measuring requests/sec and the
+number of connections each server accepted.
+
+This requires httpx with its http2 extra: pip install 'httpx[http2]'
+
+Usage: python examples/benchmark_http2.py [NUM_CONTROLLERS] [NUM_ROUNDS]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import ssl
+import sys
+import time
+
+from aiohttp import web
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import ConnectionTerminated, RequestReceived
+import httpx
+
+from regenmaschine import Client
+from regenmaschine.transport import AiohttpTransport, HTTPXTransport, Transport
+
+DEFAULT_NUM_CONTROLLERS = 200
+DEFAULT_NUM_ROUNDS = 5
+
+# The simulated time the cloud takes to respond to a request (in seconds):
+SERVER_LATENCY = 0.02
+
+API_VERSION = json.dumps({"apiVer": "4.5.0", "hwVer": 3, "swVer": "4.0.925"}).encode()
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+
+def create_server_ssl_context(alpn_protocol: str) -> ssl.SSLContext:
+    """Create an SSL context for a local server (with a self-signed certificate)."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(
+        os.path.join(FIXTURES_PATH, "tls_cert.pem"),
+        os.path.join(FIXTURES_PATH, "tls_key.pem"),
+    )
+    context.set_alpn_protocols([alpn_protocol])
+    return context
+
+
+class H2Protocol(asyncio.Protocol):
+    """Define a minimal HTTP/2 server that answers every request with apiVer data."""
+
+    def __init__(self, connections: set) -> None:
+        """Initialize."""
+        self._conn = H2Connection(H2Configuration(client_side=False))
+        self._connections = connections
+        self._tasks: set[asyncio.Task] = set()
+        self._transport: asyncio.Transport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Start the HTTP/2 connection."""
+        assert isinstance(transport, asyncio.Transport)
+        self._connections.add(transport.get_extra_info("peername"))
+        self._transport = transport
+        self._conn.initiate_connection()
+        transport.write(self._conn.data_to_send())
+
+    def data_received(self, data: bytes) -> None:
+        """Handle incoming frames."""
+        assert self._transport is not None
+        for event in self._conn.receive_data(data):
+            if isinstance(event, RequestReceived):
+                task = asyncio.create_task(self._respond(event.stream_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            elif isinstance(event, ConnectionTerminated):
+                self._transport.close()
+        self._transport.write(self._conn.data_to_send())
+
+    async def _respond(self, stream_id: int) -> None:
+        """Respond to a request (after the simulated latency)."""
+        await asyncio.sleep(SERVER_LATENCY)
+        assert self._transport is not None
+        if self._transport.is_closing():
+            return
+        self._conn.send_headers(
+            stream_id,
+            [
+                (":status", "200"),
+                ("content-type", "application/json"),
+                ("content-length", str(len(API_VERSION))),
+            ],
+        )
+        self._conn.send_data(stream_id, API_VERSION, end_stream=True)
+        self._transport.write(self._conn.data_to_send())
+
+
+async def start_http1_server(connections: set) -> tuple[web.AppRunner, int]:
+    """Start a local HTTP/1.1 server (returning its runner and port)."""
+
+    async def api_version(request: web.Request) -> web.Response:
+        """Return a canned apiVer response (after the simulated latency)."""
+        assert request.transport is not None
+        connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(SERVER_LATENCY)
+        return web.Response(body=API_VERSION, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/{sprinkler_id}/api/4/apiVer", api_version)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(
+        runner, "127.0.0.1", 0, ssl_context=create_server_ssl_context("http/1.1")
+    )
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]  # type: ignore
+
+
+async def run_client(
+    transport: Transport, port: int, num_controllers: int, num_rounds: int
+) -> float:
+    """Return the requests/sec achieved by polling every controller each round."""
+    urls = [
+        f"https://127.0.0.1:{port}/{sprinkler_id}/api/4/apiVer"
+        for sprinkler_id in range(num_controllers)
+    ]
+    async with Client(transport=transport) as client:
+        start = time.perf_counter()
+        for _ in range(num_rounds):
+            await asyncio.gather(
+                *(
+                    client._request("get", url)  # pylint: disable=protected-access
+                    for url in urls
+                )
+            )
+        return num_controllers * num_rounds / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    """Run."""
+    num_controllers = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_CONTROLLERS
+    num_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_NUM_ROUNDS
+
+    http1_connections: set = set()
+    runner, http1_port = await start_http1_server(http1_connections)
+
+    http2_connections: set = set()
+    server = await asyncio.get_running_loop().create_server(
+        lambda: H2Protocol(http2_connections),
+        "127.0.0.1",
+        0,
+        ssl=create_server_ssl_context("h2"),
+    )
+    http2_port = server.sockets[0].getsockname()[1]
+
+    # The local servers use a self-signed certificate:
+    client_ssl_context = ssl.create_default_context()
+    client_ssl_context.check_hostname = False
+    client_ssl_context.verify_mode = ssl.CERT_NONE
+
+    try:
+        http1_rate = await run_client(
+            AiohttpTransport(ssl_context=client_ssl_context),
+            http1_port,
+            num_controllers,
+            num_rounds,
+        )
+        async with httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=4),
+            timeout=None,
+            verify=client_ssl_context,
+        ) as httpx_client:
+            http2_rate = await run_client(
+                HTTPXTransport(httpx_client),
+                http2_port,
+                num_controllers,
+                num_rounds,
+            )
+    finally:
+        server.close()
+        await runner.cleanup()
+
+    print(f"Polling {num_controllers} controllers x {num_rounds} rounds:")
+    print(
+        f"HTTP/1.1 (aiohttp): {http1_rate:8.1f} requests/sec over "
+        f"{len(http1_connections)} connections"
+    )
+    print(
+        f"HTTP/2 (httpx):     {http2_rate:8.1f} requests/sec over "
+        f"{len(http2_connections)} connections"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
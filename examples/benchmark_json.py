@@ -0,0 +1,65 @@
+"""Benchmark the available JSON codecs on typical (large) responses.
+
+This measures how many times per second each codec can decode (and encode) the test
+fixtures for some of the largest responses controllers send.
+
+Usage: python examples/benchmark_json.py [NUM_ITERATIONS]
+"""
+import os
+import sys
+import time
+
+from regenmaschine.codec import JSONCodec, OrjsonJSONCodec, StdlibJSONCodec
+
+DEFAULT_NUM_ITERATIONS = 2000
+
+FIXTURES = (
+    "dailystats_details_response.json",
+    "watering_log_response.json",
+    "zone_properties_response.json",
+)
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+
+def run_codec(codec: JSONCodec, bodies: list, num_iterations: int) -> tuple:
+    """Return the decodes/sec and encodes/sec achieved by a codec."""
+    start = time.perf_counter()
+    for _ in range(num_iterations):
+        for body in bodies:
+            codec.loads(body)
+    decode_rate = num_iterations * len(bodies) / (time.perf_counter() - start)
+
+    data = [codec.loads(body) for body in bodies]
+    start = time.perf_counter()
+    for _ in range(num_iterations):
+        for item in data:
+            codec.dumps(item)
+    encode_rate = num_iterations * len(bodies) / (time.perf_counter() - start)
+
+    return decode_rate, encode_rate
+
+
+def main() -> None:
+    """Run."""
+    num_iterations = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_ITERATIONS
+
+    bodies = []
+    for fixture in FIXTURES:
+        with open(os.path.join(FIXTURES_PATH, fixture), "rb") as fptr:
+            bodies.append(fptr.read())
+
+    codecs: list = [("stdlib json", StdlibJSONCodec())]
+    try:
+        codecs.append(("orjson", OrjsonJSONCodec()))
+    except RuntimeError:
+        print("orjson isn't installed; skipping it")
+
+    for name, codec in codecs:
+        decode_rate, encode_rate = run_codec(codec, bodies, num_iterations)
+        print(
+            f"{name:12} {decode_rate:10.1f} decodes/sec {encode_rate:10.1f} encodes/sec"
+        )
+
+
+if __name__ == "__main__":
+    main()
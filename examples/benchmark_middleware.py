@@ -0,0 +1,82 @@
+"""Benchmark the cost of the middleware chain.
+
+To isolate the library's own overhead, the end of the chain (the network call) is
+replaced with a stub that returns a canned response immediately. This measures
+requests/sec for:
+
+    1. The stub on its own (i.e., no request path at all).
+    2. A client without any middlewares (only the built-in ones).
+    3. A client with several no-op middlewares.
+
+Usage: python examples/benchmark_middleware.py [NUM_REQUESTS] [NUM_MIDDLEWARES]
+"""
+import asyncio
+import sys
+import time
+
+from regenmaschine import Client
+from regenmaschine.middleware import Handler, Request, Response
+
+DEFAULT_NUM_MIDDLEWARES = 5
+DEFAULT_NUM_REQUESTS = 100000
+
+URL = "https://192.168.1.100:8080/api/4/apiVer"
+
+
+async def send(request: Request) -> Response:
+    """Return a canned apiVer response."""
+    return Response(200, request.url, {"apiVer": "4.5.0", "hwVer": 3})
+
+
+async def noop(request: Request, handler: Handler) -> Response:
+    """Pass a request through unchanged."""
+    return await handler(request)
+
+
+def create_client(num_middlewares: int) -> Client:
+    """Create a client whose requests end at the stub."""
+    client = Client(middlewares=[noop] * num_middlewares)
+    client._send = send  # type: ignore  # pylint: disable=protected-access
+    client._handler = client._compose_handler()  # pylint: disable=protected-access
+    return client
+
+
+async def run_stub(num_requests: int) -> float:
+    """Return the requests/sec achieved by calling the stub directly."""
+    request = Request("get", URL, "192.168.1.100", {})
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        await send(request)
+    return num_requests / (time.perf_counter() - start)
+
+
+async def run_client(client: Client, num_requests: int) -> float:
+    """Return the requests/sec achieved through a client's request path."""
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        await client._request(  # pylint: disable=protected-access
+            "get", URL, access_token="token"
+        )
+    return num_requests / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    """Run."""
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_REQUESTS
+    num_middlewares = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_NUM_MIDDLEWARES
+
+    stub = await run_stub(num_requests)
+    bare = await run_client(create_client(0), num_requests)
+    chained = await run_client(create_client(num_middlewares), num_requests)
+
+    print(f"Stub only:                {stub:10.1f} requests/sec")
+    print(f"No middlewares:           {bare:10.1f} requests/sec")
+    print(f"{num_middlewares} no-op middlewares:     {chained:10.1f} requests/sec")
+    print(
+        "Overhead per middleware:  "
+        f"{(1 / chained - 1 / bare) / max(num_middlewares, 1) * 1e6:10.2f} µs"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
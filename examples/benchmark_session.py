@@ -0,0 +1,73 @@
+"""Benchmark an owned, pooled session against a session per request.
+
+This spins up a local aiohttp server that mimics a RainMachine endpoint and measures
+requests/sec for:
+
+    1. A client that lazily creates (and reuses) a single owned session.
+    2. The previous behavior: a brand new session (and connection) per request.
+
+Usage: python examples/benchmark_session.py [NUM_REQUESTS]
+"""
+import asyncio
+import sys
+import time
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+from regenmaschine import Client
+
+DEFAULT_NUM_REQUESTS = 500
+
+
+async def api_version(_: web.Request) -> web.Response:
+    """Return a canned apiVer response."""
+    return web.json_response({"apiVer": "4.5.0", "hwVer": 3, "swVer": "4.0.925"})
+
+
+async def run_owned_session(url: str, num_requests: int) -> float:
+    """Return the requests/sec achieved with a client-owned session."""
+    async with Client() as client:
+        start = time.perf_counter()
+        for _ in range(num_requests):
+            await client._request(  # pylint: disable=protected-access
+                "get", url, use_ssl=False
+            )
+        return num_requests / (time.perf_counter() - start)
+
+
+async def run_session_per_request(url: str, num_requests: int) -> float:
+    """Return the requests/sec achieved with a new session for every request."""
+    start = time.perf_counter()
+    for _ in range(num_requests):
+        async with ClientSession(timeout=ClientTimeout(total=30)) as session:
+            async with session.get(url) as resp:
+                await resp.json(content_type=None)
+    return num_requests / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    """Run."""
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_REQUESTS
+
+    app = web.Application()
+    app.router.add_get("/api/4/apiVer", api_version)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    url = f"http://127.0.0.1:{port}/api/4/apiVer"
+
+    try:
+        per_request = await run_session_per_request(url, num_requests)
+        owned = await run_owned_session(url, num_requests)
+    finally:
+        await runner.cleanup()
+
+    print(f"Session per request: {per_request:8.1f} requests/sec")
+    print(f"Owned session:       {owned:8.1f} requests/sec")
+    print(f"Speedup:             {owned / per_request:8.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
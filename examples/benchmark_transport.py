@@ -0,0 +1,81 @@
+"""Benchmark the library's own overhead against the cost of the network.
+
+This measures requests/sec for the same request sent through:
+
+    1. The aiohttp transport, to a local aiohttp server that mimics a RainMachine
+       endpoint.
+    2. The in-memory transport, which routes the request straight to a Python handler
+       (i.e., everything except the network).
+
+Usage: python examples/benchmark_transport.py [NUM_REQUESTS]
+"""
+import asyncio
+import sys
+import time
+
+from aiohttp import web
+
+from regenmaschine import Client
+from regenmaschine.middleware import Request
+from regenmaschine.transport import InMemoryTransport
+
+DEFAULT_NUM_REQUESTS = 1000
+
+API_VERSION = {"apiVer": "4.5.0", "hwVer": 3, "swVer": "4.0.925"}
+
+
+async def api_version(_: web.Request) -> web.Response:
+    """Return a canned apiVer response."""
+    return web.json_response(API_VERSION)
+
+
+async def run_client(client: Client, url: str, num_requests: int) -> float:
+    """Return the requests/sec achieved by a client."""
+    async with client:
+        start = time.perf_counter()
+        for _ in range(num_requests):
+            await client._request(  # pylint: disable=protected-access
+                "get", url, use_ssl=False
+            )
+        return num_requests / (time.perf_counter() - start)
+
+
+def in_memory_api_version(_: Request) -> dict:
+    """Return canned apiVer data."""
+    return API_VERSION
+
+
+async def main() -> None:
+    """Run."""
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_REQUESTS
+
+    app = web.Application()
+    app.router.add_get("/api/4/apiVer", api_version)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    url = f"http://127.0.0.1:{port}/api/4/apiVer"
+
+    transport = InMemoryTransport()
+    transport.add_route("get", "/api/4/apiVer", in_memory_api_version)
+
+    try:
+        aiohttp_rate = await run_client(Client(), url, num_requests)
+        in_memory_rate = await run_client(
+            Client(transport=transport), url, num_requests
+        )
+    finally:
+        await runner.cleanup()
+
+    print(f"aiohttp transport:   {aiohttp_rate:10.1f} requests/sec")
+    print(f"In-memory transport: {in_memory_rate:10.1f} requests/sec")
+    print(
+        "Network share:       "
+        f"{1 - (1 / in_memory_rate) / (1 / aiohttp_rate):10.1%} of each request"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
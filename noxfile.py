@@ -34,6 +34,8 @@ def coverage(session: nox.sessions.Session) -> None:
     install_with_constraints(
         session,
         "aresponses",
+        "httpx[http2]",
+        "orjson",
         "pytest",
         "pytest-aiohttp",
         "pytest-cov",
@@ -48,6 +50,12 @@ def tests(session: nox.sessions.Session) -> None:
     args = session.posargs or ["-s", "tests/"]
     session.run("poetry", "install", "--no-dev", external=True)
     install_with_constraints(
-        session, "aresponses", "pytest", "pytest-aiohttp", "typing-extensions"
+        session,
+        "aresponses",
+        "httpx[http2]",
+        "orjson",
+        "pytest",
+        "pytest-aiohttp",
+        "typing-extensions",
     )
     session.run("pytest", *args)
@@ -0,0 +1,520 @@
+"""Define a response cache for controllers."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+import datetime
+from fnmatch import fnmatchcase
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES: int = 256
+
+# The number of seconds that SQLite writes are batched for (when in an event loop):
+DEFAULT_WRITE_DELAY: float = 1.0
+
+# Reasonable defaults (in seconds) for data that rarely (or slowly) changes:
+DEFAULT_TTLS: dict[str, float] = {
+    "apiVer": 6 * 60 * 60,
+    "provision": 60 * 60,
+    "provision/*": 60 * 60,
+    "restrictions/global": 10 * 60,
+    "zone/properties": 5 * 60,
+    "zone/*/properties": 5 * 60,
+    "watering/queue": 5,
+}
+
+# Writing to an endpoint invalidates every cached endpoint that shares its root (e.g.,
+# a POST to zone/3/properties invalidates zone, zone/3, and zone/properties); writes to
+# some roots have side effects on other roots, too:
+RELATED_ROOTS: dict[str, tuple[str, ...]] = {
+    "program": ("watering", "zone"),
+    "watering": ("program", "zone"),
+    "zone": ("program", "watering"),
+}
+
+# Writes to these roots can affect anything:
+GLOBAL_ROOTS = ("machine",)
+
+
+def get_endpoint_root(endpoint: str) -> str:
+    """Return the root (first path segment) of an endpoint."""
+    return endpoint.split("/", 1)[0]
+
+
+class CachedResponse(Dict[str, Any]):
+    """Define a response that was served from the cache.
+
+    age is the number of seconds since the response was received from the controller;
+    stale indicates whether it is older than its TTL.
+    """
+
+    def __init__(self, data: dict[str, Any], *, age: float, stale: bool) -> None:
+        """Initialize."""
+        super().__init__(data)
+        self.age = age
+        self.stale = stale
+
+
+class UnchangedResponse(Dict[str, Any]):
+    """Define a response whose body is identical to the previous one.
+
+    Consumers can use this to skip processing data they have already processed.
+    """
+
+    unchanged = True
+
+
+class CacheEntry(NamedTuple):
+    """Define a cached response."""
+
+    data: dict[str, Any]
+    expires_at: float
+    root: str
+    stale_until: float
+    stored_at: float
+
+    def to_response(self, now: float) -> CachedResponse:
+        """Return the entry as a cached response."""
+        return CachedResponse(
+            self.data, age=now - self.stored_at, stale=now >= self.expires_at
+        )
+
+
+class CacheBackend(ABC):
+    """Define a persistent store for cached responses.
+
+    Responses are stored per namespace (a controller's MAC address) and keyed by
+    endpoint; stored_at is a wall-clock timestamp.
+    """
+
+    @abstractmethod
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        """Delete stored responses."""
+
+    @abstractmethod
+    def load(self, namespace: str) -> list[tuple[str, dict[str, Any], float]]:
+        """Return all (key, data, stored_at) responses stored for a namespace."""
+
+    @abstractmethod
+    def store(
+        self, namespace: str, key: str, data: dict[str, Any], stored_at: float
+    ) -> None:
+        """Store a response."""
+
+
+# A pending write: the response to store (and its timestamp) or None to delete it:
+PendingWrite = Optional[Tuple[Dict[str, Any], float]]
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Define a cache backend that stores responses in a local SQLite database.
+
+    When used from an event loop, writes (stores and deletes) don't block it: they're
+    queued and, write_delay seconds after the first one, committed in a single
+    transaction from the loop's default executor. Outside of an event loop, writes are
+    committed immediately. Queued writes are committed before anything is loaded and
+    when the backend is closed (or flushed).
+    """
+
+    def __init__(self, path: str, *, write_delay: float = DEFAULT_WRITE_DELAY) -> None:
+        """Initialize."""
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._pending: dict[tuple[str, str], PendingWrite] = {}
+        # The pending lock only guards the queue; the write lock is held while queued
+        # writes are committed (so that batches are committed in order):
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.write_delay = write_delay
+
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+
+    def _queue(self, writes: dict[tuple[str, str], PendingWrite]) -> None:
+        """Queue writes (committing them right away if there's no event loop)."""
+        with self._pending_lock:
+            self._pending.update(writes)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                self.write_delay, self._schedule_flush, loop
+            )
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Commit the queued writes from the loop's default executor."""
+        self._flush_handle = None
+        future = loop.run_in_executor(None, self.flush)
+
+        def _on_done(fut: asyncio.Future) -> None:
+            """Log (rather than raise) errors, since no one awaits the write."""
+            if not fut.cancelled() and (err := fut.exception()) is not None:
+                _LOGGER.error("Unable to persist cached responses: %s", err)
+
+        future.add_done_callback(_on_done)
+
+    async def async_flush(self) -> None:
+        """Commit any queued writes (without blocking the event loop)."""
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    def close(self) -> None:
+        """Commit any queued writes and close the database."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self.flush()
+        with self._write_lock:
+            self._connection.close()
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        """Delete stored responses."""
+        self._queue({(namespace, key): None for key in keys})
+
+    def flush(self) -> None:
+        """Commit any queued writes (blocking until they are)."""
+        with self._write_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            with self._connection:
+                self._connection.executemany(
+                    "DELETE FROM responses WHERE namespace = ? AND key = ?",
+                    [key for key, write in pending.items() if write is None],
+                )
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    [
+                        (namespace, key, json.dumps(write[0]), write[1])
+                        for (namespace, key), write in pending.items()
+                        if write is not None
+                    ],
+                )
+
+    def load(self, namespace: str) -> list[tuple[str, dict[str, Any], float]]:
+        """Return all (key, data, stored_at) responses stored for a namespace."""
+        self.flush()
+        with self._write_lock:
+            rows = self._connection.execute(
+                "SELECT key, data, stored_at FROM responses WHERE namespace = ?",
+                (namespace,),
+            ).fetchall()
+        return [(key, json.loads(data), stored_at) for key, data, stored_at in rows]
+
+    def store(
+        self, namespace: str, key: str, data: dict[str, Any], stored_at: float
+    ) -> None:
+        """Store a response."""
+        self._queue({(namespace, key): (data, stored_at)})
+
+
+class ResponseCache:  # pylint: disable=too-many-instance-attributes
+    """Define a bounded, per-controller cache of GET responses.
+
+    TTLs are configured per endpoint; keys may be exact endpoints or fnmatch-style
+    patterns (e.g., "zone/*/properties"). Responses from endpoints without a TTL are
+    never cached. Once the cache holds max_entries responses, the least recently used
+    one is evicted.
+
+    Responses are kept for max_stale seconds past their TTL: if the controller can't
+    be reached, those stale responses are served instead of raising an error. If
+    stale_while_revalidate is enabled, stale responses are served immediately while
+    the controller refreshes them in the background.
+
+    If a backend is provided, responses (to requests without parameters) are also
+    persisted there; once the cache is attached to a controller, the responses that
+    were persisted for it are loaded (still subject to their TTLs and max_stale), so a
+    restarted process can serve them without hitting the controller.
+
+    Cached responses are served as CachedResponse objects (which note their age and
+    staleness); their contents are shared by every caller and should be treated as
+    read-only.
+    """
+
+    def __init__(
+        self,
+        ttls: dict[str, float] | None = None,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_stale: float = 0,
+        stale_while_revalidate: bool = False,
+        backend: CacheBackend | None = None,
+    ) -> None:
+        """Initialize."""
+        self._backend = backend
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._max_entries = max_entries
+        self._max_stale = max_stale
+        self._namespace: str | None = None
+        self._resolved_ttls: dict[str, float | None] = {}
+        self._ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.generation: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.stale_hits: int = 0
+        self.stale_while_revalidate = stale_while_revalidate
+
+    def __len__(self) -> int:
+        """Return the number of cached responses."""
+        return len(self._entries)
+
+    def _delete_persisted(self, keys: Iterable[Hashable]) -> None:
+        """Delete responses from the backend."""
+        if self._backend is None or self._namespace is None:
+            return
+        self._backend.delete(self._namespace, [k for k in keys if isinstance(k, str)])
+
+    def attach(self, namespace: str) -> None:
+        """Attach the cache to a controller (loading any persisted responses)."""
+        self._namespace = namespace
+        if self._backend is None:
+            return
+
+        now = time.monotonic()
+        wall_now = time.time()
+        for key, data, stored_at in self._backend.load(namespace):
+            if (ttl := self.get_ttl(key)) is None:
+                continue
+            age = max(wall_now - stored_at, 0)
+            if age >= ttl + self._max_stale:
+                continue
+            self._entries[key] = CacheEntry(
+                data,
+                now - age + ttl,
+                get_endpoint_root(key),
+                now - age + ttl + self._max_stale,
+                now - age,
+            )
+
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        self._delete_persisted(self._entries)
+        self._entries.clear()
+        self.generation += 1
+
+    def _get_entry(self, key: Hashable, now: float) -> CacheEntry | None:
+        """Return an entry (if it's within the maximum staleness)."""
+        if (entry := self._entries.get(key)) is None:
+            return None
+
+        if now >= entry.stale_until:
+            del self._entries[key]
+            return None
+
+        return entry
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        """Return a fresh cached response (or None if there isn't one)."""
+        now = time.monotonic()
+        entry = self._get_entry(key, now)
+        if entry is None or now >= entry.expires_at:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.to_response(now)
+
+    def get_stale(self, key: Hashable) -> CachedResponse | None:
+        """Return a cached response, even if stale (or None if there isn't one)."""
+        now = time.monotonic()
+        if (entry := self._get_entry(key, now)) is None:
+            return None
+
+        self._entries.move_to_end(key)
+        self.stale_hits += 1
+        return entry.to_response(now)
+
+    def get_ttl(self, endpoint: str) -> float | None:
+        """Return the TTL for an endpoint (or None if it shouldn't be cached)."""
+        if endpoint in self._resolved_ttls:
+            return self._resolved_ttls[endpoint]
+
+        ttl = self._ttls.get(endpoint)
+        if ttl is None:
+            for pattern, pattern_ttl in self._ttls.items():
+                if fnmatchcase(endpoint, pattern):
+                    ttl = pattern_ttl
+                    break
+
+        self._resolved_ttls[endpoint] = ttl
+        return ttl
+
+    def invalidate(self, endpoint: str) -> None:
+        """Remove cached responses that a write to an endpoint may have affected."""
+        self.generation += 1
+
+        root = get_endpoint_root(endpoint)
+        if root in GLOBAL_ROOTS:
+            self.clear()
+            return
+
+        roots = {root, *RELATED_ROOTS.get(root, ())}
+        keys = [key for key, entry in self._entries.items() if entry.root in roots]
+        for key in keys:
+            del self._entries[key]
+        self._delete_persisted(keys)
+
+    def set(
+        self,
+        key: Hashable,
+        endpoint: str,
+        data: dict[str, Any],
+        *,
+        generation: int | None = None,
+    ) -> None:
+        """Cache a response.
+
+        If generation is provided and the cache has been invalidated since then (i.e.,
+        the response was requested before a write completed), the response is
+        discarded.
+        """
+        if generation is not None and generation != self.generation:
+            return
+
+        if (ttl := self.get_ttl(endpoint)) is None:
+            return
+
+        now = time.monotonic()
+        self._entries[key] = CacheEntry(
+            data,
+            now + ttl,
+            get_endpoint_root(endpoint),
+            now + ttl + self._max_stale,
+            now,
+        )
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+        if self._backend is not None and self._namespace and isinstance(key, str):
+            self._backend.store(self._namespace, key, data, time.time())
+
+
+class HistoryCache:
+    """Define a per-controller cache of immutable, daily history.
+
+    Once a day is over, its statistics, watering log, and program runs never change,
+    so they are cached (per kind of data and per day) without expiring. Requests for
+    ranges of days are split so that only the days which aren't cached are fetched.
+
+    If a backend is provided, cached days are persisted there (and loaded once the
+    cache is attached to a controller).
+    """
+
+    def __init__(self, backend: CacheBackend | None = None) -> None:
+        """Initialize."""
+        self._backend = backend
+        self._days: dict[tuple[str, datetime.date], list[dict[str, Any]]] = {}
+        self._namespace: str | None = None
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached days."""
+        return len(self._days)
+
+    @staticmethod
+    def is_immutable(date: datetime.date) -> bool:
+        """Return whether the history for a date can no longer change.
+
+        A day of slack is given since the controller's timezone may differ from ours.
+        """
+        return date < datetime.date.today() - datetime.timedelta(days=1)
+
+    def attach(self, namespace: str) -> None:
+        """Attach the cache to a controller (loading any persisted days)."""
+        self._namespace = f"{namespace}/history"
+        if self._backend is None:
+            return
+
+        for key, data, _ in self._backend.load(self._namespace):
+            kind, date_str = key.rsplit("/", 1)
+            date = datetime.date.fromisoformat(date_str)
+            self._days[(kind, date)] = data["values"]
+
+    def get(self, kind: str, date: datetime.date) -> list[dict[str, Any]] | None:
+        """Return the cached history of a kind for a day (or None)."""
+        if (values := self._days.get((kind, date))) is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return values
+
+    def set(self, kind: str, date: datetime.date, values: list[dict[str, Any]]) -> None:
+        """Cache the history of a kind for a day (if it's immutable)."""
+        if not self.is_immutable(date):
+            return
+        self._days[(kind, date)] = values
+        if self._backend is not None and self._namespace is not None:
+            self._backend.store(
+                self._namespace,
+                f"{kind}/{date.isoformat()}",
+                {"values": values},
+                time.time(),
+            )
+
+    async def get_range(
+        self,
+        kind: str,
+        start: datetime.date,
+        days: int,
+        fetch: Callable[[datetime.date, int], Awaitable[list[dict[str, Any]]]],
+        get_date: Callable[[dict[str, Any]], str],
+    ) -> list[dict[str, Any]]:
+        """Return the history of a kind for a range of days.
+
+        fetch is called with (start, days) for each contiguous run of days that isn't
+        cached; get_date returns the ISO date (YYYY-MM-DD...) of an item it returns.
+        """
+        results: dict[datetime.date, list[dict[str, Any]]] = {}
+        missing: list[list[datetime.date]] = []
+
+        for date in (start + datetime.timedelta(days=offset) for offset in range(days)):
+            if (values := self.get(kind, date)) is not None:
+                results[date] = values
+            elif missing and missing[-1][-1] == date - datetime.timedelta(days=1):
+                missing[-1].append(date)
+            else:
+                missing.append([date])
+
+        fetched = await asyncio.gather(
+            *(fetch(missing_run[0], len(missing_run)) for missing_run in missing)
+        )
+
+        for missing_run, items in zip(missing, fetched):
+            by_date: dict[datetime.date, list[dict[str, Any]]] = {
+                date: [] for date in missing_run
+            }
+            for item in items:
+                date = datetime.date.fromisoformat(get_date(item)[:10])
+                by_date.setdefault(date, []).append(item)
+            for date, values in by_date.items():
+                results[date] = values
+                if date in missing_run:
+                    self.set(kind, date, values)
+
+        return [item for date in sorted(results) for item in results[date]]
@@ -0,0 +1,90 @@
+"""Define per-controller capability tracking."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from regenmaschine.controller import Controller
+
+GEN1_HARDWARE_VERSION = "1"
+
+
+def get_endpoint_key(method: str, endpoint: str) -> str:
+    """Return the key that identifies a method/endpoint combination."""
+    return f"{method.upper()} {endpoint}"
+
+
+class Capabilities:
+    """Define an object to track what a controller supports.
+
+    Two things are tracked:
+
+    * Features (endpoint manager methods decorated with
+      EndpointManager.raise_on_gen1_controller): 1st generation controllers don't
+      support any of them; beyond that, once a call to one fails with an
+      UnknownAPICallError, the feature is known to be unsupported.
+    * Endpoints: once a call to an endpoint fails with an UnknownAPICallError, the
+      endpoint is known to be unsupported.
+
+    Either way, later calls can short-circuit. Learned results are tied to the
+    controller's API version, so they are discarded if the controller's firmware
+    changes.
+    """
+
+    def __init__(self, controller: Controller) -> None:
+        """Initialize."""
+        self._api_version: str = ""
+        self._controller = controller
+        self._unsupported: set[str] = set()
+        self._unsupported_features: set[str] = set()
+
+    def _check_api_version(self) -> None:
+        """Discard learned results if the controller's API version has changed."""
+        api_version = self._controller.api_version
+        if not api_version or api_version == self._api_version:
+            return
+        if self._api_version:
+            self._unsupported.clear()
+            self._unsupported_features.clear()
+        self._api_version = api_version
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the capability map in a JSON-serializable form."""
+        self._check_api_version()
+        return {
+            "api_version": self._api_version,
+            "unsupported": sorted(self._unsupported),
+            "unsupported_features": sorted(self._unsupported_features),
+        }
+
+    def load(self, data: dict[str, Any]) -> None:
+        """Load a capability map produced by as_dict()."""
+        self._api_version = data["api_version"]
+        self._unsupported = set(data["unsupported"])
+        self._unsupported_features = set(data.get("unsupported_features", []))
+
+    def mark_unsupported(self, method: str, endpoint: str) -> None:
+        """Record that the controller doesn't support an endpoint."""
+        self._check_api_version()
+        self._unsupported.add(get_endpoint_key(method, endpoint))
+
+    def mark_feature_unsupported(self, feature: str) -> None:
+        """Record that the controller doesn't support an endpoint manager method."""
+        self._check_api_version()
+        self._unsupported_features.add(feature)
+
+    def supports_endpoint(self, method: str, endpoint: str) -> bool:
+        """Return whether the controller is (believed to be) able to handle a call."""
+        if not self._unsupported:
+            return True
+        self._check_api_version()
+        return get_endpoint_key(method, endpoint) not in self._unsupported
+
+    def supports_feature(self, feature: str) -> bool:
+        """Return whether the controller supports a (gated) endpoint manager method."""
+        if self._controller.hardware_version == GEN1_HARDWARE_VERSION:
+            return False
+        if not self._unsupported_features:
+            return True
+        self._check_api_version()
+        return feature not in self._unsupported_features
@@ -0,0 +1,127 @@
+"""Define a circuit breaker for unreachable controllers."""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from regenmaschine.errors import CircuitOpenError, RequestError, TransientError
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+CIRCUIT_CLOSED: str = "closed"
+CIRCUIT_HALF_OPEN: str = "half_open"
+CIRCUIT_OPEN: str = "open"
+
+DEFAULT_COOLDOWN: float = 30.0
+DEFAULT_FAILURE_THRESHOLD: int = 3
+
+
+class CircuitBreaker:
+    """Define a circuit breaker for a single controller.
+
+    The circuit starts out closed. After failure_threshold consecutive transport
+    failures (i.e., TransientErrors), it opens and requests fail immediately with a
+    CircuitOpenError. Once the cooldown (in seconds) has passed, the next request sends
+    a single probe to the controller (with the circuit half-open in the meantime): if
+    the controller responds, the circuit closes; otherwise, it opens again.
+
+    on_state_change, if provided, is called with the breaker's name (the controller's
+    MAC address, once attached), the old state, and the new state.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        cooldown: float = DEFAULT_COOLDOWN,
+        *,
+        on_state_change: Callable[[str, str, str], None] | None = None,
+    ) -> None:
+        """Initialize."""
+        self._on_state_change = on_state_change
+        self._opened_at: float = 0.0
+        self.cooldown = cooldown
+        self.failure_threshold = failure_threshold
+        self.failures: int = 0
+        self.name: str = ""
+        self.state: str = CIRCUIT_CLOSED
+
+    def _set_state(self, state: str) -> None:
+        """Change the circuit's state (notifying the callback)."""
+        if state == self.state:
+            return
+
+        old_state = self.state
+        self.state = state
+        if state == CIRCUIT_OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CIRCUIT_CLOSED:
+            self.failures = 0
+
+        _LOGGER.debug("Circuit for %s is now %s", self.name, state)
+        if self._on_state_change is not None:
+            self._on_state_change(self.name, old_state, state)
+
+    def attach(self, name: str) -> None:
+        """Attach the breaker to a controller."""
+        self.name = name
+
+    def record_failure(self) -> None:
+        """Record a transport failure."""
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self._set_state(CIRCUIT_OPEN)
+
+    def record_success(self) -> None:
+        """Record that the controller responded."""
+        self.failures = 0
+
+    async def _probe(self, probe: Callable[[], Awaitable[Any]]) -> None:
+        """Probe the controller to decide whether to close the circuit."""
+        opened_at = self._opened_at
+        self._set_state(CIRCUIT_HALF_OPEN)
+
+        try:
+            await probe()
+        except TransientError as err:
+            self._set_state(CIRCUIT_OPEN)
+            raise CircuitOpenError(
+                f"Circuit for {self.name} is open (probe failed: {err})"
+            ) from err
+        except RequestError:
+            # The controller responded (even if with an error), so it's reachable:
+            pass
+        except BaseException:
+            # The probe was cancelled; let the next request send another one:
+            self._set_state(CIRCUIT_OPEN)
+            self._opened_at = opened_at
+            raise
+
+        self._set_state(CIRCUIT_CLOSED)
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[_T]],
+        probe: Callable[[], Awaitable[Any]],
+    ) -> _T:
+        """Make a request through the breaker."""
+        if self.state == CIRCUIT_HALF_OPEN:
+            raise CircuitOpenError(f"Circuit for {self.name} is half-open")
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                raise CircuitOpenError(f"Circuit for {self.name} is open")
+            await self._probe(probe)
+
+        try:
+            data = await request()
+        except TransientError:
+            self.record_failure()
+            raise
+        except RequestError:
+            self.record_success()
+            raise
+
+        self.record_success()
+        return data
@@ -2,56 +2,357 @@
 from __future__ import annotations
 
 import asyncio
+from collections import OrderedDict
 from datetime import datetime
-import json
+from fnmatch import fnmatchcase
+from functools import partial
+import hashlib
 import logging
 import ssl
-from typing import Any
+import time
+from typing import Any, Callable, Dict, Iterable, cast
 
-from aiohttp import ClientSession, ClientTimeout
-from aiohttp.client_exceptions import ServerDisconnectedError
+from aiohttp import ClientSession
 import async_timeout
-
-from regenmaschine.controller import Controller, LocalController, RemoteController
-from regenmaschine.errors import RequestError, TokenExpiredError, raise_for_error
+from yarl import URL
+
+from regenmaschine.cache import HistoryCache, ResponseCache, UnchangedResponse
+from regenmaschine.circuit import CircuitBreaker
+from regenmaschine.codec import JSONCodec, get_default_codec
+from regenmaschine.compression import (
+    ACCEPT_ENCODING,
+    IDENTITY_ENCODING,
+    TransferStats,
+    decode_body,
+)
+from regenmaschine.concurrency import AdaptiveConcurrencyLimiter
+from regenmaschine.connection import ConnectionPolicy
+from regenmaschine.controller import (
+    CLOUD_HOSTS,
+    Controller,
+    LocalController,
+    RemoteAccount,
+    RemoteController,
+)
+from regenmaschine.errors import (
+    RequestError,
+    RequestTimeoutError,
+    TokenExpiredError,
+    TransientError,
+)
+from regenmaschine.middleware import (
+    Handler,
+    Middleware,
+    Request,
+    Response,
+    RetryMiddleware,
+    compose,
+    raise_for_error_middleware,
+)
+from regenmaschine.ratelimit import RateLimit, TokenBucket
+from regenmaschine.retry import (
+    RetryPolicy,
+    get_endpoint,
+    get_endpoint_template,
+    get_retry_after,
+)
+from regenmaschine.timeouts import RTTEstimator, get_remaining_time
+from regenmaschine.tls import get_legacy_ssl_context
+from regenmaschine.transport import AiohttpTransport, Transport
 
 _LOGGER: logging.Logger = logging.getLogger(__name__)
 
 DEFAULT_LOCAL_PORT: int = 8080
 DEFAULT_TIMEOUT: int = 30
 
+# The number of responses (i.e., distinct GET requests) whose digests are remembered to
+# detect unchanged responses; the least recently used digests are evicted first:
+MAX_RESPONSE_DIGESTS: int = 1024
+
 
-class Client:
+class Client:  # pylint: disable=too-many-instance-attributes
     """Define the client."""
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments,too-many-locals
         self,
         *,
         session: ClientSession | None = None,
         request_timeout: int = DEFAULT_TIMEOUT,
+        connection_policy: ConnectionPolicy | None = None,
+        ssl_context: ssl.SSLContext | None = None,
+        transport: Transport | None = None,
+        cloud_transport: Transport | None = None,
+        cache_factory: Callable[[], ResponseCache] | None = None,
+        history_cache_factory: Callable[[], HistoryCache] | None = None,
+        circuit_breaker_factory: Callable[[], CircuitBreaker] | None = None,
+        concurrency_limiter_factory: (
+            Callable[[], AdaptiveConcurrencyLimiter] | None
+        ) = None,
+        rtt_estimator_factory: Callable[[], RTTEstimator] | None = None,
+        endpoint_timeouts: dict[str, float] | None = None,
+        middlewares: Iterable[Middleware] | None = None,
+        detect_unchanged_responses: bool = False,
+        json_codec: JSONCodec | None = None,
+        retry_policy: RetryPolicy | None = None,
+        rate_limit: RateLimit | None = None,
+        cloud_rate_limit: RateLimit | None = None,
     ) -> None:
-        """Initialize."""
+        """Initialize.
+
+        transport is what requests are sent through; by default, requests are sent
+        over HTTP with aiohttp (see AiohttpTransport), which session,
+        connection_policy, and ssl_context configure. They are ignored if another
+        transport is provided.
+
+        cloud_transport, if provided, is used instead of transport for requests to the
+        RainMachine cloud (e.g., an HTTPXTransport, which multiplexes every remote
+        controller's requests over a few HTTP/2 connections).
+
+        connection_policy is the default pooling policy for every host; it (and any
+        host-specific policy) only applies to sessions owned by the client.
+
+        ssl_context overrides the (shared, legacy-compatible) SSL context used for
+        controllers that use SSL.
+
+        cache_factory and history_cache_factory, if provided, are called to create a
+        response cache and a history cache (respectively) for each loaded controller;
+        likewise, circuit_breaker_factory and concurrency_limiter_factory create each
+        loaded controller's circuit breaker and concurrency limiter, while
+        rtt_estimator_factory creates the round-trip time estimators (one per endpoint
+        template) that adapt each controller's request timeouts.
+
+        json_codec encodes request bodies and decodes responses; by default, orjson is
+        used if it's installed (and the standard library's json module otherwise).
+
+        If detect_unchanged_responses is True, the body of each GET response is hashed
+        and compared to the previous response from the same URL; if it hasn't changed,
+        the previously parsed data is returned (as an UnchangedResponse) without being
+        parsed again. Digests are kept for the MAX_RESPONSE_DIGESTS most recently used
+        URLs.
+
+        endpoint_timeouts maps endpoints (exact ones or fnmatch-style patterns, e.g.,
+        "diag/log" or "zone/*/properties") to the timeout (in seconds) to use for them
+        instead of request_timeout.
+
+        middlewares is an ordered chain of async callables that every request passes
+        through (see add_middleware()).
+
+        retry_policy is the default policy for retrying failed requests to every host
+        (by default, requests aren't retried).
+
+        rate_limit is the default rate limit for every host; cloud_rate_limit is the
+        rate limit shared by all requests made on behalf of a single cloud account.
+        Neither is applied by default.
+        """
+        self._detect_unchanged_responses = detect_unchanged_responses
+        self.json_codec = json_codec or get_default_codec()
+        self._response_digests: OrderedDict[
+            tuple[str, tuple[tuple[str, Any], ...]],
+            tuple[int, bytes, UnchangedResponse],
+        ] = OrderedDict()
+        self._cache_factory = cache_factory
+        self._circuit_breaker_factory = circuit_breaker_factory
+        self._concurrency_limiter_factory = concurrency_limiter_factory
+        self._rtt_estimator_factory = rtt_estimator_factory
+        self._history_cache_factory = history_cache_factory
+        self._endpoint_timeouts = endpoint_timeouts or {}
         self._request_timeout = request_timeout
-        self._session = session
-
-        self._ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-
-        # The local API on Gen 1 controllers uses outdated RSA ciphers (and there isn't
-        # any indication that they'll be updated). Python 3.10+ enforces minimum TLS
-        # standards that the Gen 1 can't support, so to keep compatibility, we loosen
-        # things up:
-        #   1. We set a minimum TLS version of SSLv3
-        #   2. We utilize the "DEFAULT" cipher suite (which includes old RSA ciphers).
-        #   3. We don't validate the hostname.
-        #   4. We allow self-signed certificates.
-        self._ssl_context.minimum_version = ssl.TLSVersion.SSLv3
-        self._ssl_context.set_ciphers("DEFAULT")
-        self._ssl_context.check_hostname = False
-        self._ssl_context.verify_mode = ssl.CERT_NONE
+        self._resolved_endpoint_timeouts: dict[str, float | None] = {}
+        self._cloud_rate_limit = cloud_rate_limit
+        self._compression: dict[str, bool] = {}
+        self._default_rate_limit = rate_limit
+        self._default_retry_policy = retry_policy or RetryPolicy()
+        self._rate_limiters: dict[str, TokenBucket] = {}
+        self._rate_limits: dict[str, RateLimit] = {}
+        self._retry_policies: dict[str, RetryPolicy] = {}
+        self._transfer_stats: dict[str, TransferStats] = {}
+
+        self.transport: Transport = transport or AiohttpTransport(
+            session, connection_policy=connection_policy, ssl_context=ssl_context
+        )
+        self.cloud_transport = cloud_transport
+
+        self._middlewares: list[Middleware] = list(middlewares or [])
+        self._handler: Handler = self._compose_handler()
 
         self.controllers: dict[str, Controller] = {}
+        self.remote_accounts: dict[str, RemoteAccount] = {}
+
+    async def __aenter__(self) -> Client:
+        """Enter the client's context."""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Exit the client's context (closing any session it owns)."""
+        await self.close()
+
+    def _add_controller(self, controller: Controller) -> None:
+        """Add a loaded controller to the client."""
+        if self._cache_factory is not None:
+            controller.cache = self._cache_factory()
+            controller.cache.attach(controller.mac)
+        if self._history_cache_factory is not None:
+            controller.history = self._history_cache_factory()
+            controller.history.attach(controller.mac)
+        if self._circuit_breaker_factory is not None:
+            controller.circuit_breaker = self._circuit_breaker_factory()
+            controller.circuit_breaker.attach(controller.mac)
+        if self._concurrency_limiter_factory is not None:
+            controller.concurrency_limiter = self._concurrency_limiter_factory()
+        controller.rtt_estimator_factory = self._rtt_estimator_factory
+        self.controllers[controller.mac] = controller
+
+    def _get_remote_account(self, email: str, password: str) -> RemoteAccount:
+        """Return the (cached) cloud account for an email address."""
+        account = self.remote_accounts.get(email)
+        if account is None or account.password != password:
+            account = self.remote_accounts[email] = RemoteAccount(
+                self._request,
+                email,
+                password,
+                rate_limiter=self._cloud_rate_limit.create_bucket()
+                if self._cloud_rate_limit
+                else None,
+            )
+        return account
+
+    async def close(self) -> None:
+        """Close the client's transports (and any sessions they own)."""
+        await asyncio.gather(
+            *(
+                transport.close()
+                for transport in (self.transport, self.cloud_transport)
+                if transport is not None
+            )
+        )
 
-    async def _request(
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """Return the SSL context to use (building the shared one on first use)."""
+        if isinstance(self.transport, AiohttpTransport):
+            return self.transport.ssl_context
+        return get_legacy_ssl_context()
+
+    @property
+    def tls_handshakes(self) -> dict[str, int]:
+        """Return the number of full and resumed TLS handshakes performed.
+
+        Note that unless a custom SSL context is used, these counts are shared by every
+        client in the process.
+        """
+        if isinstance(self.transport, AiohttpTransport):
+            return self.transport.tls_handshakes
+        return {"full": 0, "resumed": 0}
+
+    def get_endpoint_timeout(self, endpoint: str) -> float | None:
+        """Return the configured timeout for an endpoint (if it has one)."""
+        if endpoint in self._resolved_endpoint_timeouts:
+            return self._resolved_endpoint_timeouts[endpoint]
+
+        timeout = self._endpoint_timeouts.get(endpoint)
+        if timeout is None:
+            for pattern, pattern_timeout in self._endpoint_timeouts.items():
+                if fnmatchcase(endpoint, pattern):
+                    timeout = pattern_timeout
+                    break
+
+        self._resolved_endpoint_timeouts[endpoint] = timeout
+        return timeout
+
+    def get_idle_close_window(self, host: str) -> float | None:
+        """Return the learned idle-close window (in seconds) for a host.
+
+        This is None until the host has been seen dropping an idle connection (or if
+        requests aren't sent with the aiohttp transport).
+        """
+        if isinstance(self.transport, AiohttpTransport):
+            return self.transport.get_idle_close_window(host)
+        return None
+
+    def set_connection_policy(self, host: str, policy: ConnectionPolicy) -> None:
+        """Set the connection policy for a specific controller host.
+
+        Connection policies only apply to the aiohttp transport.
+        """
+        if isinstance(self.transport, AiohttpTransport):
+            self.transport.set_connection_policy(host, policy)
+
+    def get_transport(self, host: str) -> Transport:
+        """Return the transport that requests to a host are sent through."""
+        if self.cloud_transport is not None and host in CLOUD_HOSTS:
+            return self.cloud_transport
+        return self.transport
+
+    def get_transfer_stats(self, host: str) -> TransferStats:
+        """Return the counters for the response bodies received from a host."""
+        if (stats := self._transfer_stats.get(host)) is None:
+            stats = self._transfer_stats[host] = TransferStats()
+        return stats
+
+    def set_compression(self, host: str, enabled: bool) -> None:
+        """Set whether compressed responses are requested from a specific host.
+
+        By default, they are only requested from the RainMachine cloud: local
+        controllers would spend more time compressing responses than the LAN saves.
+        """
+        self._compression[host] = enabled
+
+    def get_rate_limiter(self, host: str) -> TokenBucket | None:
+        """Return the rate limiter for a host (if it has a rate limit)."""
+        if (limiter := self._rate_limiters.get(host)) is not None:
+            return limiter
+        if (
+            rate_limit := self._rate_limits.get(host, self._default_rate_limit)
+        ) is None:
+            return None
+        limiter = self._rate_limiters[host] = rate_limit.create_bucket()
+        return limiter
+
+    def set_rate_limit(self, host: str, rate_limit: RateLimit) -> None:
+        """Set the rate limit for a specific host."""
+        self._rate_limits[host] = rate_limit
+        self._rate_limiters.pop(host, None)
+
+    def set_retry_policy(self, host: str, policy: RetryPolicy) -> None:
+        """Set the retry policy for a specific host."""
+        self._retry_policies[host] = policy
+        self._handler = self._compose_handler()
+
+    def _compose_handler(self) -> Handler:
+        """Compose the middleware chain that requests pass through.
+
+        The chain is composed once (and again whenever it changes) rather than per
+        request; the built-in retry middleware is only included if a retry policy
+        actually allows retries.
+        """
+        middlewares = list(self._middlewares)
+        if any(
+            policy.max_attempts > 1
+            for policy in (self._default_retry_policy, *self._retry_policies.values())
+        ):
+            middlewares.append(
+                RetryMiddleware(
+                    lambda host: self._retry_policies.get(
+                        host, self._default_retry_policy
+                    )
+                )
+            )
+        middlewares.append(raise_for_error_middleware)
+        return compose(middlewares, self._send)
+
+    def add_middleware(self, middleware: Middleware) -> None:
+        """Add a middleware to the end of the chain that requests pass through.
+
+        A middleware is an async callable that accepts a Request and the next handler in
+        the chain and returns a Response; it can inspect or modify the request, call
+        the handler (or not, to short-circuit the request), and inspect or modify the
+        response. Middlewares run in the order they're added, before the built-in retry
+        and error-raising middlewares.
+        """
+        self._middlewares.append(middleware)
+        self._handler = self._compose_handler()
+
+    async def _request(  # pylint: disable=too-many-arguments
         self,
         method: str,
         url: str,
@@ -59,80 +360,178 @@ class Client:
         access_token: str | None = None,
         access_token_expiration: datetime | None = None,
         use_ssl: bool = True,
-        **kwargs: dict[str, Any],
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+        rate_limiter: TokenBucket | None = None,
+        rtt_estimator: RTTEstimator | None = None,
+        **kwargs: Any,
     ) -> dict:
-        """Make a request against the RainMachine device."""
+        """Make a request against the RainMachine device.
+
+        Each attempt takes a token from rate_limiter (if provided) or else, from the
+        host's rate limiter (if it has one) and then, a slot from concurrency_limiter
+        (if provided), which it holds only while in flight. If rtt_estimator is
+        provided, each attempt's round-trip time is recorded and the timeout it suggests
+        (if any) is used instead of the client's request_timeout.
+        """
         if access_token_expiration and datetime.now() >= access_token_expiration:
             raise TokenExpiredError("Long-lived access token has expired")
 
+        host = str(URL(url).host)
+
         kwargs.setdefault("headers", {})
         kwargs["headers"]["Content-Type"] = "application/json"
+        kwargs["headers"]["Accept-Encoding"] = (
+            ACCEPT_ENCODING
+            if self._compression.get(host, host in CLOUD_HOSTS)
+            else IDENTITY_ENCODING
+        )
 
         kwargs.setdefault("params", {})
         if access_token:
             kwargs["params"]["access_token"] = access_token
 
-        use_running_session = self._session and not self._session.closed
+        if "json" in kwargs:
+            # Encode the body once (rather than on every attempt):
+            kwargs["data"] = self.json_codec.dumps(kwargs.pop("json"))
+
+        request = Request(
+            method,
+            url,
+            host,
+            kwargs,
+            use_ssl=use_ssl,
+            concurrency_limiter=concurrency_limiter,
+            rate_limiter=rate_limiter,
+            rtt_estimator=rtt_estimator,
+        )
+        response = await self._handler(request)
+        return cast(Dict[str, Any], response.data)
+
+    async def _send(self, request: Request) -> Response:
+        """Make a single attempt at a request (the end of the middleware chain)."""
+        rate_limiter = request.rate_limiter
+        if rate_limiter is None:
+            rate_limiter = self.get_rate_limiter(request.host)
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+
+        if (limiter := request.concurrency_limiter) is None:
+            return await self._send_attempt(request)
+        # Only the attempt itself holds a slot (and counts towards its latency):
+        return await limiter.run(
+            partial(self._send_attempt, request),
+            get_endpoint_template(get_endpoint(request.url)),
+        )
 
-        if use_running_session:
-            session = self._session
-        else:
-            session = ClientSession(timeout=ClientTimeout(total=DEFAULT_TIMEOUT))
+    async def _send_attempt(self, request: Request) -> Response:
+        """Send an attempt (with the appropriate timeout), recording its RTT."""
+        # An endpoint's configured timeout takes precedence over the one learned from
+        # round-trip times (which only make sense for the other endpoints):
+        rtt_estimator = request.rtt_estimator
+        endpoint_timeout = self.get_endpoint_timeout(get_endpoint(request.url))
+        request_timeout: float = self._request_timeout
+        estimate_rtt = endpoint_timeout is None and rtt_estimator is not None
+        if endpoint_timeout is not None:
+            request_timeout = endpoint_timeout
+        elif rtt_estimator is not None and rtt_estimator.timeout is not None:
+            request_timeout = rtt_estimator.timeout
+
+        if (remaining := get_remaining_time()) is not None:
+            if remaining <= 0:
+                raise RequestTimeoutError(
+                    f"Deadline exceeded before requesting data from {request.url}"
+                )
+            if remaining < request_timeout:
+                # A timeout caused by the deadline says nothing about round trips:
+                estimate_rtt = False
+                request_timeout = remaining
+
+        start = time.monotonic()
+        try:
+            response = await self._attempt_request(request, request_timeout)
+        except RequestTimeoutError:
+            if estimate_rtt:
+                assert rtt_estimator is not None
+                rtt_estimator.record_timeout()
+            raise
+
+        if estimate_rtt:
+            assert rtt_estimator is not None
+            rtt_estimator.record_rtt(time.monotonic() - start)
+        return response
 
-        assert session
+    async def _attempt_request(
+        self, request: Request, request_timeout: float
+    ) -> Response:
+        """Make a single attempt at a request through the transport."""
+        method, url = request.method, request.url
 
         try:
-            # Only try 2x for ServerDisconnectedError to comply with the RFC
-            # https://datatracker.ietf.org/doc/html/rfc2616#section-8.1.4
-            for attempt in range(2):
-                try:
-                    return await self._request_with_session(
-                        session, method, url, use_ssl, **kwargs
+            async with async_timeout.timeout(request_timeout):
+                response = await self.get_transport(request.host).send(request)
+        except asyncio.TimeoutError as err:
+            raise RequestTimeoutError(
+                f"Timed out while requesting data from {url}"
+            ) from err
+
+        if response.status == 429 or response.status >= 500:
+            raise TransientError(
+                f"Error requesting data from {url}: {response.status}",
+                retry_after=get_retry_after(response.headers.get("Retry-After")),
+            )
+
+        wire_bytes = len(response.body)
+        response.body = decode_body(
+            response.body, response.headers.get("Content-Encoding")
+        )
+        self.get_transfer_stats(request.host).record(wire_bytes, len(response.body))
+        _LOGGER.debug(
+            "Received %s bytes (%s decoded) from %s",
+            wire_bytes,
+            len(response.body),
+            url,
+        )
+
+        detect_unchanged = self._detect_unchanged_responses and method.lower() == "get"
+        if detect_unchanged:
+            digest_key = (
+                url,
+                tuple(
+                    sorted(
+                        (key, value)
+                        for key, value in request.kwargs["params"].items()
+                        if key != "access_token"
                     )
-                except ServerDisconnectedError as err:
-                    # The HTTP/1.1 spec allows the device to close the connection
-                    # at any time. aiohttp raises ServerDisconnectedError to let us
-                    # decide what to do. In this case we want to retry as it likely
-                    # means the connection was stale and the server closed it on us.
-                    if attempt == 0:
-                        continue
-                    raise RequestError(
-                        f"Error requesting data from {url}: {err}"
-                    ) from err
-
-        finally:
-            if not use_running_session:
-                await session.close()
-
-        raise AssertionError  # https://github.com/python/mypy/issues/8964
-
-    async def _request_with_session(
-        self,
-        session: ClientSession,
-        method: str,
-        url: str,
-        use_ssl: bool,
-        **kwargs: dict[str, Any],
-    ) -> dict[str, Any]:
-        """Make a request with a session."""
-        data: dict[str, Any] = {}
+                ),
+            )
+            digest = hashlib.blake2b(response.body, digest_size=16).digest()
+            previous = self._response_digests.get(digest_key)
+            if previous and previous[:2] == (response.status, digest):
+                _LOGGER.debug("Data unchanged for %s", url)
+                self._response_digests.move_to_end(digest_key)
+                response.data = previous[2]
+                return response
 
         try:
-            async with async_timeout.timeout(self._request_timeout), session.request(
-                method, url, ssl=self._ssl_context if use_ssl else None, **kwargs
-            ) as resp:
-                data = await resp.json(content_type=None)
-        except ServerDisconnectedError:
-            raise
-        except json.decoder.JSONDecodeError as err:
+            # Like ClientResponse.json(), treat an empty body as None:
+            data = self.json_codec.loads(response.body.strip() or b"null")
+        except ValueError as err:
             raise RequestError("Unable to parse response as JSON") from err
-        except asyncio.TimeoutError as err:
-            raise RequestError(f"Timed out while requesting data from {url}") from err
-        else:
-            _LOGGER.debug("Data received for %s: %s", url, data)
-            raise_for_error(resp, data)
 
-        return data
+        _LOGGER.debug("Data received for %s: %s", url, data)
+
+        if detect_unchanged and isinstance(data, dict):
+            self._response_digests[digest_key] = (
+                response.status,
+                digest,
+                UnchangedResponse(data),
+            )
+            self._response_digests.move_to_end(digest_key)
+            while len(self._response_digests) > MAX_RESPONSE_DIGESTS:
+                self._response_digests.popitem(last=False)
+
+        response.data = data
+        return response
 
     async def load_local(  # pylint: disable=too-many-arguments
         self,
@@ -161,33 +560,30 @@ class Client:
         name = await controller.provisioning.device_name
         controller.name = str(name)
 
-        self.controllers[controller.mac] = controller
+        self._add_controller(controller)
 
     async def load_remote(
         self, email: str, password: str, skip_existing: bool = True
     ) -> None:
-        """Create a remote client."""
-        auth_resp = await self._request(
-            "post",
-            "https://my.rainmachine.com/login/auth",
-            json={"user": {"email": email, "pwd": password, "remember": 1}},
-        )
+        """Create a remote client.
 
-        access_token: str = auth_resp["access_token"]
+        The account's access token is cached (per email address), so loading the same
+        account again doesn't require logging in to the cloud again.
+        """
+        account = self._get_remote_account(email, password)
 
-        sprinklers_resp = await self._request(
-            "post",
-            "https://my.rainmachine.com/devices/get-sprinklers",
-            access_token=access_token,
-            json={"user": {"email": email, "pwd": password, "remember": 1}},
-        )
-
-        for sprinkler in sprinklers_resp["sprinklers"]:
+        for sprinkler in await account.get_sprinklers():
             if skip_existing and sprinkler["mac"] in self.controllers:
                 continue
 
-            controller: RemoteController = RemoteController(self._request)
-            await controller.login(access_token, sprinkler["sprinklerId"], password)
+            controller: RemoteController = RemoteController(self._request, account)
+            await account.call_with_access_token(
+                partial(
+                    controller.login,
+                    sprinkler_id=sprinkler["sprinklerId"],
+                    password=password,
+                )
+            )
 
             version_data = await controller.api.versions()
             controller.api_version = version_data["apiVer"]
@@ -196,4 +592,42 @@ class Client:
             controller.name = str(sprinkler["name"])
             controller.software_version = version_data["swVer"]
 
-            self.controllers[sprinkler["mac"]] = controller
+            self._add_controller(controller)
+
+    def restore_local(
+        self,
+        data: dict[str, Any],
+        password: str | None = None,
+        skip_existing: bool = True,
+    ) -> None:
+        """Restore a local controller from LocalController.to_dict() output.
+
+        No network calls are made; if a password is provided, it's used to log in
+        again should the restored access token turn out to be expired.
+        """
+        if skip_existing and data["mac"] in self.controllers:
+            return
+        self._add_controller(LocalController.from_dict(self._request, data, password))
+
+    def restore_remote(
+        self,
+        data: dict[str, Any],
+        skip_existing: bool = True,
+        *,
+        email: str | None = None,
+        password: str | None = None,
+    ) -> None:
+        """Restore a remote controller from RemoteController.to_dict() output.
+
+        No network calls are made; if the account's email and password are provided,
+        they're used to log in again should the restored access token turn out to be
+        expired.
+        """
+        if skip_existing and data["mac"] in self.controllers:
+            return
+
+        account = None
+        if email is not None and password is not None:
+            account = self._get_remote_account(email, password)
+
+        self._add_controller(RemoteController.from_dict(self._request, data, account))
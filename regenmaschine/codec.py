@@ -0,0 +1,67 @@
+"""Define the JSON codecs used to encode requests and decode responses."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import json
+from typing import TYPE_CHECKING, Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    if not TYPE_CHECKING:
+        orjson = None
+
+
+class JSONCodec(ABC):
+    """Define how request bodies are encoded and response bodies are decoded.
+
+    Decoding errors should be raised as ValueErrors (which json.JSONDecodeError and
+    orjson.JSONDecodeError both are).
+    """
+
+    @abstractmethod
+    def dumps(self, data: Any) -> bytes:
+        """Encode data as JSON."""
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        """Decode JSON."""
+
+
+class StdlibJSONCodec(JSONCodec):
+    """Define a codec that uses the standard library's json module."""
+
+    def dumps(self, data: Any) -> bytes:
+        """Encode data as JSON."""
+        return json.dumps(data).encode()
+
+    def loads(self, data: bytes) -> Any:
+        """Decode JSON."""
+        return json.loads(data)
+
+
+class OrjsonJSONCodec(JSONCodec):
+    """Define a codec that uses orjson (which is considerably faster).
+
+    This requires orjson, which isn't installed by default.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        if orjson is None:
+            raise RuntimeError("OrjsonJSONCodec requires orjson (pip install orjson)")
+
+    def dumps(self, data: Any) -> bytes:
+        """Encode data as JSON."""
+        # Like json.dumps(), allow non-string keys (e.g., zone IDs):
+        # pylint: disable-next=no-member
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes) -> Any:
+        """Decode JSON."""
+        return orjson.loads(data)  # pylint: disable=no-member
+
+
+def get_default_codec() -> JSONCodec:
+    """Return the fastest codec available."""
+    return OrjsonJSONCodec() if orjson is not None else StdlibJSONCodec()
@@ -0,0 +1,83 @@
+"""Define the compression of response bodies."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+import zlib
+
+from regenmaschine.errors import RequestError
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    if not TYPE_CHECKING:
+        brotli = None
+
+# The encodings we can decode (brotli requires the brotli package):
+ACCEPT_ENCODING: str = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+IDENTITY_ENCODING: str = "identity"
+
+_DECODE_ERRORS: tuple[type[Exception], ...] = (
+    (zlib.error,) if brotli is None else (zlib.error, brotli.error)
+)
+
+
+def decode_body(body: bytes, content_encoding: str | None) -> bytes:
+    """Decode a response body according to its Content-Encoding header."""
+    if not content_encoding:
+        return body
+
+    # Encodings are listed in the order they were applied:
+    for encoding in reversed(content_encoding.lower().split(",")):
+        encoding = encoding.strip()
+        try:
+            if encoding in ("gzip", "x-gzip"):
+                body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            elif encoding == "deflate":
+                body = _inflate(body)
+            elif encoding == "br" and brotli is not None:
+                body = brotli.decompress(body)
+            elif encoding not in ("", IDENTITY_ENCODING):
+                raise RequestError(f"Unsupported content encoding: {encoding}")
+        except _DECODE_ERRORS as err:
+            raise RequestError(f"Unable to decode {encoding} response") from err
+
+    return body
+
+
+def _inflate(body: bytes) -> bytes:
+    """Inflate a deflate-encoded body.
+
+    Per the spec, these are zlib streams, but some servers send raw deflate data.
+    """
+    try:
+        return zlib.decompress(body)
+    except zlib.error:
+        return zlib.decompress(body, -zlib.MAX_WBITS)
+
+
+class TransferStats:
+    """Define counters for the response bodies received from a host.
+
+    wire_bytes counts the bytes as received (i.e., compressed, if they were);
+    decoded_bytes counts them after decoding.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.decoded_bytes: int = 0
+        self.responses: int = 0
+        self.wire_bytes: int = 0
+
+    @property
+    def savings(self) -> float:
+        """Return the fraction of decoded bytes that compression kept off the wire."""
+        if not self.decoded_bytes:
+            return 0.0
+        return 1 - self.wire_bytes / self.decoded_bytes
+
+    def record(self, wire_bytes: int, decoded_bytes: int) -> None:
+        """Record a response body."""
+        self.decoded_bytes += decoded_bytes
+        self.responses += 1
+        self.wire_bytes += wire_bytes
@@ -0,0 +1,147 @@
+"""Define adaptive (AIMD) concurrency limiting for controllers."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import time
+from typing import Awaitable, Callable, Deque, TypeVar
+
+from regenmaschine.errors import RequestError, TransientError
+
+_T = TypeVar("_T")
+
+DEFAULT_INITIAL_LIMIT: int = 2
+DEFAULT_MAX_LIMIT: int = 16
+
+# Responses that take longer than this multiple of the baseline latency are considered
+# a sign that the controller is overloaded:
+DEFAULT_LATENCY_TOLERANCE: float = 2.0
+
+# The factor the limit is multiplied by when the controller seems overloaded:
+DEFAULT_BACKOFF_RATIO: float = 0.5
+
+# The weight each new latency sample gets in the (exponentially weighted) baseline:
+DEFAULT_BASELINE_SMOOTHING: float = 0.05
+
+
+class AdaptiveConcurrencyLimiter:  # pylint: disable=too-many-instance-attributes
+    """Define an adaptive limit on the number of in-flight requests to a controller.
+
+    The limit is adjusted AIMD-style: it grows additively (by about one per limit's
+    worth of requests) while latency stays near the baseline and shrinks
+    multiplicatively when latency inflates past latency_tolerance times the baseline
+    or requests fail with a TransientError (e.g., a timeout). Requests beyond the limit
+    wait (in the order they were made).
+
+    Since some endpoints are inherently slower than others, each endpoint (as
+    identified by whoever runs the requests, e.g., "zone/*/properties") has a baseline
+    of its own: a long-term, exponentially weighted average of its latency. That way,
+    ordinary jitter (or a single unusually fast response) doesn't look like overload,
+    and the baseline follows lasting changes (e.g., a controller moving further from
+    the access point).
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        initial_limit: int = DEFAULT_INITIAL_LIMIT,
+        *,
+        min_limit: int = 1,
+        max_limit: int = DEFAULT_MAX_LIMIT,
+        latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+        backoff_ratio: float = DEFAULT_BACKOFF_RATIO,
+        baseline_smoothing: float = DEFAULT_BASELINE_SMOOTHING,
+    ) -> None:
+        """Initialize."""
+        self._limit = float(initial_limit)
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.backoff_ratio = backoff_ratio
+        self.baseline_latencies: dict[str, float] = {}
+        self.baseline_smoothing = baseline_smoothing
+        self.in_flight: int = 0
+        self.latency_tolerance = latency_tolerance
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+
+    @property
+    def limit(self) -> int:
+        """Return the current limit on in-flight requests."""
+        return int(self._limit)
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    def _decrease(self) -> None:
+        """Shrink the limit multiplicatively."""
+        self._limit = max(self._limit * self.backoff_ratio, float(self.min_limit))
+
+    def _increase(self) -> None:
+        """Grow the limit additively."""
+        self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+
+    def _record_latency(self, endpoint: str, latency: float) -> None:
+        """Adjust the limit based on a request's latency."""
+        if (baseline := self.baseline_latencies.get(endpoint)) is None:
+            baseline = latency
+
+        if latency > baseline * self.latency_tolerance:
+            self._decrease()
+        else:
+            self._increase()
+
+        self.baseline_latencies[endpoint] = (
+            1 - self.baseline_smoothing
+        ) * baseline + self.baseline_smoothing * latency
+
+    def _wake_waiters(self) -> None:
+        """Hand free slots to waiting requests."""
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def _acquire(self) -> None:
+        """Take a slot (waiting for one if needed)."""
+        if not self._waiters and self.in_flight < self.limit:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # We were handed a slot just before being cancelled; pass it on:
+                self.in_flight -= 1
+                self._wake_waiters()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    async def run(self, request: Callable[[], Awaitable[_T]], endpoint: str = "") -> _T:
+        """Make a request (to an endpoint) within the limit.
+
+        The request's latency is measured from the moment it gets a slot, so it should
+        be a single attempt (rather than, e.g., include delays between retries).
+        """
+        await self._acquire()
+        start = time.monotonic()
+        try:
+            data = await request()
+        except TransientError:
+            self._decrease()
+            raise
+        except RequestError:
+            # The controller responded (even if with an error):
+            self._record_latency(endpoint, time.monotonic() - start)
+            raise
+        else:
+            self._record_latency(endpoint, time.monotonic() - start)
+        finally:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+        return data
@@ -0,0 +1,121 @@
+"""Define per-controller connection pooling policies."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from statistics import median_high
+import time
+from typing import Deque
+
+from aiohttp import TCPConnector
+
+DEFAULT_KEEPALIVE_TIMEOUT: float = 15.0
+
+# Pooled connections are retired once they have been idle for this fraction of the
+# learned idle-close window (giving us some headroom before the device kills them):
+IDLE_CLOSE_WINDOW_MARGIN: float = 0.8
+
+# Disconnects that occur after less idle time than this are assumed to have some other
+# cause (e.g., a device reboot) and aren't used to learn the idle-close window:
+MIN_IDLE_CLOSE_WINDOW: float = 1.0
+
+# The idle-close window is the median of the idle times of the most recent disconnects,
+# and is only learned once a few of them have been observed (so that a single unrelated
+# disconnect, such as a Wi-Fi blip, doesn't turn keep-alive off):
+IDLE_CLOSE_SAMPLES: int = 5
+MIN_IDLE_CLOSE_SAMPLES: int = 3
+
+# Once the window has been learned, every this many times the pool would be retired, it
+# is kept instead, so that a successful reuse can show that the window has grown:
+IDLE_CLOSE_PROBE_INTERVAL: int = 10
+
+
+@dataclass(frozen=True)
+class ConnectionPolicy:
+    """Define how connections to a single controller host are pooled.
+
+    limit_per_host: the maximum number of simultaneous connections (0 is unlimited).
+    keepalive_timeout: the number of seconds an idle connection is kept in the pool.
+    force_close: whether to close each connection after its response (no keep-alive).
+    """
+
+    limit_per_host: int = 0
+    keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT
+    force_close: bool = False
+
+    def create_connector(self) -> TCPConnector:
+        """Create a connector that implements this policy."""
+        if self.force_close:
+            return TCPConnector(limit_per_host=self.limit_per_host, force_close=True)
+        return TCPConnector(
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+
+
+class HostConnectionState:
+    """Define an object to track connection activity for a single host.
+
+    Controllers (particularly 1st generation ones) close idle keep-alive connections
+    on their own schedule; reusing such a connection results in a
+    ServerDisconnectedError and a second round trip. This object learns the window
+    after which a host drops idle connections so that the client can retire its pooled
+    connections before that happens.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._disconnect_idle_times: Deque[float] = deque(maxlen=IDLE_CLOSE_SAMPLES)
+        self._retirements: int = 0
+        self.idle_close_window: float | None = None
+        self.in_flight: int = 0
+        self.last_activity: float | None = None
+
+    @property
+    def idle_time(self) -> float | None:
+        """Return the number of seconds since the host was last used."""
+        if self.last_activity is None:
+            return None
+        return time.monotonic() - self.last_activity
+
+    def record_activity(self) -> None:
+        """Record that a request to the host completed."""
+        self.last_activity = time.monotonic()
+
+    def record_disconnect(self) -> None:
+        """Record that the host closed a pooled connection on us."""
+        idle_time = self.idle_time
+        if idle_time is None or idle_time < MIN_IDLE_CLOSE_WINDOW:
+            return
+        self._disconnect_idle_times.append(idle_time)
+        if len(self._disconnect_idle_times) >= MIN_IDLE_CLOSE_SAMPLES:
+            self.idle_close_window = median_high(self._disconnect_idle_times)
+
+    def record_reuse(self, idle_time: float | None) -> None:
+        """Record that a pooled connection idle for idle_time seconds was reused."""
+        if (
+            idle_time is None
+            or self.idle_close_window is None
+            or idle_time <= self.idle_close_window
+        ):
+            return
+        # The host kept the connection open for longer than we thought it would, so
+        # earlier disconnects must have had some other cause:
+        self._disconnect_idle_times.clear()
+        self.idle_close_window = idle_time
+
+    def should_retire_connections(self) -> bool:
+        """Return whether pooled connections are likely to have been closed.
+
+        Every IDLE_CLOSE_PROBE_INTERVAL times this would be the case, the connections
+        are kept anyway (to learn whether the window has grown).
+        """
+        if self.in_flight or self.idle_close_window is None:
+            return False
+        idle_time = self.idle_time
+        if idle_time is None:
+            return False
+        if idle_time < self.idle_close_window * IDLE_CLOSE_WINDOW_MARGIN:
+            return False
+        self._retirements += 1
+        return self._retirements % IDLE_CLOSE_PROBE_INTERVAL != 0
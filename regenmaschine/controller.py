@@ -1,9 +1,18 @@
 """Define a RainMachine controller class."""
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timedelta
-from typing import Any, Awaitable, Callable
+from functools import partial
+import json
+import logging
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, TypeVar, Union, cast
 
+from regenmaschine.cache import HistoryCache, ResponseCache
+from regenmaschine.capabilities import Capabilities
+from regenmaschine.circuit import CircuitBreaker
+from regenmaschine.concurrency import AdaptiveConcurrencyLimiter
 from regenmaschine.endpoints.api import API
 from regenmaschine.endpoints.diagnostics import Diagnostics
 from regenmaschine.endpoints.machine import Machine
@@ -14,9 +23,50 @@ from regenmaschine.endpoints.restriction import Restriction
 from regenmaschine.endpoints.stats import Stats
 from regenmaschine.endpoints.watering import Watering
 from regenmaschine.endpoints.zone import Zone
+from regenmaschine.errors import RequestError, TokenExpiredError, UnknownAPICallError
+from regenmaschine.ratelimit import TokenBucket
+from regenmaschine.retry import get_endpoint_template
+from regenmaschine.timeouts import (
+    RTTEstimator,
+    run_without_deadline,
+    wait_with_deadline,
+)
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
 
 URL_BASE_LOCAL: str = "https://{0}:{1}/api/4"
 URL_BASE_REMOTE: str = "https://api.rainmachine.com/{0}/api/4"
+URL_REMOTE_LOGIN: str = "https://my.rainmachine.com/login/auth"
+URL_REMOTE_SPRINKLER_LOGIN: str = "https://my.rainmachine.com/devices/login-sprinkler"
+URL_REMOTE_SPRINKLERS: str = "https://my.rainmachine.com/devices/get-sprinklers"
+
+# The hosts of the RainMachine cloud (shared by every remote controller):
+CLOUD_HOSTS: tuple[str, ...] = ("api.rainmachine.com", "my.rainmachine.com")
+
+# Access tokens are refreshed (in the background) once they're this close to expiring:
+TOKEN_REFRESH_WINDOW: timedelta = timedelta(minutes=5)
+
+# Remote controllers widen their refresh window by a random amount up to this, so that
+# the controllers of an account (which tend to log in together) don't all refresh their
+# tokens in the same burst:
+TOKEN_REFRESH_STAGGER: timedelta = timedelta(minutes=10)
+
+RequestKey = Union[str, Tuple[str, str]]
+
+_T = TypeVar("_T")
+
+
+def _consume_task_exception(task: asyncio.Task) -> None:
+    """Retrieve a task's exception (in case every waiter has been cancelled)."""
+    if not task.cancelled():
+        task.exception()
+
+
+def _get_request_key(endpoint: str, kwargs: dict[str, Any]) -> RequestKey:
+    """Return a key that identifies identical requests to an endpoint."""
+    if not kwargs:
+        return endpoint
+    return (endpoint, json.dumps(kwargs, sort_keys=True, default=str))
 
 
 class Controller:  # pylint: disable=too-many-instance-attributes
@@ -28,11 +78,24 @@ class Controller:  # pylint: disable=too-many-instance-attributes
         self._access_token_expiration: datetime | None = None
         self._client_request = request
         self._host: str = ""
+        self._in_flight_requests: Dict[RequestKey, asyncio.Task] = {}
+        self._login_count = 0
+        self._login_task: asyncio.Task | None = None
+        self._token_refresh_window = TOKEN_REFRESH_WINDOW
         self._use_ssl = True
         self.api_version: str = ""
+        self.cache: ResponseCache | None = None
+        self.capabilities = Capabilities(self)
+        self.circuit_breaker: CircuitBreaker | None = None
+        self.concurrency_limiter: AdaptiveConcurrencyLimiter | None = None
+        self.coalesce_requests: bool = True
+        self.coalesced_requests: int = 0
         self.hardware_version: str = ""
+        self.history: HistoryCache | None = None
         self.mac: str = ""
         self.name: str = ""
+        self.rtt_estimator_factory: Callable[[], RTTEstimator] | None = None
+        self.rtt_estimators: dict[str, RTTEstimator] = {}
         self.software_version: str = ""
 
         # API endpoints:
@@ -47,22 +110,263 @@ class Controller:  # pylint: disable=too-many-instance-attributes
         self.watering = Watering(self)
         self.zones = Zone(self)
 
-    async def request(
+    def _restore(self, data: dict[str, Any]) -> None:
+        """Restore the state produced by to_dict()."""
+        self._access_token = data["access_token"]
+        if expiration := data.get("access_token_expiration"):
+            self._access_token_expiration = datetime.fromisoformat(expiration)
+        self.api_version = data["api_version"]
+        if capabilities := data.get("capabilities"):
+            self.capabilities.load(capabilities)
+        self.hardware_version = data["hardware_version"]
+        self.mac = data["mac"]
+        self.name = data["name"]
+        self.software_version = data["software_version"]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the controller's session and metadata in a JSON-serializable form.
+
+        Note that the result includes the controller's access token and should be
+        stored accordingly.
+        """
+        return {
+            "access_token": self._access_token,
+            "access_token_expiration": self._access_token_expiration.isoformat()
+            if self._access_token_expiration
+            else None,
+            "api_version": self.api_version,
+            "capabilities": self.capabilities.as_dict(),
+            "hardware_version": self.hardware_version,
+            "mac": self.mac,
+            "name": self.name,
+            "software_version": self.software_version,
+        }
+
+    def _get_in_flight_request(
+        self, endpoint: str, key: RequestKey, **kwargs: dict[str, Any]
+    ) -> asyncio.Task:
+        """Return the in-flight task for a GET request (starting one if needed).
+
+        The request runs in its own task so that cancelling one waiter doesn't cancel
+        it for the others (and outside of any deadline, which each waiter applies on
+        its own). Note that every waiter receives the same object.
+        """
+        if (task := self._in_flight_requests.get(key)) is not None:
+            self.coalesced_requests += 1
+            return task
+
+        task = asyncio.create_task(
+            run_without_deadline(self._get(endpoint, key, **kwargs))
+        )
+        self._in_flight_requests[key] = task
+
+        def _on_done(_: asyncio.Task) -> None:
+            """Stop tracking the task (unless a write already did)."""
+            if self._in_flight_requests.get(key) is task:
+                del self._in_flight_requests[key]
+
+        task.add_done_callback(_on_done)
+        task.add_done_callback(_consume_task_exception)
+
+        return task
+
+    async def _get(
+        self, endpoint: str, key: RequestKey, **kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Make a GET request (caching the response if appropriate)."""
+        if self.cache is None:
+            return await self._request("get", endpoint, **kwargs)
+
+        generation = self.cache.generation
+        data = await self._request("get", endpoint, **kwargs)
+        self.cache.set(key, endpoint, data, generation=generation)
+        return data
+
+    def _can_log_in_again(self) -> bool:
+        """Return whether the controller has what it needs to log in on its own."""
+        return False
+
+    async def _log_in_again(self) -> None:
+        """Log in again (with the credentials kept from the last login).
+
+        Controllers that can't log in on their own (see _can_log_in_again()) fail the
+        same way an expired access token does.
+        """
+        raise TokenExpiredError("The controller can't log in again on its own")
+
+    def _get_rate_limiter(self) -> TokenBucket | None:
+        """Return the rate limiter for the controller's requests (if not the host's)."""
+        return None
+
+    def _get_login_task(self) -> asyncio.Task:
+        """Return the in-flight login task (starting one if needed)."""
+        if (task := self._login_task) is not None:
+            return task
+
+        task = self._login_task = asyncio.create_task(
+            run_without_deadline(self._log_in_again())
+        )
+
+        def _on_done(_: asyncio.Task) -> None:
+            """Stop tracking the task."""
+            if self._login_task is task:
+                self._login_task = None
+
+        task.add_done_callback(_on_done)
+        task.add_done_callback(_consume_task_exception)
+
+        return task
+
+    async def _request(
+        self, method: str, endpoint: str, **kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Make a request to the controller (logging in again if needed).
+
+        If the controller can log in on its own, an access token that's about to expire
+        is refreshed in the background and a request that fails because the token has
+        expired anyway is retried (once) after logging in again. Concurrent requests
+        share a single login.
+        """
+        if not self._can_log_in_again():
+            return await self._send_request(method, endpoint, **kwargs)
+
+        if self._access_token_expiration is not None:
+            remaining = self._access_token_expiration - datetime.now()
+            if remaining <= timedelta(0):
+                await wait_with_deadline(lambda: asyncio.shield(self._get_login_task()))
+            elif remaining <= self._token_refresh_window:
+                # Refresh the token in the background; this request can still use the
+                # current one:
+                self._get_login_task()
+
+        login_count = self._login_count
+        try:
+            return await self._send_request(method, endpoint, **kwargs)
+        except TokenExpiredError:
+            # If another request already logged in again while this one was in
+            # flight, there's no need to do it again:
+            if self._login_count == login_count:
+                _LOGGER.debug("Access token has expired; logging in again")
+                await wait_with_deadline(lambda: asyncio.shield(self._get_login_task()))
+            return await self._send_request(method, endpoint, **kwargs)
+
+    def get_rtt_estimator(self, endpoint: str) -> RTTEstimator | None:
+        """Return the round-trip time estimator for an endpoint (if there is one).
+
+        Endpoints differ too much in how long they take to share a single estimate, so
+        each endpoint template (e.g., "zone/*/properties") gets its own estimator.
+        """
+        if self.rtt_estimator_factory is None:
+            return None
+        template = get_endpoint_template(endpoint)
+        if (estimator := self.rtt_estimators.get(template)) is None:
+            # pylint: disable-next=not-callable
+            estimator = self.rtt_estimators[template] = self.rtt_estimator_factory()
+        return estimator
+
+    async def _call_endpoint(
         self, method: str, endpoint: str, **kwargs: dict[str, Any]
     ) -> dict[str, Any]:
-        """Wrap the generic request method to add access token, etc."""
+        """Make a network call to one of the controller's endpoints."""
         return await self._client_request(
             method,
             f"{self._host}/{endpoint}",
             access_token=self._access_token,
             access_token_expiration=self._access_token_expiration,
             use_ssl=self._use_ssl,
+            concurrency_limiter=self.concurrency_limiter,
+            rate_limiter=self._get_rate_limiter(),
+            rtt_estimator=self.get_rtt_estimator(endpoint),
             **kwargs,
         )
 
+    async def _send_request(
+        self, method: str, endpoint: str, **kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Make a request to the controller (without any coalescing).
+
+        Calls to endpoints that the controller is known not to support (or calls made
+        while the controller's circuit is open) fail immediately (without a network
+        call).
+        """
+        if not self.capabilities.supports_endpoint(method, endpoint):
+            raise UnknownAPICallError(
+                f"{method.upper()} {endpoint} is not supported by this controller"
+            )
+
+        try:
+            if self.circuit_breaker is None:
+                return await self._call_endpoint(method, endpoint, **kwargs)
+            return await self.circuit_breaker.call(
+                partial(self._call_endpoint, method, endpoint, **kwargs),
+                partial(self._call_endpoint, "get", "apiVer"),
+            )
+        except UnknownAPICallError:
+            self.capabilities.mark_unsupported(method, endpoint)
+            raise
+
+    async def request(
+        self, method: str, endpoint: str, **kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Wrap the generic request method to add access token, etc.
+
+        GET responses are served from the controller's cache (if one is configured)
+        while they are fresh; identical GET requests that are made while one is already
+        in flight are coalesced into a single network call (unless coalesce_requests is
+        False). Any other request invalidates the cached data it may affect.
+        """
+        if method.lower() != "get":
+            return await self._write(method, endpoint, **kwargs)
+
+        key = _get_request_key(endpoint, kwargs)
+
+        if self.cache is not None:
+            if (data := self.cache.get(key)) is not None:
+                return data
+            if (
+                self.cache.stale_while_revalidate
+                and (data := self.cache.get_stale(key)) is not None
+            ):
+                # Serve the stale response now and refresh it in the background:
+                self._get_in_flight_request(endpoint, key, **kwargs)
+                return data
+
+        try:
+            if self.coalesce_requests:
+                return await wait_with_deadline(
+                    lambda: asyncio.shield(
+                        self._get_in_flight_request(endpoint, key, **kwargs)
+                    )
+                )
+            return await self._get(endpoint, key, **kwargs)
+        except (TokenExpiredError, UnknownAPICallError):
+            raise
+        except RequestError as err:
+            # If the controller can't be reached, fall back to a stale response:
+            if self.cache is None or (data := self.cache.get_stale(key)) is None:
+                raise
+            _LOGGER.debug("Serving stale data for %s: %s", endpoint, err)
+            return data
+
+    async def _write(
+        self, method: str, endpoint: str, **kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Make a request that may change the controller's state."""
+        try:
+            return await self._request(method, endpoint, **kwargs)
+        finally:
+            # Reads that start after this point shouldn't see pre-write data:
+            self._in_flight_requests.clear()
+            if self.cache is not None:
+                self.cache.invalidate(endpoint)
+
+
+class LocalController(Controller):  # pylint: disable=too-many-instance-attributes
+    """Define a controller accessed over the LAN.
 
-class LocalController(Controller):
-    """Define a controller accessed over the LAN."""
+    Once the controller has logged in, it keeps the password (in memory only) so that
+    it can log in again on its own.
+    """
 
     def __init__(  # pylint: disable=too-many-arguments
         self,
@@ -75,8 +379,39 @@ class LocalController(Controller):
         super().__init__(request)
 
         self._host = URL_BASE_LOCAL.format(host, port)
+        self._local_host = host
+        self._password: str | None = None
+        self._port = port
         self._use_ssl = use_ssl
 
+    @classmethod
+    def from_dict(
+        cls,
+        request: Callable[..., Awaitable[dict]],
+        data: dict[str, Any],
+        password: str | None = None,
+    ) -> LocalController:
+        """Restore a controller from to_dict() output (without any network calls).
+
+        If a password is provided, the controller uses it to log in again whenever the
+        restored access token turns out to be expired.
+        """
+        controller = cls(request, data["host"], data["port"], data["use_ssl"])
+        controller._restore(data)
+        controller._password = password
+        return controller
+
+    def _can_log_in_again(self) -> bool:
+        """Return whether the controller has what it needs to log in on its own."""
+        return self._password is not None
+
+    async def _log_in_again(self) -> None:
+        """Log in again (with the password kept from the last login)."""
+        if self._password is None:
+            await super()._log_in_again()
+        else:
+            await self.login(self._password)
+
     async def login(self, password: str) -> None:
         """Authenticate against the device (locally)."""
         auth_resp = await self._client_request(
@@ -87,10 +422,195 @@ class LocalController(Controller):
         self._access_token_expiration: datetime = datetime.now() + timedelta(
             seconds=int(auth_resp["expires_in"]) - 10
         )
+        self._login_count += 1
+        self._password = password
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the controller's session and metadata in a JSON-serializable form."""
+        return {
+            **super().to_dict(),
+            "host": self._local_host,
+            "port": self._port,
+            "use_ssl": self._use_ssl,
+        }
+
+
+def _get_token_expiration(auth_resp: dict[str, Any]) -> datetime | None:
+    """Return the expiration of a cloud access token (if the cloud reports one)."""
+    if (expires_in := auth_resp.get("expires_in")) is None:
+        return None
+    return datetime.now() + timedelta(seconds=int(expires_in) - 10)
+
+
+class RemoteAccount:
+    """Define a RainMachine cloud account.
+
+    The account's (stage 1) access token is cached and shared by the account's remote
+    controllers, which use it to log in to their sprinklers again. If the token expires
+    (or is rejected), the account logs in again; concurrent callers share a single
+    login.
+    """
+
+    def __init__(
+        self,
+        request: Callable[..., Awaitable[dict]],
+        email: str,
+        password: str,
+        *,
+        rate_limiter: TokenBucket | None = None,
+    ) -> None:
+        """Initialize.
+
+        If provided, rate_limiter is shared by every request made on behalf of the
+        account (including those made by its controllers).
+        """
+        self._access_token: str | None = None
+        self._access_token_expiration: datetime | None = None
+        self._client_request = request
+        self._login_task: asyncio.Task | None = None
+        self.email = email
+        self.password = password
+        self.rate_limiter = rate_limiter
+
+    async def get_access_token(self, *, rejected: str | None = None) -> str:
+        """Return a valid access token for the account (logging in if needed).
+
+        If rejected is provided (and is still the cached token), the cached token is
+        discarded first.
+        """
+        if rejected is not None and rejected == self._access_token:
+            self._access_token = None
+
+        if self._access_token is not None and (
+            self._access_token_expiration is None
+            or datetime.now() < self._access_token_expiration
+        ):
+            return self._access_token
+
+        return cast(
+            str,
+            await wait_with_deadline(lambda: asyncio.shield(self._get_login_task())),
+        )
+
+    def _get_login_task(self) -> asyncio.Task:
+        """Return the in-flight login task (starting one if needed)."""
+        if (task := self._login_task) is not None:
+            return task
+
+        task = self._login_task = asyncio.create_task(
+            run_without_deadline(self.login())
+        )
+
+        def _on_done(_: asyncio.Task) -> None:
+            """Stop tracking the task."""
+            if self._login_task is task:
+                self._login_task = None
+
+        task.add_done_callback(_on_done)
+        task.add_done_callback(_consume_task_exception)
+
+        return task
+
+    async def call_with_access_token(self, call: Callable[[str], Awaitable[_T]]) -> _T:
+        """Call a function with the account's access token.
+
+        If the cloud rejects the (cached) token, the account logs in again (sharing the
+        login with any concurrent callers) and the call is retried once.
+        """
+        access_token = await self.get_access_token()
+        try:
+            return await call(access_token)
+        except TokenExpiredError:
+            access_token = await self.get_access_token(rejected=access_token)
+            return await call(access_token)
+
+    async def get_sprinklers(self) -> list[dict[str, Any]]:
+        """Return the sprinklers associated with the account."""
+        sprinklers_resp = await self.call_with_access_token(
+            lambda access_token: self._client_request(
+                "post",
+                URL_REMOTE_SPRINKLERS,
+                access_token=access_token,
+                rate_limiter=self.rate_limiter,
+                json={
+                    "user": {"email": self.email, "pwd": self.password, "remember": 1}
+                },
+            )
+        )
+        return cast(List[Dict[str, Any]], sprinklers_resp["sprinklers"])
+
+    async def login(self) -> str:
+        """Authenticate against the RainMachine cloud (returning the access token)."""
+        auth_resp = await self._client_request(
+            "post",
+            URL_REMOTE_LOGIN,
+            rate_limiter=self.rate_limiter,
+            json={"user": {"email": self.email, "pwd": self.password, "remember": 1}},
+        )
+
+        access_token: str = auth_resp["access_token"]
+        self._access_token = access_token
+        self._access_token_expiration = _get_token_expiration(auth_resp)
+        return access_token
 
 
 class RemoteController(Controller):
-    """Define a controller accessed over RainMachine's cloud."""
+    """Define a controller accessed over RainMachine's cloud.
+
+    Controllers that belong to a RemoteAccount use it to log in to their sprinklers
+    again on their own.
+    """
+
+    def __init__(
+        self,
+        request: Callable[..., Awaitable[dict]],
+        account: RemoteAccount | None = None,
+    ) -> None:
+        """Initialize."""
+        super().__init__(request)
+
+        self._account = account
+        self._sprinkler_id: str = ""
+        self._token_refresh_window = TOKEN_REFRESH_WINDOW + timedelta(
+            seconds=random.uniform(0, TOKEN_REFRESH_STAGGER.total_seconds())
+        )
+
+    @classmethod
+    def from_dict(
+        cls,
+        request: Callable[..., Awaitable[dict]],
+        data: dict[str, Any],
+        account: RemoteAccount | None = None,
+    ) -> RemoteController:
+        """Restore a controller from to_dict() output (without any network calls).
+
+        If an account is provided, the controller uses it to log in again whenever the
+        restored access token turns out to be expired.
+        """
+        controller = cls(request, account)
+        controller._restore(data)
+        controller._sprinkler_id = data["sprinkler_id"]
+        controller._host = URL_BASE_REMOTE.format(controller._sprinkler_id)
+        return controller
+
+    def _can_log_in_again(self) -> bool:
+        """Return whether the controller has what it needs to log in on its own."""
+        return self._account is not None
+
+    def _get_rate_limiter(self) -> TokenBucket | None:
+        """Return the rate limiter for the controller's requests (if not the host's)."""
+        if self._account is None:
+            return None
+        return self._account.rate_limiter
+
+    async def _log_in_again(self) -> None:
+        """Log in to the sprinkler again (using the account's access token)."""
+        if (account := self._account) is None:
+            await super()._log_in_again()
+        else:
+            await account.call_with_access_token(
+                lambda token: self.login(token, self._sprinkler_id, account.password)
+            )
 
     async def login(
         self, stage_1_access_token: str, sprinkler_id: str, password: str
@@ -98,10 +618,18 @@ class RemoteController(Controller):
         """Authenticate against the device (remotely)."""
         auth_resp: dict = await self._client_request(
             "post",
-            "https://my.rainmachine.com/devices/login-sprinkler",
+            URL_REMOTE_SPRINKLER_LOGIN,
             access_token=stage_1_access_token,
+            rate_limiter=self._get_rate_limiter(),
             json={"sprinklerId": sprinkler_id, "pwd": password},
         )
 
         self._access_token = auth_resp["access_token"]
+        self._access_token_expiration = _get_token_expiration(auth_resp)
         self._host = URL_BASE_REMOTE.format(sprinkler_id)
+        self._login_count += 1
+        self._sprinkler_id = sprinkler_id
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the controller's session and metadata in a JSON-serializable form."""
+        return {**super().to_dict(), "sprinkler_id": self._sprinkler_id}
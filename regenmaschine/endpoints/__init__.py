@@ -2,10 +2,11 @@
 from __future__ import annotations
 
 from collections.abc import Awaitable, Callable
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 from typing_extensions import ParamSpec
 
+from regenmaschine.capabilities import GEN1_HARDWARE_VERSION
 from regenmaschine.errors import UnknownAPICallError
 
 if TYPE_CHECKING:
@@ -23,15 +24,26 @@ class EndpointManager:
 
     @staticmethod
     def raise_on_gen1_controller(func: Callable[..., Awaitable]) -> Callable:
-        """Raise an error if a method is called on a 1st generation controller."""
+        """Raise an error if a method is called on a 1st generation controller.
 
-        def decorator(
+        The same goes for controllers that have already shown (per their capability
+        map) that they don't support the method.
+        """
+
+        async def decorator(
             inst: type[EndpointManager], *args: P.args, **kwargs: P.kwargs
-        ) -> Awaitable:
-            if inst.controller.hardware_version == "1":
+        ) -> Any:
+            controller = inst.controller
+            if not controller.capabilities.supports_feature(func.__qualname__):
                 raise UnknownAPICallError(
                     f"Can't call {func.__name__} on a 1st generation controller"
+                    if controller.hardware_version == GEN1_HARDWARE_VERSION
+                    else f"Can't call {func.__name__}: the controller doesn't support it"
                 )
-            return func(inst, *args, **kwargs)
+            try:
+                return await func(inst, *args, **kwargs)
+            except UnknownAPICallError:
+                controller.capabilities.mark_feature_unsupported(func.__qualname__)
+                raise
 
         return decorator
@@ -23,7 +23,8 @@ class Machine(EndpointManager):
             # 1st generation controllers don't support the POST /machine/update/check
             # endpoint, so if that call fails because of an UnknownAPICallError, swallow
             # it (with the assumption that GET /machine/update will return the needed
-            # information):
+            # information). Once that failure has been seen, the controller's capability
+            # map prevents the call from being made again:
             pass
         return await self.controller.request("get", "machine/update")
 
@@ -12,10 +12,20 @@ class Stats(EndpointManager):
 
     async def on_date(self, date: datetime.date) -> dict[str, Any]:
         """Get statistics for a certain date."""
-        return await self.controller.request(
+        history = self.controller.history
+        if history is not None and history.is_immutable(date):
+            if cached := history.get("dailystats", date):
+                return cached[0]
+
+        data = await self.controller.request(
             "get", f"dailystats/{date.strftime('%Y-%m-%d')}"
         )
 
+        if history is not None:
+            history.set("dailystats", date, [data])
+
+        return data
+
     async def upcoming(self, details: bool = False) -> list[dict[str, Any]]:
         """Return watering statistics for the next 6 days."""
         endpoint = "dailystats"
@@ -24,8 +24,19 @@ class Watering(EndpointManager):
         if details:
             endpoint += "/details"
 
+        async def fetch(date: datetime.date, days: int) -> list[dict[str, Any]]:
+            """Get the watering log for X days from Y date."""
+            data = await self.controller.request(
+                "get", f"{endpoint}/{date.strftime('%Y-%m-%d')}/{days}"
+            )
+            return cast(List[Dict[str, Any]], data["waterLog"]["days"])
+
         if date and days:
-            endpoint = f"{endpoint}/{date.strftime('%Y-%m-%d')}/{days}"
+            if self.controller.history is None:
+                return await fetch(date, days)
+            return await self.controller.history.get_range(
+                endpoint, date, days, fetch, lambda day: cast(str, day["date"])
+            )
 
         data = await self.controller.request("get", endpoint)
         return cast(List[Dict[str, Any]], data["waterLog"]["days"])
@@ -55,8 +66,19 @@ class Watering(EndpointManager):
         """Return all program runs for X days from Y date."""
         endpoint = "watering/past"
 
+        async def fetch(date: datetime.date, days: int) -> list[dict[str, Any]]:
+            """Get program runs for X days from Y date."""
+            data = await self.controller.request(
+                "get", f"{endpoint}/{date.strftime('%Y-%m-%d')}/{days}"
+            )
+            return cast(List[Dict[str, Any]], data["pastValues"])
+
         if date and days:
-            endpoint = f"{endpoint}/{date.strftime('%Y-%m-%d')}/{days}"
+            if self.controller.history is None:
+                return await fetch(date, days)
+            return await self.controller.history.get_range(
+                endpoint, date, days, fetch, lambda run: cast(str, run["dateTime"])
+            )
 
         data = await self.controller.request("get", endpoint)
         return cast(List[Dict[str, Any]], data["pastValues"])
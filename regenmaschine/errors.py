@@ -1,10 +1,10 @@
 """Define package errors."""
 from __future__ import annotations
 
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from aiohttp import ClientResponse
-from aiohttp.client_exceptions import ClientError
+if TYPE_CHECKING:
+    from regenmaschine.middleware import Response
 
 
 class RainMachineError(Exception):
@@ -19,6 +19,27 @@ class RequestError(RainMachineError):
     pass
 
 
+class CircuitOpenError(RequestError):
+    """Define an error for requests to a controller whose circuit is open."""
+
+    pass
+
+
+class TransientError(RequestError):
+    """Define an error that is likely to go away if the request is retried."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        """Initialize."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RequestTimeoutError(TransientError):
+    """Define an error for requests that time out."""
+
+    pass
+
+
 class TokenExpiredError(RequestError):
     """Define an error for expired access tokens that can't be refreshed."""
 
@@ -70,7 +91,7 @@ def _raise_remote_api_error(url: str, error_code: int) -> None:
     raise exc
 
 
-def raise_for_error(resp: ClientResponse, data: dict[str, Any] | None) -> None:
+def raise_for_error(resp: Response, data: dict[str, Any] | None) -> None:
     """Raise an error from the remote API if necessary."""
     if data:
         if data.get("errorType") and data["errorType"] > 0:
@@ -82,8 +103,8 @@ def raise_for_error(resp: ClientResponse, data: dict[str, Any] | None) -> None:
             # RainMachine's local cloud uses "statusCode" to show errors, so if we find
             # that, we assume we need to raise a local error:
             _raise_local_api_error(resp.url, data["statusCode"], data["message"])
-    else:
-        try:
-            resp.raise_for_status()
-        except ClientError as err:
-            raise RequestError(f"Error while requesting {resp.url}: {err}") from err
+    elif resp.status >= 400:
+        raise RequestError(
+            f"Error while requesting {resp.url}: {resp.status}, "
+            f"message={resp.reason!r}"
+        )
@@ -0,0 +1,112 @@
+"""Define the middleware chain that requests pass through."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable, Mapping
+
+from regenmaschine.concurrency import AdaptiveConcurrencyLimiter
+from regenmaschine.errors import RequestError, raise_for_error
+from regenmaschine.ratelimit import TokenBucket
+from regenmaschine.retry import RetryPolicy
+from regenmaschine.timeouts import RTTEstimator, get_remaining_time
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Request:  # pylint: disable=too-many-instance-attributes
+    """Define a request on its way through the middleware chain.
+
+    kwargs are the keyword arguments for the underlying HTTP request (e.g., headers,
+    params, and data, the already-encoded JSON body); middlewares may modify them.
+    """
+
+    method: str
+    url: str
+    host: str
+    kwargs: dict[str, Any]
+    use_ssl: bool = True
+    concurrency_limiter: AdaptiveConcurrencyLimiter | None = None
+    rate_limiter: TokenBucket | None = None
+    rtt_estimator: RTTEstimator | None = None
+
+
+@dataclass
+class Response:
+    """Define a response on its way back through the middleware chain.
+
+    body is the raw body received by the transport; data is what it was parsed into.
+    """
+
+    status: int
+    url: str
+    data: Any
+    headers: Mapping[str, str] = field(default_factory=dict)
+    reason: str | None = None
+    body: bytes = b""
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+Middleware = Callable[[Request, Handler], Awaitable[Response]]
+
+
+def compose(middlewares: Iterable[Middleware], handler: Handler) -> Handler:
+    """Return a handler that passes requests through middlewares (in order)."""
+    for middleware in reversed(list(middlewares)):
+        handler = _bind(middleware, handler)
+    return handler
+
+
+def _bind(middleware: Middleware, handler: Handler) -> Handler:
+    """Bind a middleware to the handler it wraps."""
+    return lambda request: middleware(request, handler)
+
+
+async def raise_for_error_middleware(request: Request, handler: Handler) -> Response:
+    """Raise the appropriate error for responses that indicate one."""
+    response = await handler(request)
+    raise_for_error(response, response.data)
+    return response
+
+
+class RetryMiddleware:  # pylint: disable=too-few-public-methods
+    """Define a middleware that retries failed requests according to a policy."""
+
+    def __init__(self, get_policy: Callable[[str], RetryPolicy]) -> None:
+        """Initialize.
+
+        get_policy returns the retry policy for a host.
+        """
+        self._get_policy = get_policy
+
+    async def __call__(self, request: Request, handler: Handler) -> Response:
+        """Make a request (retrying it if needed)."""
+        policy = self._get_policy(request.host)
+        start = time.monotonic()
+        attempt = 1
+
+        while True:
+            try:
+                return await handler(request)
+            except RequestError as err:
+                if attempt >= policy.max_attempts or not (
+                    policy.is_retryable(request.method, request.url, err)
+                ):
+                    raise
+                delay = policy.get_delay(attempt, err)
+                if (
+                    policy.deadline is not None
+                    and time.monotonic() - start + delay > policy.deadline
+                ) or (
+                    (remaining := get_remaining_time()) is not None
+                    and delay >= remaining
+                ):
+                    raise
+                _LOGGER.debug(
+                    "Retrying %s in %.2f seconds: %s", request.url, delay, err
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -0,0 +1,81 @@
+"""Define token-bucket rate limiting for controllers and the cloud API."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import time
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Define a rate limit.
+
+    rate: the number of requests allowed per second (on average).
+    burst: the number of requests that can be made at once after a quiet period.
+    """
+
+    rate: float
+    burst: int = 1
+
+    def create_bucket(self) -> TokenBucket:
+        """Create a token bucket that implements this limit."""
+        return TokenBucket(self.rate, self.burst)
+
+
+class TokenBucket:  # pylint: disable=too-many-instance-attributes
+    """Define a token bucket.
+
+    Every request takes a token from the bucket, which refills at a constant rate (up
+    to its capacity). Requests that find the bucket empty wait for a token (in the
+    order they arrived) rather than failing.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        """Initialize."""
+        self._lock = asyncio.Lock()
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self.acquired: int = 0
+        self.capacity = capacity
+        self.rate = rate
+        self.wait_time: float = 0.0
+        self.waiting: int = 0
+
+    def _refill(self) -> None:
+        """Add the tokens that have accrued since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._updated_at) * self.rate, self.capacity
+        )
+        self._updated_at = now
+
+    @property
+    def average_wait_time(self) -> float:
+        """Return the average number of seconds a request has waited for a token."""
+        if not self.acquired:
+            return 0.0
+        return self.wait_time / self.acquired
+
+    @property
+    def tokens(self) -> float:
+        """Return the number of tokens currently in the bucket."""
+        self._refill()
+        return self._tokens
+
+    async def acquire(self) -> None:
+        """Take a token from the bucket (waiting for one if needed)."""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            # asyncio.Lock wakes its waiters in FIFO order, which keeps things fair:
+            async with self._lock:
+                self._refill()
+                if self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    self._refill()
+                self._tokens -= 1
+        finally:
+            self.waiting -= 1
+
+        self.acquired += 1
+        self.wait_time += time.monotonic() - start
@@ -0,0 +1,93 @@
+"""Define policies for retrying failed requests."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatch
+import random
+
+from yarl import URL
+
+from regenmaschine.errors import RequestError, TransientError
+
+# Methods that can always be retried (RainMachine's APIs don't use PUT or DELETE, but
+# they are idempotent by definition):
+IDEMPOTENT_METHODS = frozenset({"delete", "get", "head", "options", "put"})
+
+
+def get_endpoint(url: str) -> str:
+    """Return the endpoint that a URL refers to (e.g., "zone/1/start")."""
+    path = URL(url).path
+    if "/api/4/" in path:  # pylint: disable=unsupported-membership-test
+        return path.split("/api/4/", 1)[1]
+    return path.lstrip("/")
+
+
+def get_endpoint_template(endpoint: str) -> str:
+    """Return an endpoint with its IDs and dates wildcarded (e.g., "zone/*/start")."""
+    return "/".join(
+        "*" if any(char.isdigit() for char in segment) else segment
+        for segment in endpoint.split("/")
+    )
+
+
+def get_retry_after(value: str | None) -> float | None:
+    """Return the number of seconds a Retry-After header value asks us to wait."""
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Define how failed requests are retried.
+
+    max_attempts: the maximum number of attempts per request (1 disables retrying).
+    backoff_base: the delay (in seconds) before the first retry, doubling every time.
+    backoff_max: the maximum delay (in seconds) between attempts.
+    jitter: the fraction of each delay that is randomized (0 is none, 1 is "full").
+    deadline: the maximum number of seconds to spend on a request, including delays.
+    idempotent_posts: fnmatch-style patterns of POST endpoints that are safe to retry.
+
+    Only TransientErrors (timeouts, connection errors, HTTP 429s and 5xxs) are retried;
+    if the server sends a Retry-After header, it's honored. Note that a single
+    ServerDisconnectedError (i.e., a stale keep-alive connection) is always retried
+    immediately, regardless of the policy.
+    """
+
+    max_attempts: int = 1
+    backoff_base: float = 0.5
+    backoff_max: float = 10.0
+    jitter: float = 1.0
+    deadline: float | None = None
+    idempotent_posts: tuple[str, ...] = ()
+
+    def get_delay(self, attempt: int, err: RequestError) -> float:
+        """Return the number of seconds to wait before retrying a failed attempt."""
+        delay = min(self.backoff_base * 2.0 ** (attempt - 1), self.backoff_max)
+        delay -= delay * self.jitter * random.random()
+        if isinstance(err, TransientError) and err.retry_after is not None:
+            delay = max(delay, err.retry_after)
+        return delay
+
+    def is_retryable(self, method: str, url: str, err: RequestError) -> bool:
+        """Return whether a failed request can be retried."""
+        if not isinstance(err, TransientError):
+            return False
+        if method.lower() in IDEMPOTENT_METHODS:
+            return True
+        endpoint = get_endpoint(url)
+        return any(fnmatch(endpoint, pattern) for pattern in self.idempotent_posts)
@@ -0,0 +1,131 @@
+"""Define request timeouts (adaptive ones and deadlines)."""
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Awaitable, Callable, Iterator, TypeVar
+
+import async_timeout
+
+from regenmaschine.errors import RequestTimeoutError
+
+_T = TypeVar("_T")
+
+# The constants from RFC 6298 (https://datatracker.ietf.org/doc/html/rfc6298):
+RTT_ALPHA: float = 1 / 8
+RTT_BETA: float = 1 / 4
+RTT_K: int = 4
+
+DEFAULT_MIN_TIMEOUT: float = 1.0
+DEFAULT_MAX_TIMEOUT: float = 30.0
+
+_DEADLINE: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Bound the time that requests made within the context can take (in total).
+
+    The deadline flows through everything awaited within the context, including tasks
+    created with asyncio.gather(), so concurrent requests share a single budget. Nested
+    deadlines can only shorten it.
+    """
+    deadline_at = time.monotonic() + seconds
+    if (outer_deadline_at := _DEADLINE.get()) is not None:
+        deadline_at = min(deadline_at, outer_deadline_at)
+
+    token = _DEADLINE.set(deadline_at)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def get_remaining_time() -> float | None:
+    """Return the number of seconds left before the current deadline (if any)."""
+    if (deadline_at := _DEADLINE.get()) is None:
+        return None
+    return deadline_at - time.monotonic()
+
+
+async def run_without_deadline(awaitable: Awaitable[_T]) -> _T:
+    """Await something regardless of the current deadline (if any).
+
+    This is meant for tasks whose results are shared by several callers (e.g.,
+    coalesced requests): since a task runs in a copy of the context it was created in,
+    it would otherwise be bound by the deadline of whichever caller happened to start
+    it. Each caller should apply its own deadline with wait_with_deadline() instead.
+    """
+    _DEADLINE.set(None)
+    return await awaitable
+
+
+async def wait_with_deadline(get_awaitable: Callable[[], Awaitable[_T]]) -> _T:
+    """Await something (as returned by get_awaitable) within the current deadline.
+
+    If the deadline has already passed, get_awaitable isn't called at all.
+    """
+    if (remaining := get_remaining_time()) is None:
+        return await get_awaitable()
+    if remaining <= 0:
+        raise RequestTimeoutError("Deadline exceeded before waiting for a request")
+
+    timeout = async_timeout.timeout(remaining)
+    try:
+        async with timeout:
+            return await get_awaitable()
+    except asyncio.TimeoutError as err:
+        if not timeout.expired:
+            raise
+        raise RequestTimeoutError(
+            "Deadline exceeded while waiting for a request"
+        ) from err
+
+
+class RTTEstimator:
+    """Define an object that derives a request timeout from observed round-trip times.
+
+    Like TCP's retransmission timeout (RFC 6298), the timeout is the smoothed
+    round-trip time plus four times its variance, clamped to [min_timeout,
+    max_timeout]. It doubles (up to max_timeout) every time a request times out, and
+    until a round trip has been observed, no timeout is suggested.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_timeout: float = DEFAULT_MIN_TIMEOUT,
+        max_timeout: float = DEFAULT_MAX_TIMEOUT,
+    ) -> None:
+        """Initialize."""
+        self._timeout: float | None = None
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.rttvar: float | None = None
+        self.srtt: float | None = None
+
+    @property
+    def timeout(self) -> float | None:
+        """Return the current suggested timeout in seconds (or None)."""
+        return self._timeout
+
+    def record_rtt(self, rtt: float) -> None:
+        """Record the round-trip time of a request."""
+        if self.srtt is None or self.rttvar is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - RTT_BETA) * self.rttvar + RTT_BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - RTT_ALPHA) * self.srtt + RTT_ALPHA * rtt
+
+        self._timeout = min(
+            max(self.srtt + RTT_K * self.rttvar, self.min_timeout), self.max_timeout
+        )
+
+    def record_timeout(self) -> None:
+        """Record that a request timed out (backing the timeout off)."""
+        if self._timeout is None:
+            return
+        self._timeout = min(self._timeout * 2, self.max_timeout)
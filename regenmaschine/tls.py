@@ -0,0 +1,118 @@
+"""Define TLS helpers (including session resumption for local controllers)."""
+from __future__ import annotations
+
+from functools import lru_cache
+import ssl
+from typing import Any
+
+
+class ResumableSSLObject(ssl.SSLObject):
+    """Define an SSL object that reports its handshakes back to its context."""
+
+    _read_since_handshake: bool = False
+
+    def _store_session(self) -> None:
+        """Store this connection's session in the context's cache."""
+        context = self.context
+        if not isinstance(context, SessionCachingSSLContext):
+            return
+        if self.server_hostname is None or (session := self.session) is None:
+            return
+        context.sessions[self.server_hostname] = session
+
+    def do_handshake(self) -> None:
+        """Perform the handshake and record whether the session was resumed."""
+        super().do_handshake()
+
+        context = self.context
+        if isinstance(context, SessionCachingSSLContext):
+            if self.session_reused:
+                context.resumed_handshakes += 1
+            else:
+                context.full_handshakes += 1
+
+        self._store_session()
+
+    def read(self, len: int = 1024, buffer: Any = None) -> Any:
+        """Read data (storing the session again after the first read).
+
+        TLS 1.3 servers send session tickets after the handshake completes, so the
+        session stored during the handshake isn't resumable until we've read something
+        from the server.
+        """
+        data = super().read(len, buffer)
+        if not self._read_since_handshake:
+            self._read_since_handshake = True
+            self._store_session()
+        return data
+
+
+class SessionCachingSSLContext(ssl.SSLContext):
+    """Define an SSL context that caches TLS sessions per host.
+
+    New connections to a host that has been seen before offer the cached session,
+    allowing the server to perform an abbreviated handshake instead of a full one.
+    """
+
+    sslobject_class = ResumableSSLObject
+
+    def __new__(
+        cls, protocol: int = ssl.PROTOCOL_TLS_CLIENT
+    ) -> SessionCachingSSLContext:
+        """Create the context (the protocol is chosen here rather than in __init__)."""
+        return super().__new__(cls, protocol)
+
+    def __init__(self, *_: Any) -> None:
+        """Initialize."""
+        self.full_handshakes: int = 0
+        self.resumed_handshakes: int = 0
+        self.sessions: dict[str, ssl.SSLSession] = {}
+
+    def wrap_bio(  # type: ignore[override]
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: str | None = None,
+        session: ssl.SSLSession | None = None,
+    ) -> ssl.SSLObject:
+        """Wrap BIO objects, offering a cached session for the host (if one exists)."""
+        if session is None and not server_side and server_hostname is not None:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_bio(
+            incoming,
+            outgoing,
+            server_side=server_side,
+            server_hostname=server_hostname,
+            session=session,
+        )
+
+
+def create_legacy_ssl_context() -> SessionCachingSSLContext:
+    """Create an SSL context that can talk to all generations of controllers."""
+    context = SessionCachingSSLContext()
+
+    # The local API on Gen 1 controllers uses outdated RSA ciphers (and there isn't
+    # any indication that they'll be updated). Python 3.10+ enforces minimum TLS
+    # standards that the Gen 1 can't support, so to keep compatibility, we loosen
+    # things up:
+    #   1. We set a minimum TLS version of SSLv3
+    #   2. We utilize the "DEFAULT" cipher suite (which includes old RSA ciphers).
+    #   3. We don't validate the hostname.
+    #   4. We allow self-signed certificates.
+    context.minimum_version = ssl.TLSVersion.SSLv3
+    context.set_ciphers("DEFAULT")
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    return context
+
+
+@lru_cache(maxsize=None)
+def get_legacy_ssl_context() -> SessionCachingSSLContext:
+    """Return the process-wide legacy-compatible SSL context (building it if needed).
+
+    Building and configuring a context is comparatively expensive, so a single one is
+    shared by every client; this also lets cached TLS sessions be shared.
+    """
+    return create_legacy_ssl_context()
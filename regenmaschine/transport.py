@@ -0,0 +1,328 @@
+"""Define the transports that the client sends requests through."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import asyncio
+import inspect
+import json
+import logging
+import ssl
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Union
+
+from aiohttp import ClientSession, ClientTimeout
+from aiohttp.client_exceptions import (
+    ClientConnectionError,
+    ClientError,
+    ClientPayloadError,
+    ServerDisconnectedError,
+)
+from yarl import URL
+
+from regenmaschine.connection import ConnectionPolicy, HostConnectionState
+from regenmaschine.errors import RequestError, TransientError
+from regenmaschine.middleware import Request, Response
+from regenmaschine.tls import SessionCachingSSLContext, get_legacy_ssl_context
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    if not TYPE_CHECKING:
+        httpx = None
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_HTTP2_CONNECTIONS: int = 4
+
+RouteHandler = Callable[[Request], Union[Awaitable[Any], Any]]
+
+
+class Transport(ABC):
+    """Define the interface that the client sends requests through.
+
+    A transport sends a single request and returns the response with its raw body (as
+    received, i.e., without decoding any Content-Encoding; the client decodes and
+    parses it); failures to get a response at all should raise a RequestError (or a
+    TransientError, if it is worth retrying).
+    """
+
+    async def close(self) -> None:
+        """Release any resources held by the transport."""
+
+    @abstractmethod
+    async def send(self, request: Request) -> Response:
+        """Send a request and return its response."""
+
+
+class AiohttpTransport(Transport):
+    """Define a transport that sends requests over HTTP with aiohttp.
+
+    If no session is provided, the transport lazily creates one session per host (each
+    with its own connector, configured by that host's connection policy) and reuses it
+    until close() is called.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession | None = None,
+        *,
+        connection_policy: ConnectionPolicy | None = None,
+        ssl_context: ssl.SSLContext | None = None,
+    ) -> None:
+        """Initialize."""
+        self._connection_policies: dict[str, ConnectionPolicy] = {}
+        self._default_connection_policy = connection_policy or ConnectionPolicy()
+        self._host_states: dict[str, HostConnectionState] = {}
+        self._owned_sessions: dict[str, ClientSession] = {}
+        self._session = session
+        self._ssl_context = ssl_context
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """Return the SSL context to use (building the shared one on first use)."""
+        if self._ssl_context is None:
+            return get_legacy_ssl_context()
+        return self._ssl_context
+
+    @property
+    def tls_handshakes(self) -> dict[str, int]:
+        """Return the number of full and resumed TLS handshakes performed."""
+        context = self.ssl_context
+        if not isinstance(context, SessionCachingSSLContext):
+            return {"full": 0, "resumed": 0}
+        return {
+            "full": context.full_handshakes,
+            "resumed": context.resumed_handshakes,
+        }
+
+    def _get_session(self, host: str) -> ClientSession:
+        """Return the session to use for a host, creating one if needed."""
+        if self._session and not self._session.closed:
+            return self._session
+
+        session = self._owned_sessions.get(host)
+        if session is None or session.closed:
+            policy = self._connection_policies.get(
+                host, self._default_connection_policy
+            )
+            session = self._owned_sessions[host] = ClientSession(
+                connector=policy.create_connector(),
+                # Timeouts are applied by the client (per request) instead:
+                timeout=ClientTimeout(total=None),
+            )
+
+        return session
+
+    async def _retire_connections(self, host: str) -> None:
+        """Close the pooled connections to a host (if the transport owns them)."""
+        if (session := self._owned_sessions.pop(host, None)) is None:
+            return
+        _LOGGER.debug("Retiring idle connections to %s", host)
+        await session.close()
+
+    async def close(self) -> None:
+        """Close the sessions owned by the transport (if any exist)."""
+        sessions = list(self._owned_sessions.values())
+        self._owned_sessions.clear()
+        await asyncio.gather(*(session.close() for session in sessions))
+
+    def get_idle_close_window(self, host: str) -> float | None:
+        """Return the learned idle-close window (in seconds) for a host."""
+        if (state := self._host_states.get(host)) is None:
+            return None
+        return state.idle_close_window
+
+    def set_connection_policy(self, host: str, policy: ConnectionPolicy) -> None:
+        """Set the connection policy for a specific host."""
+        self._connection_policies[host] = policy
+
+    async def send(self, request: Request) -> Response:
+        """Send a request (tracking the host's connections)."""
+        host_state = self._host_states.setdefault(request.host, HostConnectionState())
+        idle_time = host_state.idle_time
+
+        if host_state.should_retire_connections():
+            # The host has likely already closed our pooled connections, so rather than
+            # paying for a round trip to find out, start fresh:
+            await self._retire_connections(request.host)
+            idle_time = None
+
+        # Only try 2x for ServerDisconnectedError to comply with the RFC
+        # https://datatracker.ietf.org/doc/html/rfc2616#section-8.1.4
+        for attempt in range(2):
+            session = self._get_session(request.host)
+            host_state.in_flight += 1
+            try:
+                response = await self._send_with_session(session, request)
+            except ServerDisconnectedError as err:
+                # The HTTP/1.1 spec allows the device to close the connection
+                # at any time. aiohttp raises ServerDisconnectedError to let us
+                # decide what to do. In this case we want to retry as it likely
+                # means the connection was stale and the server closed it on us.
+                host_state.record_disconnect()
+                if attempt == 0:
+                    continue
+                raise TransientError(
+                    f"Error requesting data from {request.url}: {err}"
+                ) from err
+            finally:
+                host_state.in_flight -= 1
+                host_state.record_activity()
+
+            if attempt == 0:
+                host_state.record_reuse(idle_time)
+            return response
+
+        raise AssertionError  # https://github.com/python/mypy/issues/8964
+
+    async def _send_with_session(
+        self, session: ClientSession, request: Request
+    ) -> Response:
+        """Send a request with a session."""
+        try:
+            async with session.request(
+                request.method,
+                request.url,
+                ssl=self.ssl_context if request.use_ssl else None,
+                auto_decompress=False,
+                **request.kwargs,
+            ) as resp:
+                return Response(
+                    resp.status,
+                    str(resp.url),
+                    None,
+                    resp.headers,
+                    resp.reason,
+                    await resp.read(),
+                )
+        except ServerDisconnectedError:
+            raise
+        except (ClientConnectionError, ClientPayloadError) as err:
+            raise TransientError(
+                f"Error requesting data from {request.url}: {err}"
+            ) from err
+        except ClientError as err:
+            raise RequestError(
+                f"Error requesting data from {request.url}: {err}"
+            ) from err
+
+
+class HTTPXTransport(Transport):
+    """Define a transport that sends requests with httpx (over HTTP/2, by default).
+
+    HTTP/2 multiplexes concurrent requests to the same origin over a single
+    connection, so a few connections can carry the requests of every remote controller
+    (which all share a single host). This requires httpx (with its http2 extra), which
+    isn't installed by default.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient | None = None,
+        *,
+        http2: bool = True,
+        max_connections: int = DEFAULT_MAX_HTTP2_CONNECTIONS,
+    ) -> None:
+        """Initialize.
+
+        If no client is provided, the transport creates (and owns) one with the given
+        HTTP/2 setting and connection limit.
+        """
+        if httpx is None:
+            raise RuntimeError(
+                "HTTPXTransport requires httpx (pip install 'httpx[http2]')"
+            )
+
+        self._owns_client = client is None
+        if client is None:
+            # Timeouts are applied by the client (per request) instead:
+            client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(max_connections=max_connections),
+                timeout=None,
+            )
+        self._client = client
+
+    async def close(self) -> None:
+        """Close the httpx client (if the transport owns it)."""
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def send(self, request: Request) -> Response:
+        """Send a request."""
+        kwargs = dict(request.kwargs)
+        if isinstance(kwargs.get("data"), bytes):
+            # httpx expects raw bodies as content:
+            kwargs["content"] = kwargs.pop("data")
+
+        try:
+            async with self._client.stream(
+                request.method, request.url, **kwargs
+            ) as resp:
+                body = b"".join([chunk async for chunk in resp.aiter_raw()])
+        except httpx.TransportError as err:
+            raise TransientError(
+                f"Error requesting data from {request.url}: {err}"
+            ) from err
+        except httpx.HTTPError as err:
+            raise RequestError(
+                f"Error requesting data from {request.url}: {err}"
+            ) from err
+
+        return Response(
+            resp.status_code,
+            str(resp.url),
+            None,
+            resp.headers,
+            resp.reason_phrase,
+            body,
+        )
+
+
+class InMemoryTransport(Transport):
+    """Define a transport that routes requests straight to Python handlers.
+
+    No sockets are involved, which makes this transport useful for tests and for
+    measuring the overhead of the library itself. A route's handler is called with
+    the Request and may be sync or async; it returns either a Response (which is
+    returned as-is) or data (which is returned as a 200 response with a JSON body).
+    Requests without a route get a 404 response.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._routes: dict[tuple[str, str | None, str], RouteHandler] = {}
+
+    def add_route(
+        self,
+        method: str,
+        path: str,
+        handler: RouteHandler,
+        *,
+        host: str | None = None,
+    ) -> None:
+        """Add a route for a method and URL path (on any host, unless one is given)."""
+        self._routes[(method.lower(), host, path)] = handler
+
+    async def send(self, request: Request) -> Response:
+        """Route a request to its handler."""
+        method = request.method.lower()
+        path = URL(request.url).path
+        handler = self._routes.get((method, request.host, path)) or self._routes.get(
+            (method, None, path)
+        )
+        if handler is None:
+            return Response(404, request.url, None, reason="Not Found")
+
+        result = handler(request)
+        if inspect.isawaitable(result):
+            result = await result
+        if isinstance(result, Response):
+            return result
+        return Response(
+            200,
+            request.url,
+            None,
+            {"Content-Type": "application/json"},
+            "OK",
+            json.dumps(result).encode(),
+        )
@@ -54,3 +54,5 @@ async def test_api_versions_no_explicit_session(aresponses, authenticated_local_
         assert data["apiVer"] == "4.5.0"
         assert data["hwVer"] == 3
         assert data["swVer"] == "4.0.925"
+
+        await client.close()
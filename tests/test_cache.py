@@ -0,0 +1,357 @@
+"""Define tests for the response cache."""
+# pylint: disable=protected-access
+import asyncio
+import datetime
+from operator import itemgetter
+import sqlite3
+import time
+
+import aiohttp
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.cache import HistoryCache, ResponseCache, SQLiteCacheBackend
+from regenmaschine.errors import RequestError
+
+import tests.async_mock as mock
+from tests.common import TEST_HOST, TEST_MAC, TEST_PASSWORD, TEST_PORT, load_fixture
+
+
+def _age_cache(cache, seconds):
+    """Make every entry in a cache older by a number of seconds."""
+    for key, entry in cache._entries.items():
+        cache._entries[key] = entry._replace(
+            expires_at=entry.expires_at - seconds,
+            stale_until=entry.stale_until - seconds,
+            stored_at=entry.stored_at - seconds,
+        )
+
+
+def test_cache_ttls():
+    """Test that TTLs are resolved from exact endpoints and patterns."""
+    cache = ResponseCache({"zone": 10, "zone/*/properties": 60})
+    assert cache.get_ttl("zone") == 10
+    assert cache.get_ttl("zone/3/properties") == 60
+    assert cache.get_ttl("program") is None
+
+    cache.set("program", "program", {"programs": []})
+    assert cache.get("program") is None
+    assert len(cache) == 0
+
+    cache.set("zone", "zone", {"zones": []})
+    assert cache.get("zone") == {"zones": []}
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+    _age_cache(cache, 11)
+    assert cache.get("zone") is None
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction():
+    """Test that the least recently used response is evicted when the cache is full."""
+    cache = ResponseCache({"*": 60}, max_entries=2)
+    cache.set("zone/1", "zone/1", {"uid": 1})
+    cache.set("zone/2", "zone/2", {"uid": 2})
+    assert cache.get("zone/1") == {"uid": 1}
+
+    cache.set("zone/3", "zone/3", {"uid": 3})
+    assert len(cache) == 2
+    assert cache.get("zone/2") is None
+    assert cache.get("zone/1") == {"uid": 1}
+    assert cache.get("zone/3") == {"uid": 3}
+
+
+def test_cache_invalidation():
+    """Test that writes invalidate related responses."""
+    cache = ResponseCache({"*": 60})
+    for endpoint in ("zone", "zone/3", "zone/properties", "watering/queue", "apiVer"):
+        cache.set(endpoint, endpoint, {})
+
+    cache.invalidate("zone/3/properties")
+    assert cache.get("zone") is None
+    assert cache.get("zone/3") is None
+    assert cache.get("zone/properties") is None
+    assert cache.get("watering/queue") is None
+    assert cache.get("apiVer") == {}
+
+    cache.invalidate("machine/reboot")
+    assert len(cache) == 0
+
+
+def test_cache_stale_generation():
+    """Test that responses requested before an invalidation are discarded."""
+    cache = ResponseCache({"*": 60})
+    generation = cache.generation
+    cache.invalidate("zone/1/properties")
+    cache.set("zone", "zone", {}, generation=generation)
+    assert cache.get("zone") is None
+
+
+@pytest.mark.asyncio
+async def test_controller_cache(aresponses, authenticated_local_client):
+    """Test that a controller serves cached responses until a write invalidates them."""
+    async with authenticated_local_client:
+        for _ in range(2):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/zone",
+                "get",
+                aresponses.Response(
+                    text=load_fixture("zone_response.json"), status=200
+                ),
+            )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone/3/properties",
+            "post",
+            aresponses.Response(
+                text=load_fixture("zone_post_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session, cache_factory=lambda: ResponseCache({"zone": 60})
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            await controller.zones.all()
+            await controller.zones.all()
+            assert controller.cache.hits == 1
+
+            await controller.zones.enable(3)
+            await controller.zones.all()
+            assert controller.cache.hits == 1
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(aresponses, authenticated_local_client):
+    """Test that stale responses are served while they're refreshed."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(
+                text=load_fixture("zone_response_gen1.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                cache_factory=lambda: ResponseCache(
+                    {"zone": 60}, max_stale=600, stale_while_revalidate=True
+                ),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            data = await controller.request("get", "zone")
+            assert "active" in data["zones"][0]
+
+            _age_cache(controller.cache, 61)
+            data = await controller.request("get", "zone")
+            assert data.stale is True
+            assert data.age >= 61
+            assert "active" in data["zones"][0]
+
+            # Let the background refresh finish:
+            await asyncio.gather(*controller._in_flight_requests.values())
+
+            data = await controller.request("get", "zone")
+            assert data.stale is False
+            assert "active" not in data["zones"][0]
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_offline_stale_response(aresponses, authenticated_local_client):
+    """Test that stale responses are served when the controller can't be reached."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                cache_factory=lambda: ResponseCache({"zone": 60}, max_stale=600),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            await controller.zones.all()
+
+            with mock.patch.object(
+                session, "request", side_effect=aiohttp.ClientConnectionError
+            ):
+                _age_cache(controller.cache, 61)
+                data = await controller.request("get", "zone")
+                assert data.stale is True
+
+                # Once the maximum staleness passes, the error is raised:
+                _age_cache(controller.cache, 600)
+                with pytest.raises(RequestError):
+                    await controller.request("get", "zone")
+
+
+def test_persistent_cache(tmp_path):
+    """Test that responses persisted to a backend are loaded by a new cache."""
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+
+    cache = ResponseCache({"zone": 60, "provision": 3600}, backend=backend)
+    cache.attach(TEST_MAC)
+    cache.set("zone", "zone", {"zones": [{"uid": 1}]})
+    cache.set("provision", "provision", {"system": {}})
+    cache.set(("zone", '{"params": {}}'), "zone", {"zones": []})
+
+    restored_cache = ResponseCache({"zone": 60, "provision": 3600}, backend=backend)
+    restored_cache.attach(TEST_MAC)
+    assert len(restored_cache) == 2
+    data = restored_cache.get("zone")
+    assert data == {"zones": [{"uid": 1}]}
+    assert data.stale is False
+
+    # Responses that a cache wouldn't cache (or has no room for) aren't loaded:
+    zone_cache = ResponseCache({"zone": 60}, backend=backend)
+    zone_cache.attach(TEST_MAC)
+    assert len(zone_cache) == 1
+    small_cache = ResponseCache(
+        {"zone": 60, "provision": 3600}, max_entries=1, backend=backend
+    )
+    small_cache.attach(TEST_MAC)
+    assert len(small_cache) == 1
+    # Responses persisted for other controllers aren't loaded:
+    other_cache = ResponseCache({"zone": 60}, backend=backend)
+    other_cache.attach("00:00:00:00:00:00")
+    assert len(other_cache) == 0
+
+    # Invalidated responses are removed from the backend, too:
+    restored_cache.invalidate("zone/1/properties")
+    assert [key for key, _, _ in backend.load(TEST_MAC)] == ["provision"]
+
+    # Expired responses aren't loaded:
+    backend.store(TEST_MAC, "zone", {"zones": []}, time.time() - 61)
+    expired_cache = ResponseCache({"zone": 60, "provision": 3600}, backend=backend)
+    expired_cache.attach(TEST_MAC)
+    assert expired_cache.get("zone") is None
+    assert expired_cache.get("provision") == {"system": {}}
+
+    backend.close()
+
+
+@pytest.mark.asyncio
+async def test_persistent_cache_write_behind(caplog, tmp_path):
+    """Test that writes made from an event loop are batched off of it."""
+    path = str(tmp_path / "cache.db")
+    backend = SQLiteCacheBackend(path, write_delay=0.01)
+
+    def _get_persisted_keys():
+        connection = sqlite3.connect(path)
+        try:
+            return [key for (key,) in connection.execute("SELECT key FROM responses")]
+        finally:
+            connection.close()
+
+    cache = ResponseCache({"zone": 60, "provision": 3600}, backend=backend)
+    cache.attach(TEST_MAC)
+    cache.set("zone", "zone", {"zones": []})
+    cache.set("provision", "provision", {"system": {}})
+    assert not _get_persisted_keys()
+
+    # The batch is committed (from the executor) once the write delay passes:
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if not backend._pending:
+            break
+    await backend.async_flush()
+    assert sorted(_get_persisted_keys()) == ["provision", "zone"]
+
+    # Later writes win (even within a batch):
+    cache.invalidate("zone/1/properties")
+    cache.set("zone", "zone", {"zones": [{"uid": 1}]})
+    await backend.async_flush()
+    assert [data for key, data, _ in backend.load(TEST_MAC) if key == "zone"] == [
+        {"zones": [{"uid": 1}]}
+    ]
+
+    # Writes that fail in the background are logged:
+    with mock.patch.object(backend, "flush", side_effect=sqlite3.OperationalError):
+        cache.set("provision", "provision", {"system": {}})
+        await asyncio.sleep(0.05)
+    assert "Unable to persist cached responses" in caplog.text
+
+    # Queued writes are committed when the backend is closed:
+    cache.set("provision", "provision", {"system": {"id": 1}})
+    backend.close()
+    assert sorted(_get_persisted_keys()) == ["provision", "zone"]
+
+
+@pytest.mark.asyncio
+async def test_history_cache_range_split(tmp_path):
+    """Test that only uncached days of a range are fetched."""
+    fetches = []
+
+    async def fetch(start, days):
+        """Return one item per requested day."""
+        fetches.append((start, days))
+        return [
+            {"date": (start + datetime.timedelta(days=offset)).isoformat()}
+            for offset in range(days)
+        ]
+
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+    history = HistoryCache(backend)
+    history.attach(TEST_MAC)
+    start = datetime.date(2018, 6, 1)
+
+    days = await history.get_range("watering/log", start, 2, fetch, itemgetter("date"))
+    assert [day["date"] for day in days] == ["2018-06-01", "2018-06-02"]
+    assert fetches == [(start, 2)]
+
+    days = await history.get_range(
+        "watering/log", start - datetime.timedelta(days=1), 5, fetch, itemgetter("date")
+    )
+    assert [day["date"] for day in days] == [
+        "2018-05-31",
+        "2018-06-01",
+        "2018-06-02",
+        "2018-06-03",
+        "2018-06-04",
+    ]
+    assert fetches[1:] == [
+        (datetime.date(2018, 5, 31), 1),
+        (datetime.date(2018, 6, 3), 2),
+    ]
+
+    # Days that may still change are never cached:
+    today = datetime.date.today()
+    await history.get_range("watering/log", today, 1, fetch, itemgetter("date"))
+    await history.get_range("watering/log", today, 1, fetch, itemgetter("date"))
+    assert fetches[-2:] == [(today, 1), (today, 1)]
+
+    # Cached days are persisted:
+    restored_history = HistoryCache(backend)
+    restored_history.attach(TEST_MAC)
+    assert len(restored_history) == 5
+    assert restored_history.get("watering/log", start) == [{"date": "2018-06-01"}]
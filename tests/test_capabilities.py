@@ -0,0 +1,134 @@
+"""Define tests for controller capability tracking."""
+import aiohttp
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.capabilities import Capabilities
+from regenmaschine.errors import UnknownAPICallError
+
+import tests.async_mock as mock
+from tests.common import TEST_HOST, TEST_MAC, TEST_PASSWORD, TEST_PORT, load_fixture
+
+
+def test_capabilities_persistence():
+    """Test persisting and loading a capability map."""
+    controller = mock.Mock(api_version="4.5.0", hardware_version="3")
+    capabilities = Capabilities(controller)
+    capabilities.mark_unsupported("post", "machine/update/check")
+    assert not capabilities.supports_endpoint("POST", "machine/update/check")
+    assert capabilities.supports_endpoint("GET", "machine/update")
+
+    data = capabilities.as_dict()
+    assert data == {
+        "api_version": "4.5.0",
+        "unsupported": ["POST machine/update/check"],
+        "unsupported_features": [],
+    }
+
+    restored_capabilities = Capabilities(controller)
+    restored_capabilities.load(data)
+    assert not restored_capabilities.supports_endpoint("post", "machine/update/check")
+
+    # Learned results are discarded once the controller's firmware changes:
+    controller.api_version = "4.6.1"
+    assert restored_capabilities.supports_endpoint("post", "machine/update/check")
+
+
+def test_capabilities_features():
+    """Test tracking which (gated) endpoint manager methods are supported."""
+    controller = mock.Mock(api_version="4.3.0", hardware_version="1")
+    capabilities = Capabilities(controller)
+    # 1st generation controllers don't support any of them:
+    assert not capabilities.supports_feature("Watering.queue")
+
+    controller.hardware_version = "3"
+    assert capabilities.supports_feature("Watering.queue")
+
+    capabilities.mark_feature_unsupported("Watering.queue")
+    assert not capabilities.supports_feature("Watering.queue")
+    assert capabilities.supports_feature("Restriction.current")
+    assert capabilities.as_dict()["unsupported_features"] == ["Watering.queue"]
+
+    # Like endpoints, learned features are discarded once the firmware changes:
+    controller.api_version = "4.5.0"
+    assert capabilities.supports_feature("Watering.queue")
+
+
+@pytest.mark.asyncio
+async def test_unsupported_endpoint_short_circuit(
+    aresponses, authenticated_local_client
+):
+    """Test that calls to a known-unsupported endpoint don't hit the network."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/machine/update/check",
+            "post",
+            aresponses.Response(
+                text=load_fixture("unknown_api_call_response.json"), status=400
+            ),
+        )
+        for _ in range(2):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/machine/update",
+                "get",
+                aresponses.Response(
+                    text=load_fixture("machine_get_update_response.json"), status=200
+                ),
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            for _ in range(2):
+                data = await controller.machine.get_firmware_update_status()
+                assert data["updateStatus"] == 1
+
+            with pytest.raises(UnknownAPICallError):
+                await controller.request("post", "machine/update/check")
+
+            assert controller.to_dict()["capabilities"]["unsupported"] == [
+                "POST machine/update/check"
+            ]
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_unsupported_feature_short_circuit(
+    aresponses, authenticated_local_client
+):
+    """Test that calls to a known-unsupported feature don't hit the network."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/restrictions/currently",
+            "get",
+            aresponses.Response(
+                text=load_fixture("unknown_api_call_response.json"), status=400
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            with pytest.raises(UnknownAPICallError):
+                await controller.restrictions.current()
+
+            with pytest.raises(UnknownAPICallError) as err:
+                await controller.restrictions.current()
+            assert "the controller doesn't support it" in str(err.value)
+            assert controller.to_dict()["capabilities"]["unsupported_features"] == [
+                "Restriction.current"
+            ]
+
+        authenticated_local_client.assert_no_unused_routes()
@@ -0,0 +1,170 @@
+"""Define tests for circuit breakers."""
+# pylint: disable=protected-access
+import asyncio
+
+import aiohttp
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.circuit import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+)
+from regenmaschine.errors import CircuitOpenError, RequestError, TransientError
+
+from tests.common import TEST_HOST, TEST_MAC, TEST_PASSWORD, TEST_PORT, load_fixture
+
+
+async def _fail():
+    """Simulate a transport failure."""
+    raise TransientError("Timed out")
+
+
+async def _respond():
+    """Simulate a response."""
+    return {"statusCode": 0}
+
+
+async def _respond_with_error():
+    """Simulate an error response."""
+    raise RequestError("Bad request")
+
+
+def _cool_down(breaker):
+    """Pretend that the breaker's cooldown has passed."""
+    breaker._opened_at -= breaker.cooldown
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_closes():
+    """Test that a circuit opens after consecutive failures and closes after a probe."""
+    state_changes = []
+    breaker = CircuitBreaker(
+        failure_threshold=2,
+        on_state_change=lambda *args: state_changes.append(args),
+    )
+    breaker.attach(TEST_MAC)
+
+    with pytest.raises(TransientError):
+        await breaker.call(_fail, _respond)
+    # Any response resets the count of consecutive failures:
+    with pytest.raises(RequestError):
+        await breaker.call(_respond_with_error, _respond)
+    assert breaker.failures == 0
+
+    for _ in range(2):
+        with pytest.raises(TransientError):
+            await breaker.call(_fail, _respond)
+    assert breaker.state == CIRCUIT_OPEN
+    # Failures recorded while the circuit is open don't notify again:
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_respond, _respond)
+
+    _cool_down(breaker)
+    assert await breaker.call(_respond, _respond) == {"statusCode": 0}
+    assert breaker.state == CIRCUIT_CLOSED
+
+    assert state_changes == [
+        (TEST_MAC, CIRCUIT_CLOSED, CIRCUIT_OPEN),
+        (TEST_MAC, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN),
+        (TEST_MAC, CIRCUIT_HALF_OPEN, CIRCUIT_CLOSED),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_circuit_probe_failure():
+    """Test that a failed probe opens the circuit again."""
+    breaker = CircuitBreaker(failure_threshold=1)
+    with pytest.raises(TransientError):
+        await breaker.call(_fail, _respond)
+
+    _cool_down(breaker)
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_respond, _fail)
+    assert breaker.state == CIRCUIT_OPEN
+
+    # Error responses to the probe still mean the controller is reachable:
+    _cool_down(breaker)
+    assert await breaker.call(_respond, _respond_with_error) == {"statusCode": 0}
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+@pytest.mark.asyncio
+async def test_circuit_single_probe():
+    """Test that only one probe is sent (and that cancelled probes are retried)."""
+    breaker = CircuitBreaker(failure_threshold=1)
+    with pytest.raises(TransientError):
+        await breaker.call(_fail, _respond)
+    _cool_down(breaker)
+
+    probe_started = asyncio.Event()
+
+    async def _hang():
+        probe_started.set()
+        await asyncio.sleep(60)
+
+    task = asyncio.create_task(breaker.call(_respond, _hang))
+    await probe_started.wait()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_respond, _respond)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker.state == CIRCUIT_OPEN
+
+    assert await breaker.call(_respond, _respond) == {"statusCode": 0}
+
+
+@pytest.mark.asyncio
+async def test_controller_circuit(aresponses, authenticated_local_client):
+    """Test that a controller's circuit fails fast once it's open."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text="Service Unavailable", status=503),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/apiVer",
+            "get",
+            aresponses.Response(
+                text=load_fixture("api_version_response.json"), status=200
+            ),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                circuit_breaker_factory=lambda: CircuitBreaker(failure_threshold=1),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            assert controller.circuit_breaker.name == TEST_MAC
+
+            with pytest.raises(TransientError):
+                await controller.request("get", "zone")
+            with pytest.raises(CircuitOpenError):
+                await controller.request("get", "zone")
+
+            _cool_down(controller.circuit_breaker)
+            data = await controller.request("get", "zone")
+            assert data["zones"]
+
+        authenticated_local_client.assert_no_unused_routes()
@@ -7,8 +7,19 @@ import json
 import aiohttp
 import pytest
 
-from regenmaschine import Client
+from regenmaschine import Client, client as client_module
+from regenmaschine.cache import UnchangedResponse
+from regenmaschine.controller import (
+    TOKEN_REFRESH_STAGGER,
+    TOKEN_REFRESH_WINDOW,
+    Controller,
+    LocalController,
+    RemoteController,
+    _get_request_key,
+)
 from regenmaschine.errors import RequestError, TokenExpiredError, UnknownAPICallError
+from regenmaschine.middleware import Response
+from regenmaschine.transport import InMemoryTransport
 
 import tests.async_mock as mock
 from tests.common import (
@@ -21,6 +32,7 @@ from tests.common import (
     TEST_NAME,
     TEST_PASSWORD,
     TEST_PORT,
+    TEST_SPRINKLER_ID,
     TEST_SW_VERSION,
     load_fixture,
 )
@@ -147,14 +159,7 @@ async def test_load_remote(authenticated_remote_client, event_loop):
 @pytest.mark.asyncio
 async def test_load_remote_skip(aresponses, authenticated_remote_client):
     """Test skipping the loading of a remote client if it's already loaded."""
-    authenticated_remote_client.add(
-        "my.rainmachine.com",
-        "/login/auth",
-        "post",
-        aresponses.Response(
-            text=load_fixture("remote_auth_login_1_response.json"), status=200
-        ),
-    )
+    # Note that the account's access token is reused the second time around:
     authenticated_remote_client.add(
         "my.rainmachine.com",
         "/devices/get-sprinklers",
@@ -174,6 +179,169 @@ async def test_load_remote_skip(aresponses, authenticated_remote_client):
             assert len(client.controllers) == 1
             assert client.controllers[TEST_MAC] == controller
 
+        authenticated_remote_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_remote_token_expired_login(aresponses, authenticated_remote_client):
+    """Test that a remote controller logs in to its sprinkler again."""
+    async with authenticated_remote_client:
+        authenticated_remote_client.add(
+            "api.rainmachine.com",
+            f"/{TEST_SPRINKLER_ID}/api/4/restrictions/raindelay",
+            "get",
+            aresponses.Response(
+                text=load_fixture("unauthenticated_response.json"), status=401
+            ),
+        )
+        authenticated_remote_client.add(
+            "my.rainmachine.com",
+            "/devices/login-sprinkler",
+            "post",
+            aresponses.Response(
+                text=load_fixture("unauthenticated_response.json"), status=401
+            ),
+        )
+        authenticated_remote_client.add(
+            "my.rainmachine.com",
+            "/login/auth",
+            "post",
+            aresponses.Response(
+                text=load_fixture("remote_auth_login_1_response.json"), status=200
+            ),
+        )
+        authenticated_remote_client.add(
+            "my.rainmachine.com",
+            "/devices/login-sprinkler",
+            "post",
+            aresponses.Response(
+                text=load_fixture("remote_auth_login_2_response.json"), status=200
+            ),
+        )
+        authenticated_remote_client.add(
+            "api.rainmachine.com",
+            f"/{TEST_SPRINKLER_ID}/api/4/restrictions/raindelay",
+            "get",
+            aresponses.Response(
+                text=load_fixture("restrictions_raindelay_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_remote(TEST_EMAIL, TEST_PASSWORD)
+            controller = client.controllers[TEST_MAC]
+
+            # The sprinkler's token has expired and so has the account's, so both are
+            # refreshed before the request is retried:
+            data = await controller.restrictions.raindelay()
+            assert data["delayCounter"] == -1
+
+        authenticated_remote_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_remote_token_refresh_staggered():
+    """Test that remote controllers refresh their tokens at staggered times."""
+    client = Client()
+    client.restore_remote(
+        {
+            "access_token": TEST_ACCESS_TOKEN,
+            "api_version": TEST_API_VERSION,
+            "hardware_version": TEST_HW_VERSION,
+            "mac": TEST_MAC,
+            "name": TEST_NAME,
+            "software_version": TEST_SW_VERSION,
+            "sprinkler_id": TEST_SPRINKLER_ID,
+        },
+        email=TEST_EMAIL,
+        password=TEST_PASSWORD,
+    )
+    controller = client.controllers[TEST_MAC]
+    assert controller._can_log_in_again()
+    assert client.remote_accounts[TEST_EMAIL].email == TEST_EMAIL
+    assert (
+        TOKEN_REFRESH_WINDOW
+        <= controller._token_refresh_window
+        <= TOKEN_REFRESH_WINDOW + TOKEN_REFRESH_STAGGER
+    )
+
+
+@pytest.mark.asyncio
+async def test_remote_cached_token_rejected():
+    """Test that the account logs in again when the cloud rejects its cached token."""
+    logins = []
+
+    def _login(request):
+        logins.append(request)
+        return {"access_token": f"token{len(logins)}", "errorType": -1}
+
+    def _authenticated(fixture):
+        def _handler(request):
+            if request.kwargs["params"]["access_token"] != f"token{len(logins)}":
+                return Response(
+                    401,
+                    request.url,
+                    None,
+                    body=load_fixture("unauthenticated_response.json").encode(),
+                )
+            return json.loads(load_fixture(fixture))
+
+        return _handler
+
+    transport = InMemoryTransport()
+    transport.add_route("post", "/login/auth", _login)
+    transport.add_route(
+        "post",
+        "/devices/get-sprinklers",
+        _authenticated("remote_sprinklers_response.json"),
+    )
+    transport.add_route(
+        "post",
+        "/devices/login-sprinkler",
+        _authenticated("remote_auth_login_2_response.json"),
+    )
+    transport.add_route(
+        "get",
+        f"/{TEST_SPRINKLER_ID}/api/4/apiVer",
+        lambda _: json.loads(load_fixture("api_version_response.json")),
+    )
+
+    async with Client(transport=transport) as client:
+        await client.load_remote(TEST_EMAIL, TEST_PASSWORD)
+        assert len(logins) == 1
+
+        # The cloud stops accepting the account's cached token:
+        client.remote_accounts[TEST_EMAIL]._access_token = "revoked"
+        await client.load_remote(TEST_EMAIL, TEST_PASSWORD, skip_existing=False)
+        assert len(logins) == 2
+        assert TEST_MAC in client.controllers
+
+
+@pytest.mark.asyncio
+async def test_remote_account_single_login():
+    """Test that concurrent callers share a single cloud login."""
+    logins = []
+
+    async def _login(request):
+        logins.append(request)
+        await asyncio.sleep(0)
+        return {"access_token": TEST_ACCESS_TOKEN, "expires_in": 3600}
+
+    transport = InMemoryTransport()
+    transport.add_route("post", "/login/auth", _login)
+    client = Client(transport=transport)
+    account = client._get_remote_account(TEST_EMAIL, TEST_PASSWORD)
+
+    tokens = await asyncio.gather(*(account.get_access_token() for _ in range(3)))
+    assert tokens == [TEST_ACCESS_TOKEN] * 3
+    assert len(logins) == 1
+    assert (
+        timedelta(minutes=59)
+        < account._access_token_expiration - datetime.now()
+        < timedelta(hours=1)
+    )
+
 
 @pytest.mark.asyncio
 async def test_load_remote_failure(aresponses):
@@ -255,7 +423,7 @@ async def test_request_timeout(authenticated_local_client):
         """Define a method that takes 0.5 seconds to execute."""
         await asyncio.sleep(0.5)
 
-    with mock.patch.object(aiohttp.ClientResponse, "json", long_running_login):
+    with mock.patch.object(aiohttp.ClientResponse, "read", long_running_login):
         async with authenticated_local_client:
             async with aiohttp.ClientSession() as session:
                 with pytest.raises(RequestError):
@@ -330,21 +498,174 @@ async def test_token_expired_explicit_exception(aresponses):
 
 
 @pytest.mark.asyncio
-async def test_token_expired_implicit_exception(authenticated_local_client):
+async def test_token_expired_without_password():
+    """Test that a controller without a password can't log in again on its own."""
+    for controller in (
+        Controller(mock.AsyncMock()),
+        LocalController(mock.AsyncMock(), TEST_HOST, TEST_PORT),
+        RemoteController(mock.AsyncMock()),
+    ):
+        assert not controller._can_log_in_again()
+        with pytest.raises(TokenExpiredError):
+            await controller._log_in_again()
+
+
+@pytest.mark.asyncio
+async def test_token_expired_implicit_exception(aresponses):
     """Test that the appropriate error is thrown when a token expires implicitly."""
-    async with authenticated_local_client:
+    data = {
+        "access_token": "expired",
+        "access_token_expiration": (datetime.now() - timedelta(hours=1)).isoformat(),
+        "api_version": TEST_API_VERSION,
+        "hardware_version": TEST_HW_VERSION,
+        "host": TEST_HOST,
+        "mac": TEST_MAC,
+        "name": TEST_NAME,
+        "port": TEST_PORT,
+        "software_version": TEST_SW_VERSION,
+        "use_ssl": False,
+    }
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        # Without a password, the controller can't log in again:
+        client.restore_local(data)
+        controller = client.controllers[TEST_MAC]
+
         with pytest.raises(TokenExpiredError):
-            async with aiohttp.ClientSession() as session:
-                client = Client(session=session)
-                await client.load_local(
-                    TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
-                )
-                controller = next(iter(client.controllers.values()))
+            await controller.request("get", "random/endpoint")
+
+
+@pytest.mark.asyncio
+async def test_token_expired_implicit_login(aresponses, authenticated_local_client):
+    """Test that a controller logs in again when its token expires implicitly."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/auth/login",
+            "post",
+            aresponses.Response(
+                text=load_fixture("auth_login_response.json"), status=200
+            ),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/restrictions/raindelay",
+            "get",
+            aresponses.Response(
+                text=load_fixture("restrictions_raindelay_response.json"), status=200
+            ),
+        )
 
-                controller._access_token_expiration = datetime.now() - timedelta(
-                    hours=1
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            controller._access_token_expiration = datetime.now() - timedelta(hours=1)
+
+            data = await controller.restrictions.raindelay()
+            assert data["delayCounter"] == -1
+            assert controller._access_token_expiration > datetime.now()
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_token_expired_explicit_login(aresponses, authenticated_local_client):
+    """Test that concurrent requests that hit an expired token share one login."""
+    async with authenticated_local_client:
+        for endpoint in ("zone", "program"):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                f"/api/4/{endpoint}",
+                "get",
+                aresponses.Response(
+                    text=load_fixture("unauthenticated_response.json"), status=401
+                ),
+            )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/auth/login",
+            "post",
+            aresponses.Response(
+                text=load_fixture("auth_login_response.json"), status=200
+            ),
+        )
+        for endpoint in ("zone", "program"):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                f"/api/4/{endpoint}",
+                "get",
+                aresponses.Response(
+                    text=load_fixture(f"{endpoint}_response.json"), status=200
+                ),
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            with mock.patch.object(
+                controller, "login", wraps=controller.login
+            ) as mock_login:
+                zones, programs = await asyncio.gather(
+                    controller.request("get", "zone"),
+                    controller.request("get", "program"),
                 )
-                await controller.request("get", "random/endpoint")
+                mock_login.assert_called_once_with(TEST_PASSWORD)
+
+            assert zones["zones"]
+            assert programs["programs"]
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_token_refreshed_before_expiring(aresponses, authenticated_local_client):
+    """Test that a token that's about to expire is refreshed in the background."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/restrictions/raindelay",
+            "get",
+            aresponses.Response(
+                text=load_fixture("restrictions_raindelay_response.json"), status=200
+            ),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/auth/login",
+            "post",
+            aresponses.Response(
+                text=load_fixture("auth_login_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            controller._access_token_expiration = datetime.now() + timedelta(minutes=1)
+
+            data = await controller.restrictions.raindelay()
+            assert data["delayCounter"] == -1
+
+            login_task = controller._login_task
+            assert login_task is not None
+            await login_task
+            assert controller._login_task is None
+            assert controller._access_token_expiration > datetime.now() + timedelta(
+                days=1
+            )
+
+        authenticated_local_client.assert_no_unused_routes()
 
 
 @pytest.mark.asyncio
@@ -387,3 +708,272 @@ async def test_retry_only_once_on_server_disconnected(
                 session, "request", side_effect=aiohttp.ServerDisconnectedError
             ):
                 await controller.restrictions.raindelay()
+
+
+@pytest.mark.asyncio
+async def test_owned_session_reused(authenticated_local_client):
+    """Test that a client without a session reuses a single owned session per host."""
+    async with authenticated_local_client:
+        async with Client() as client:
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            session = client.transport._owned_sessions[TEST_HOST]
+            assert not session.closed
+            assert client.transport._get_session(TEST_HOST) is session
+
+        assert session.closed
+        assert not client.transport._owned_sessions
+
+
+@pytest.mark.asyncio
+async def test_owned_session_not_used_with_provided_session(
+    authenticated_local_client,
+):
+    """Test that a provided session is used instead of an owned one."""
+    async with authenticated_local_client:
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            assert not client.transport._owned_sessions
+
+            # Closing the client shouldn't close a session it doesn't own:
+            await client.close()
+            assert not session.closed
+
+
+@pytest.mark.asyncio
+async def test_request_coalescing(aresponses, authenticated_local_client):
+    """Test that identical, concurrent GET requests are coalesced."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+        for _ in range(2):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/zone/1/properties",
+                "post",
+                aresponses.Response(
+                    text=load_fixture("zone_post_response.json"), status=200
+                ),
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            results = await asyncio.gather(
+                *(controller.zones.all(include_inactive=True) for _ in range(3))
+            )
+            assert all(len(zones) == 12 for zones in results)
+            assert controller.coalesced_requests == 2
+
+            # POST requests are never coalesced:
+            await asyncio.gather(controller.zones.enable(1), controller.zones.enable(1))
+            assert controller.coalesced_requests == 2
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+def test_request_key():
+    """Test that requests with the same arguments (in any order) share a key."""
+    assert _get_request_key("zone", {}) == "zone"
+    key = _get_request_key("zone", {"params": {"a": 1, "b": 2}})
+    assert key == _get_request_key("zone", {"params": {"b": 2, "a": 1}})
+    assert key != _get_request_key("zone", {"params": {"a": 2, "b": 2}})
+
+
+@pytest.mark.asyncio
+async def test_request_coalescing_disabled(aresponses, authenticated_local_client):
+    """Test that GET requests aren't coalesced when coalescing is disabled."""
+    async with authenticated_local_client:
+        for _ in range(2):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/zone",
+                "get",
+                aresponses.Response(
+                    text=load_fixture("zone_response.json"), status=200
+                ),
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            controller.coalesce_requests = False
+
+            await asyncio.gather(controller.zones.all(), controller.zones.all())
+            assert controller.coalesced_requests == 0
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_restore_local(aresponses, authenticated_local_client):
+    """Test restoring a local controller without any network calls."""
+    async with authenticated_local_client:
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            data = json.loads(json.dumps(client.controllers[TEST_MAC].to_dict()))
+            assert data["access_token"] == TEST_ACCESS_TOKEN
+            assert data["host"] == TEST_HOST
+
+    # Restoring shouldn't hit the network:
+    async with aiohttp.ClientSession() as session:
+        with mock.patch.object(session, "request") as mock_request:
+            client = Client(session=session)
+            client.restore_local(data)
+            mock_request.assert_not_called()
+
+        controller = client.controllers[TEST_MAC]
+        assert controller._access_token == TEST_ACCESS_TOKEN
+        assert controller.api_version == TEST_API_VERSION
+        assert controller.hardware_version == TEST_HW_VERSION
+        assert controller.name == TEST_NAME
+        assert controller.software_version == TEST_SW_VERSION
+        assert controller.to_dict() == data
+
+        # Existing controllers are skipped by default:
+        client.restore_local({**data, "name": "Other"})
+        assert client.controllers[TEST_MAC].name == TEST_NAME
+
+
+@pytest.mark.asyncio
+async def test_restore_local_expired(aresponses):
+    """Test that a restored controller with an expired token logs in again."""
+    aresponses.add(
+        f"{TEST_HOST}:{TEST_PORT}",
+        "/api/4/auth/login",
+        "post",
+        aresponses.Response(text=load_fixture("auth_login_response.json"), status=200),
+    )
+    aresponses.add(
+        f"{TEST_HOST}:{TEST_PORT}",
+        "/api/4/restrictions/raindelay",
+        "get",
+        aresponses.Response(
+            text=load_fixture("restrictions_raindelay_response.json"), status=200
+        ),
+    )
+
+    data = {
+        "access_token": "expired",
+        "access_token_expiration": (datetime.now() - timedelta(hours=1)).isoformat(),
+        "api_version": TEST_API_VERSION,
+        "hardware_version": TEST_HW_VERSION,
+        "host": TEST_HOST,
+        "mac": TEST_MAC,
+        "name": TEST_NAME,
+        "port": TEST_PORT,
+        "software_version": TEST_SW_VERSION,
+        "use_ssl": False,
+    }
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        client.restore_local(data, password=TEST_PASSWORD)
+        controller = client.controllers[TEST_MAC]
+
+        data = await controller.restrictions.raindelay()
+        assert data["delayCounter"] == -1
+        assert controller._access_token == TEST_ACCESS_TOKEN
+
+    aresponses.assert_plan_strictly_followed()
+
+
+@pytest.mark.asyncio
+async def test_restore_remote(authenticated_remote_client):
+    """Test restoring a remote controller."""
+    async with authenticated_remote_client:
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_remote(TEST_EMAIL, TEST_PASSWORD)
+            data = client.controllers[TEST_MAC].to_dict()
+
+            client = Client(session=session)
+            client.restore_remote(data)
+            controller = client.controllers[TEST_MAC]
+            assert controller._access_token == TEST_ACCESS_TOKEN
+            assert controller._host == ("https://api.rainmachine.com/12345abcde/api/4")
+            assert controller.to_dict() == data
+
+            # Controllers that are already loaded are skipped:
+            client.restore_remote({**data, "access_token": "other"})
+            assert client.controllers[TEST_MAC] is controller
+            assert controller._access_token == TEST_ACCESS_TOKEN
+
+
+@pytest.mark.asyncio
+async def test_detect_unchanged_responses(aresponses, authenticated_local_client):
+    """Test that unchanged responses are detected without being parsed again."""
+    async with authenticated_local_client:
+        for fixture in (
+            "zone_response.json",
+            "zone_response.json",
+            "zone_id_response.json",
+        ):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/zone",
+                "get",
+                aresponses.Response(text=load_fixture(fixture), status=200),
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session, detect_unchanged_responses=True)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            data = await controller.request("get", "zone")
+            assert not isinstance(data, UnchangedResponse)
+
+            with mock.patch.object(
+                client.json_codec, "loads", wraps=client.json_codec.loads
+            ) as mock_loads:
+                unchanged_data = await controller.request("get", "zone")
+                mock_loads.assert_not_called()
+                assert isinstance(unchanged_data, UnchangedResponse)
+                assert unchanged_data.unchanged
+                assert unchanged_data == data
+
+                data = await controller.request("get", "zone")
+                mock_loads.assert_called_once()
+                assert not isinstance(data, UnchangedResponse)
+                assert data["name"] == "Landscaping"
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_response_digests_bounded(monkeypatch):
+    """Test that only the most recently used response digests are kept."""
+    monkeypatch.setattr(client_module, "MAX_RESPONSE_DIGESTS", 2)
+    transport = InMemoryTransport()
+    for path in ("/api/4/zone", "/api/4/program", "/api/4/restrictions/global"):
+        transport.add_route("get", path, lambda _: {"statusCode": 0})
+    client = Client(transport=transport, detect_unchanged_responses=True)
+
+    for endpoint in ("zone", "program", "zone", "restrictions/global"):
+        await client._request("get", f"http://{TEST_HOST}/api/4/{endpoint}")
+
+    assert [url for url, _ in client._response_digests] == [
+        f"http://{TEST_HOST}/api/4/zone",
+        f"http://{TEST_HOST}/api/4/restrictions/global",
+    ]
@@ -0,0 +1,98 @@
+"""Define tests for JSON codecs."""
+# pylint: disable=protected-access
+import json
+
+import pytest
+
+from regenmaschine import Client, codec
+from regenmaschine.codec import (
+    JSONCodec,
+    OrjsonJSONCodec,
+    StdlibJSONCodec,
+    get_default_codec,
+)
+from regenmaschine.errors import RequestError
+from regenmaschine.middleware import Response
+from regenmaschine.transport import InMemoryTransport
+
+from tests.common import TEST_PASSWORD, TEST_URL, load_fixture
+
+
+@pytest.fixture(name="json_codec", params=[StdlibJSONCodec, OrjsonJSONCodec])
+def json_codec_fixture(request):
+    """Return each available codec."""
+    if request.param is OrjsonJSONCodec:
+        pytest.importorskip("orjson")
+    return request.param()
+
+
+def test_codec(json_codec):
+    """Test encoding and decoding JSON."""
+    data = json.loads(load_fixture("zone_properties_response.json"))
+    assert json_codec.loads(json_codec.dumps(data)) == data
+    assert json_codec.loads(json_codec.dumps({1: "zone"})) == {"1": "zone"}
+
+    with pytest.raises(ValueError):
+        json_codec.loads(b"<html></html>")
+
+
+def test_codec_interface():
+    """Test that codecs must implement both dumps() and loads()."""
+    with pytest.raises(TypeError):
+        JSONCodec()  # pylint: disable=abstract-class-instantiated
+
+
+def test_default_codec(monkeypatch):
+    """Test that orjson is used by default (if it's installed)."""
+    if codec.orjson is not None:
+        assert isinstance(get_default_codec(), OrjsonJSONCodec)
+
+    monkeypatch.setattr(codec, "orjson", None)
+    assert isinstance(get_default_codec(), StdlibJSONCodec)
+    with pytest.raises(RuntimeError):
+        OrjsonJSONCodec()
+
+
+@pytest.mark.asyncio
+async def test_client_codec(json_codec):
+    """Test that the client encodes requests and decodes responses with its codec."""
+
+    def _login(request):
+        assert "json" not in request.kwargs
+        assert json_codec.loads(request.kwargs["data"]) == {
+            "pwd": TEST_PASSWORD,
+            "remember": 1,
+        }
+        return Response(
+            200,
+            request.url,
+            None,
+            body=load_fixture("auth_login_response.json").encode(),
+        )
+
+    transport = InMemoryTransport()
+    transport.add_route("post", "/api/4/auth/login", _login)
+    transport.add_route(
+        "get", "/api/4/zone", lambda request: Response(200, request.url, None)
+    )
+    transport.add_route(
+        "get",
+        "/api/4/program",
+        lambda request: Response(200, request.url, None, body=b"<html></html>"),
+    )
+
+    client = Client(transport=transport, json_codec=json_codec)
+    assert client.json_codec is json_codec
+
+    data = await client._request(
+        "post",
+        f"{TEST_URL}/api/4/auth/login",
+        json={"pwd": TEST_PASSWORD, "remember": 1},
+    )
+    assert data["statusCode"] == 0
+
+    # An empty body decodes to None:
+    assert await client._request("get", f"{TEST_URL}/api/4/zone") is None
+
+    with pytest.raises(RequestError, match="Unable to parse response as JSON"):
+        await client._request("get", f"{TEST_URL}/api/4/program")
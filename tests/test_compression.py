@@ -0,0 +1,168 @@
+"""Define tests for compressed responses."""
+import gzip
+import json
+import zlib
+
+import aiohttp
+import pytest
+
+from regenmaschine import Client, compression
+from regenmaschine.compression import (
+    ACCEPT_ENCODING,
+    TransferStats,
+    decode_body,
+)
+from regenmaschine.errors import RequestError
+from regenmaschine.middleware import Response
+from regenmaschine.transport import InMemoryTransport
+
+import tests.async_mock as mock
+from tests.common import (
+    TEST_EMAIL,
+    TEST_HOST,
+    TEST_MAC,
+    TEST_PASSWORD,
+    TEST_PORT,
+    TEST_SPRINKLER_ID,
+    load_fixture,
+)
+
+
+def test_decode_body():
+    """Test decoding response bodies."""
+    body = load_fixture("zone_properties_response.json").encode()
+
+    assert decode_body(body, None) is body
+    assert decode_body(body, "identity") is body
+    assert decode_body(gzip.compress(body), "gzip") == body
+    assert decode_body(zlib.compress(body), "deflate") == body
+
+    # Some servers send raw deflate data:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    assert (
+        decode_body(compressor.compress(body) + compressor.flush(), "Deflate") == body
+    )
+
+    # Encodings are undone in the reverse order they were applied:
+    assert decode_body(gzip.compress(zlib.compress(body)), "deflate, gzip") == body
+
+    with pytest.raises(RequestError, match="Unsupported content encoding: zstd"):
+        decode_body(body, "zstd")
+    with pytest.raises(RequestError, match="Unable to decode gzip response"):
+        decode_body(body, "gzip")
+
+
+def test_decode_brotli(monkeypatch):
+    """Test that brotli bodies are decoded only if the brotli package is installed."""
+    body = load_fixture("zone_properties_response.json").encode()
+
+    monkeypatch.setattr(compression, "brotli", None)
+    with pytest.raises(RequestError, match="Unsupported content encoding: br"):
+        decode_body(body, "br")
+
+    monkeypatch.setattr(
+        compression, "brotli", mock.Mock(decompress=lambda data: data[::-1])
+    )
+    assert decode_body(body[::-1], "br") == body
+
+
+def test_transfer_stats():
+    """Test the counters for response bodies."""
+    stats = TransferStats()
+    assert stats.savings == 0.0
+
+    stats.record(250, 1000)
+    stats.record(250, 1000)
+    assert stats.responses == 2
+    assert stats.wire_bytes == 500
+    assert stats.decoded_bytes == 2000
+    assert stats.savings == 0.75
+
+
+@pytest.mark.asyncio
+async def test_compressed_cloud_responses():
+    """Test that compressed responses are requested (and decoded) from the cloud."""
+    zone_properties = load_fixture("zone_properties_response.json").encode()
+    transport = InMemoryTransport()
+    for path, fixture in (
+        ("/login/auth", "remote_auth_login_1_response.json"),
+        ("/devices/get-sprinklers", "remote_sprinklers_response.json"),
+        ("/devices/login-sprinkler", "remote_auth_login_2_response.json"),
+    ):
+        transport.add_route(
+            "post", path, lambda _, data=json.loads(load_fixture(fixture)): data
+        )
+    transport.add_route(
+        "get",
+        f"/{TEST_SPRINKLER_ID}/api/4/apiVer",
+        lambda _: json.loads(load_fixture("api_version_response.json")),
+    )
+
+    def _zone_properties(request):
+        assert request.kwargs["headers"]["Accept-Encoding"] == ACCEPT_ENCODING
+        return Response(
+            200,
+            request.url,
+            None,
+            {"Content-Encoding": "gzip"},
+            body=gzip.compress(zone_properties),
+        )
+
+    transport.add_route(
+        "get", f"/{TEST_SPRINKLER_ID}/api/4/zone/properties", _zone_properties
+    )
+
+    async with Client(transport=transport) as client:
+        await client.load_remote(TEST_EMAIL, TEST_PASSWORD)
+        controller = client.controllers[TEST_MAC]
+        data = await controller.request("get", "zone/properties")
+        assert len(data["zones"]) == 12
+
+        stats = client.get_transfer_stats("api.rainmachine.com")
+        assert stats.decoded_bytes > stats.wire_bytes
+        assert stats.savings > 0.5
+
+
+@pytest.mark.asyncio
+async def test_local_compression(aresponses, authenticated_local_client):
+    """Test that compressed responses are only requested locally if enabled."""
+    zone_properties = load_fixture("zone_properties_response.json").encode()
+
+    async def _zone_properties(request):
+        if request.headers["Accept-Encoding"] == "identity":
+            return aresponses.Response(body=zone_properties)
+        return aresponses.Response(
+            body=gzip.compress(zone_properties), headers={"Content-Encoding": "gzip"}
+        )
+
+    async with authenticated_local_client:
+        for _ in range(2):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/zone/properties",
+                "get",
+                _zone_properties,
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            stats = client.get_transfer_stats(TEST_HOST)
+
+            responses = stats.responses
+            await controller.request("get", "zone/properties")
+            assert stats.responses == responses + 1
+            assert stats.savings == 0.0
+
+            client.set_compression(TEST_HOST, True)
+            decoded_bytes = stats.decoded_bytes
+            wire_bytes = stats.wire_bytes
+            data = await controller.request("get", "zone/properties")
+            assert len(data["zones"]) == 12
+            assert stats.decoded_bytes - decoded_bytes == len(zone_properties)
+            assert stats.wire_bytes - wire_bytes == len(gzip.compress(zone_properties))
+
+    authenticated_local_client.assert_no_unused_routes()
@@ -0,0 +1,215 @@
+"""Define tests for adaptive concurrency limiting."""
+# pylint: disable=protected-access
+import asyncio
+import json
+
+import aiohttp
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.concurrency import AdaptiveConcurrencyLimiter
+from regenmaschine.errors import RequestError, TransientError
+from regenmaschine.middleware import Response
+from regenmaschine.retry import RetryPolicy
+
+from tests.common import TEST_HOST, TEST_MAC, TEST_PASSWORD, TEST_PORT, load_fixture
+from tests.test_transport import create_local_transport
+
+
+async def _respond():
+    """Simulate a response."""
+    return {"statusCode": 0}
+
+
+def test_limit_adjustments():
+    """Test that the limit grows additively and shrinks multiplicatively."""
+    limiter = AdaptiveConcurrencyLimiter(4, max_limit=6)
+    assert limiter.limit == 4
+
+    # Latency at the baseline grows the limit by about one per limit's worth:
+    for _ in range(5):
+        limiter._record_latency("zone", 0.05)
+    assert limiter.limit == 5
+    assert limiter.baseline_latencies == {"zone": 0.05}
+
+    for _ in range(20):
+        limiter._record_latency("zone", 0.05)
+    assert limiter.limit == 6
+
+    # A slower endpoint gets a baseline of its own (rather than looking inflated):
+    limiter._record_latency("zone/*/properties", 0.5)
+    assert limiter.limit == 6
+    assert limiter.baseline_latencies["zone/*/properties"] == 0.5
+
+    # Inflated latency shrinks it:
+    limiter._record_latency("zone", 0.5)
+    assert limiter.limit == 3
+    limiter._record_latency("zone", 0.5)
+    limiter._record_latency("zone", 0.5)
+    assert limiter.limit == 1
+
+
+def test_limit_steady_under_jitter():
+    """Test that jittery (but steady) latency doesn't keep the limit down."""
+    limiter = AdaptiveConcurrencyLimiter(4, max_limit=8)
+
+    # A single unusually fast response only shrinks the limit briefly:
+    limiter._record_latency("zone", 0.005)
+    for _ in range(200):
+        limiter._record_latency("zone", 0.011)
+    assert limiter.limit == 8
+    assert limiter.baseline_latencies["zone"] == pytest.approx(0.011, rel=1e-3)
+
+    for idx in range(200):
+        limiter._record_latency("zone", 0.005 if idx % 2 else 0.011)
+    assert limiter.limit == 8
+    assert 0.005 < limiter.baseline_latencies["zone"] < 0.011
+
+    # Sustained overload does shrink it:
+    limiter._record_latency("zone", 0.05)
+    limiter._record_latency("zone", 0.05)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_limit_shrinks_on_transient_errors():
+    """Test that transient errors shrink the limit (but other errors don't)."""
+    limiter = AdaptiveConcurrencyLimiter(8)
+
+    async def _fail():
+        raise TransientError("Timed out")
+
+    async def _respond_with_error():
+        raise RequestError("Bad request")
+
+    with pytest.raises(RequestError):
+        await limiter.run(_respond_with_error)
+    assert limiter.limit == 8
+
+    with pytest.raises(TransientError):
+        await limiter.run(_fail)
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_requests_queue_within_limit():
+    """Test that requests beyond the limit wait their turn."""
+    limiter = AdaptiveConcurrencyLimiter(2)
+    release = asyncio.Event()
+    order = []
+
+    async def _request(idx):
+        async def _wait():
+            order.append(idx)
+            await release.wait()
+            return idx
+
+        return await limiter.run(_wait)
+
+    tasks = [asyncio.create_task(_request(idx)) for idx in range(5)]
+    await asyncio.sleep(0)
+    assert limiter.in_flight == 2
+    assert limiter.queue_depth == 3
+
+    # A cancelled waiter gives up its place in line:
+    tasks[2].cancel()
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 2
+
+    release.set()
+    assert await asyncio.gather(*tasks[:2], *tasks[3:]) == [0, 1, 3, 4]
+    assert order == [0, 1, 3, 4]
+    assert limiter.in_flight == 0
+    assert limiter.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_after_slot_handed_over():
+    """Test that a waiter cancelled right after getting a slot passes it on."""
+    limiter = AdaptiveConcurrencyLimiter(1)
+    limiter.in_flight = 1
+
+    second = asyncio.create_task(limiter.run(_respond))
+    third = asyncio.create_task(limiter.run(_respond))
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 2
+
+    # Free up the slot and hand it to the second request, which is then cancelled
+    # before it gets to run:
+    limiter.in_flight -= 1
+    limiter._wake_waiters()
+    second.cancel()
+
+    assert await third == {"statusCode": 0}
+    with pytest.raises(asyncio.CancelledError):
+        await second
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_controller_concurrency_limiter(aresponses, authenticated_local_client):
+    """Test that a controller's requests go through its concurrency limiter."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone/properties",
+            "get",
+            aresponses.Response(
+                text=load_fixture("zone_properties_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                concurrency_limiter_factory=lambda: AdaptiveConcurrencyLimiter(1),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            zones = await controller.zones.all(details=True)
+            assert zones
+            assert set(controller.concurrency_limiter.baseline_latencies) == {
+                "zone",
+                "zone/properties",
+            }
+            assert controller.concurrency_limiter.in_flight == 0
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_limiter_measures_attempts_only():
+    """Test that delays between retries neither hold a slot nor count as latency."""
+    attempts = []
+
+    def _zone(request):
+        attempts.append(limiter.in_flight)
+        if len(attempts) == 1:
+            return Response(503, request.url, None)
+        return json.loads(load_fixture("zone_response.json"))
+
+    limiter = AdaptiveConcurrencyLimiter(4)
+    transport = create_local_transport()
+    transport.add_route("get", "/api/4/zone/1", _zone)
+    client = Client(
+        transport=transport,
+        concurrency_limiter_factory=lambda: limiter,
+        retry_policy=RetryPolicy(max_attempts=2, backoff_base=0.2, jitter=0.0),
+    )
+    await client.load_local(TEST_HOST, TEST_PASSWORD, port=TEST_PORT)
+    controller = client.controllers[TEST_MAC]
+
+    await controller.zones.get(1)
+    assert attempts == [1, 1]
+    assert limiter.in_flight == 0
+    assert limiter.baseline_latencies["zone/*"] < 0.2
@@ -0,0 +1,161 @@
+"""Define tests for connection pooling policies."""
+# pylint: disable=protected-access
+import time
+
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.connection import (
+    IDLE_CLOSE_PROBE_INTERVAL,
+    ConnectionPolicy,
+    HostConnectionState,
+)
+
+from tests.common import TEST_HOST, TEST_PASSWORD, TEST_PORT, load_fixture
+
+
+@pytest.mark.asyncio
+async def test_connection_policy_connector():
+    """Test that a connection policy creates an appropriate connector."""
+    connector = ConnectionPolicy(
+        limit_per_host=1, keepalive_timeout=5
+    ).create_connector()
+    assert connector.limit_per_host == 1
+    assert not connector.force_close
+    await connector.close()
+
+    connector = ConnectionPolicy(force_close=True).create_connector()
+    assert connector.force_close
+    await connector.close()
+
+
+def _record_disconnect_after(state, idle_time):
+    """Record a disconnect after a number of idle seconds."""
+    state.last_activity = time.monotonic() - idle_time
+    state.record_disconnect()
+
+
+def test_idle_close_window_learning():
+    """Test learning the window after which a host drops idle connections."""
+    state = HostConnectionState()
+    assert not state.should_retire_connections()
+
+    # A disconnect without any prior activity teaches us nothing:
+    state.record_disconnect()
+    assert state.idle_close_window is None
+
+    # Neither do disconnects after very short idle times:
+    _record_disconnect_after(state, 0.1)
+    assert state.idle_close_window is None
+
+    # It takes a few disconnects to learn the window:
+    _record_disconnect_after(state, 10)
+    _record_disconnect_after(state, 1.5)
+    assert state.idle_close_window is None
+    _record_disconnect_after(state, 10)
+    assert 10 <= state.idle_close_window < 11
+
+    # A single outlier doesn't move it:
+    _record_disconnect_after(state, 2)
+    assert 10 <= state.idle_close_window < 11
+
+    state.last_activity = time.monotonic() - 9
+    assert state.should_retire_connections()
+
+    state.in_flight = 1
+    assert not state.should_retire_connections()
+
+    # Without any activity to measure from, there's nothing to retire:
+    state = HostConnectionState()
+    state.idle_close_window = 10
+    assert not state.should_retire_connections()
+
+
+def test_idle_close_window_growth():
+    """Test that the window grows when connections outlive it."""
+    state = HostConnectionState()
+    for _ in range(3):
+        _record_disconnect_after(state, 2)
+    assert 2 <= state.idle_close_window < 3
+
+    # Connections are kept past the window every once in a while:
+    state.last_activity = time.monotonic() - 5
+    retirements = [state.should_retire_connections() for _ in range(10)]
+    assert retirements == [True] * 9 + [False]
+
+    # Reusing one that was idle for less than the window tells us nothing:
+    state.record_reuse(None)
+    state.record_reuse(1)
+    assert 2 <= state.idle_close_window < 3
+
+    state.record_reuse(5)
+    assert state.idle_close_window == 5
+
+    # Unlearned windows don't grow:
+    state = HostConnectionState()
+    state.record_reuse(5)
+    assert state.idle_close_window is None
+
+
+@pytest.mark.asyncio
+async def test_host_connection_policy(aresponses, authenticated_local_client):
+    """Test that a host-specific connection policy is used for owned sessions."""
+    async with authenticated_local_client:
+        async with Client() as client:
+            client.set_connection_policy(TEST_HOST, ConnectionPolicy(force_close=True))
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            session = client.transport._owned_sessions[TEST_HOST]
+            assert session.connector.force_close
+            # Only the client's per-request timeouts apply:
+            assert session.timeout.total is None
+
+
+@pytest.mark.asyncio
+async def test_retire_idle_connections(aresponses, authenticated_local_client):
+    """Test that connections are retired once the learned idle window passes."""
+    async with authenticated_local_client:
+        for _ in range(3):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/restrictions/raindelay",
+                "get",
+                aresponses.Response(
+                    text=load_fixture("restrictions_raindelay_response.json"),
+                    status=200,
+                ),
+            )
+
+        async with Client() as client:
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[next(iter(client.controllers))]
+            session = client.transport._owned_sessions[TEST_HOST]
+            host_state = client.transport._host_states[TEST_HOST]
+
+            # Simulate the device dropping connections that were idle for 10 seconds:
+            for _ in range(3):
+                _record_disconnect_after(host_state, 10)
+            host_state.record_activity()
+            assert client.get_idle_close_window(TEST_HOST) >= 10
+
+            # A request made shortly after the last one reuses the pool:
+            await controller.restrictions.raindelay()
+            assert client.transport._owned_sessions[TEST_HOST] is session
+
+            # ...but once we approach the idle window, the pool is retired first:
+            host_state.last_activity = time.monotonic() - 9
+            await controller.restrictions.raindelay()
+            assert session.closed
+            assert client.transport._owned_sessions[TEST_HOST] is not session
+            session = client.transport._owned_sessions[TEST_HOST]
+
+            # When the pool is kept past the window (as a probe) and the host turns out
+            # to keep connections open for longer, the window grows:
+            host_state._retirements = IDLE_CLOSE_PROBE_INTERVAL - 1
+            host_state.last_activity = time.monotonic() - 12
+            await controller.restrictions.raindelay()
+            assert client.transport._owned_sessions[TEST_HOST] is session
+            assert client.get_idle_close_window(TEST_HOST) >= 12
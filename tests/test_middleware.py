@@ -0,0 +1,126 @@
+"""Define tests for the middleware chain."""
+# pylint: disable=protected-access
+import aiohttp
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.errors import RequestError, UnknownAPICallError
+from regenmaschine.middleware import (
+    Request,
+    Response,
+    compose,
+    raise_for_error_middleware,
+)
+
+from tests.common import (
+    TEST_HOST,
+    TEST_MAC,
+    TEST_PASSWORD,
+    TEST_PORT,
+    TEST_URL,
+    load_fixture,
+)
+
+
+@pytest.mark.asyncio
+async def test_compose():
+    """Test that middlewares run in order and can short-circuit requests."""
+    calls = []
+
+    async def _handler(request):
+        calls.append("handler")
+        return Response(200, request.url, {"url": request.url})
+
+    def _middleware(name):
+        async def _middleware_(request, handler):
+            calls.append(name)
+            return await handler(request)
+
+        return _middleware_
+
+    async def _short_circuit(request, _):
+        return Response(200, request.url, {"cached": True})
+
+    request = Request("get", f"{TEST_URL}/api/4/zone", TEST_HOST, {})
+
+    handler = compose([], _handler)
+    assert handler is _handler
+
+    handler = compose([_middleware("first"), _middleware("second")], _handler)
+    response = await handler(request)
+    assert response.data == {"url": request.url}
+    assert calls == ["first", "second", "handler"]
+
+    calls.clear()
+    handler = compose([_middleware("first"), _short_circuit], _handler)
+    response = await handler(request)
+    assert response.data == {"cached": True}
+    assert calls == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_raise_for_error_middleware():
+    """Test that the built-in error middleware raises for error responses."""
+    request = Request("get", f"{TEST_URL}/api/4/zone", TEST_HOST, {})
+
+    async def _unknown_api_call(request):
+        return Response(400, request.url, {"statusCode": 13, "message": "Unknown"})
+
+    async def _not_found(request):
+        return Response(404, request.url, None, reason="Not Found")
+
+    with pytest.raises(UnknownAPICallError):
+        await raise_for_error_middleware(request, _unknown_api_call)
+    with pytest.raises(RequestError, match="404, message='Not Found'"):
+        await raise_for_error_middleware(request, _not_found)
+
+
+@pytest.mark.asyncio
+async def test_client_middlewares(aresponses, authenticated_local_client):
+    """Test that requests made by controllers pass through the client's middlewares."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+
+        seen = []
+
+        async def _record(request, handler):
+            response = await handler(request)
+            seen.append((request.method, request.url, response.status))
+            return response
+
+        async def _add_header(request, handler):
+            request.kwargs["headers"]["X-Test"] = "1"
+            response = await handler(request)
+            response.data = {**response.data, "decorated": True}
+            return response
+
+        async def _replay(request, handler):
+            if request.url.endswith("/program"):
+                return Response(200, request.url, {"programs": []})
+            return await handler(request)
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session, middlewares=[_record])
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            assert [method for method, _, _ in seen] == ["post", "get", "get", "get"]
+
+            client.add_middleware(_add_header)
+            client.add_middleware(_replay)
+
+            data = await controller.request("get", "zone")
+            assert data["decorated"]
+            assert seen[-1] == ("get", f"{TEST_URL}/api/4/zone", 200)
+
+            # Short-circuited requests never hit the network:
+            data = await controller.request("get", "program")
+            assert data == {"programs": [], "decorated": True}
+
+        authenticated_local_client.assert_no_unused_routes()
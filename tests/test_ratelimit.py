@@ -0,0 +1,105 @@
+"""Define tests for rate limiting."""
+# pylint: disable=protected-access
+import asyncio
+
+import aiohttp
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.controller import RemoteController
+from regenmaschine.ratelimit import RateLimit, TokenBucket
+
+import tests.async_mock as mock
+from tests.common import (
+    TEST_EMAIL,
+    TEST_HOST,
+    TEST_MAC,
+    TEST_PASSWORD,
+    TEST_PORT,
+)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_burst():
+    """Test that a bucket allows a burst and then limits the rate."""
+    bucket = RateLimit(rate=100, burst=3).create_bucket()
+    assert bucket.capacity == 3
+    assert bucket.tokens == 3
+    assert bucket.average_wait_time == 0
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(3):
+        await bucket.acquire()
+    assert loop.time() - start < 0.01
+    assert bucket.tokens < 1
+
+    await bucket.acquire()
+    assert bucket.acquired == 4
+    assert bucket.wait_time > 0
+    assert bucket.average_wait_time == bucket.wait_time / 4
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_fifo():
+    """Test that waiters get tokens in the order they arrived."""
+    bucket = TokenBucket(rate=200)
+    order = []
+
+    async def _acquire(idx):
+        await bucket.acquire()
+        order.append(idx)
+
+    tasks = [asyncio.create_task(_acquire(idx)) for idx in range(5)]
+    await asyncio.sleep(0)
+    assert bucket.waiting == 4
+    await asyncio.gather(*tasks)
+
+    assert order == [0, 1, 2, 3, 4]
+    assert bucket.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_host_rate_limit(authenticated_local_client):
+    """Test that requests to a host take tokens from its bucket."""
+    async with authenticated_local_client:
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session, rate_limit=RateLimit(rate=1000, burst=10))
+            client.set_rate_limit(TEST_HOST, RateLimit(rate=1000, burst=5))
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+
+            limiter = client.get_rate_limiter(TEST_HOST)
+            assert limiter.capacity == 5
+            # Logging in, then fetching the MAC address, versions, and name:
+            assert limiter.acquired == 4
+
+            assert client.get_rate_limiter("192.168.1.200").capacity == 10
+
+
+@pytest.mark.asyncio
+async def test_no_rate_limit():
+    """Test that hosts aren't rate limited by default."""
+    client = Client()
+    assert client.get_rate_limiter(TEST_HOST) is None
+
+
+@pytest.mark.asyncio
+async def test_cloud_rate_limit(authenticated_remote_client):
+    """Test that a cloud account's requests share a bucket."""
+    async with authenticated_remote_client:
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session, cloud_rate_limit=RateLimit(rate=1000))
+            await client.load_remote(TEST_EMAIL, TEST_PASSWORD)
+
+            limiter = client.remote_accounts[TEST_EMAIL].rate_limiter
+            # Logging in, getting sprinklers, logging in to the sprinkler, and fetching
+            # its versions:
+            assert limiter.acquired == 4
+            assert client.controllers[TEST_MAC]._get_rate_limiter() is limiter
+            assert client.get_rate_limiter("api.rainmachine.com") is None
+
+    # Controllers without an account fall back to the host's rate limiter:
+    controller = RemoteController(mock.AsyncMock())
+    assert controller._get_rate_limiter() is None
@@ -0,0 +1,200 @@
+"""Define tests for retry policies."""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import aiohttp
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.errors import (
+    RequestError,
+    TokenExpiredError,
+    TransientError,
+    UnknownAPICallError,
+)
+from regenmaschine.retry import (
+    RetryPolicy,
+    get_endpoint,
+    get_endpoint_template,
+    get_retry_after,
+)
+
+import tests.async_mock as mock
+from tests.common import (
+    TEST_HOST,
+    TEST_MAC,
+    TEST_PASSWORD,
+    TEST_PORT,
+    TEST_URL,
+    load_fixture,
+)
+
+
+def test_get_endpoint():
+    """Test getting the endpoint a URL refers to."""
+    assert get_endpoint(f"{TEST_URL}/api/4/zone/1/start") == "zone/1/start"
+    assert get_endpoint("https://my.rainmachine.com/login/auth") == "login/auth"
+
+
+def test_get_endpoint_template():
+    """Test wildcarding the IDs and dates in an endpoint."""
+    assert get_endpoint_template("zone/1/start") == "zone/*/start"
+    assert get_endpoint_template("watering/log/2023-01-01/7") == "watering/log/*/*"
+    assert get_endpoint_template("apiVer") == "apiVer"
+
+
+def test_get_retry_after():
+    """Test parsing Retry-After header values."""
+    assert get_retry_after(None) is None
+    assert get_retry_after("") is None
+    assert get_retry_after("120") == 120
+    assert get_retry_after("-5") == 0
+    assert get_retry_after("soon") is None
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 < get_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    assert get_retry_after("Sun, 06 Nov 1994 08:49:37 GMT") == 0
+    # Dates without a (known) timezone are treated as UTC:
+    assert get_retry_after("Sun, 06 Nov 1994 08:49:37 -0000") == 0
+
+
+def test_get_delay():
+    """Test exponential backoff (with and without jitter)."""
+    policy = RetryPolicy(backoff_base=1, backoff_max=5, jitter=0)
+    err = TransientError("Error")
+    assert [policy.get_delay(attempt, err) for attempt in range(1, 5)] == [1, 2, 4, 5]
+    assert policy.get_delay(1, TransientError("Error", retry_after=30)) == 30
+
+    policy = RetryPolicy(backoff_base=1, jitter=0.5)
+    for _ in range(100):
+        assert 2 <= policy.get_delay(3, err) <= 4
+
+
+def test_is_retryable():
+    """Test classifying errors and requests as retryable."""
+    policy = RetryPolicy(max_attempts=3, idempotent_posts=("zone/*/properties",))
+    url = f"{TEST_URL}/api/4"
+
+    assert policy.is_retryable("get", f"{url}/zone", TransientError("Error"))
+    assert not policy.is_retryable("get", f"{url}/zone", RequestError("Error"))
+    assert not policy.is_retryable("get", f"{url}/zone", TokenExpiredError("Error"))
+    assert not policy.is_retryable("get", f"{url}/zone", UnknownAPICallError("Error"))
+
+    assert policy.is_retryable(
+        "post", f"{url}/zone/1/properties", TransientError("Error")
+    )
+    assert not policy.is_retryable(
+        "post", f"{url}/zone/1/start", TransientError("Error")
+    )
+
+
+@pytest.mark.asyncio
+async def test_retry_transient_errors(aresponses, authenticated_local_client):
+    """Test that transient errors are retried (honoring Retry-After)."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text="Service Unavailable", status=503),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(
+                text="Too Many Requests", status=429, headers={"Retry-After": "7"}
+            ),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                retry_policy=RetryPolicy(max_attempts=3, backoff_base=0.01),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            with mock.patch("asyncio.sleep") as mock_sleep:
+                data = await controller.request("get", "zone")
+            assert data["zones"]
+
+            [first_call, second_call] = mock_sleep.call_args_list
+            assert first_call.args[0] <= 0.01
+            assert second_call.args[0] == 7
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_retry_not_idempotent(aresponses, authenticated_local_client):
+    """Test that POSTs aren't retried unless they're marked as idempotent."""
+    async with authenticated_local_client:
+        for _ in range(3):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/zone/1/start",
+                "post",
+                aresponses.Response(text="Bad Gateway", status=502),
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            client.set_retry_policy(
+                TEST_HOST,
+                RetryPolicy(
+                    max_attempts=2, backoff_base=0, idempotent_posts=("zone/*/start",)
+                ),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            # Retried once (and then given up on):
+            with pytest.raises(TransientError):
+                await controller.zones.start(1, 60)
+
+            client.set_retry_policy(TEST_HOST, RetryPolicy(max_attempts=2))
+            with pytest.raises(TransientError):
+                await controller.zones.start(1, 60)
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_retry_deadline(aresponses, authenticated_local_client):
+    """Test that requests aren't retried past the policy's deadline."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(
+                text="Too Many Requests", status=429, headers={"Retry-After": "60"}
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                retry_policy=RetryPolicy(max_attempts=5, deadline=30),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            with pytest.raises(TransientError) as err:
+                await controller.request("get", "zone")
+            assert err.value.retry_after == 60
+
+        authenticated_local_client.assert_no_unused_routes()
@@ -5,6 +5,7 @@ import aiohttp
 import pytest
 
 from regenmaschine import Client
+from regenmaschine.cache import HistoryCache
 
 from .common import TEST_HOST, TEST_PASSWORD, TEST_PORT, load_fixture
 
@@ -45,3 +46,31 @@ async def test_stats(aresponses, authenticated_local_client):
 
             data = await controller.stats.upcoming(details=True)
             assert len(data[0]["programs"]) == 4
+
+
+@pytest.mark.asyncio
+async def test_stats_history_cache(aresponses, authenticated_local_client):
+    """Test that statistics for past dates are cached."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/dailystats/2018-06-04",
+            "get",
+            aresponses.Response(
+                text=load_fixture("dailystats_date_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session, history_cache_factory=HistoryCache)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = next(iter(client.controllers.values()))
+
+            for _ in range(2):
+                data = await controller.stats.on_date(date(2018, 6, 4))
+                assert data["percentage"] == 100
+            assert controller.history.hits == 1
+
+        authenticated_local_client.assert_no_unused_routes()
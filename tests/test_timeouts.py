@@ -0,0 +1,333 @@
+"""Define tests for request timeouts."""
+# pylint: disable=protected-access
+import asyncio
+import json
+
+import aiohttp
+import async_timeout
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.errors import RequestTimeoutError
+from regenmaschine.timeouts import (
+    RTTEstimator,
+    deadline,
+    get_remaining_time,
+    wait_with_deadline,
+)
+
+import tests.async_mock as mock
+from tests.common import (
+    TEST_EMAIL,
+    TEST_HOST,
+    TEST_MAC,
+    TEST_PASSWORD,
+    TEST_PORT,
+    load_fixture,
+)
+from tests.test_transport import create_cloud_transport, create_local_transport
+
+
+def test_rtt_estimation():
+    """Test deriving a timeout from round-trip times (per RFC 6298)."""
+    estimator = RTTEstimator(min_timeout=0.1, max_timeout=10)
+    assert estimator.timeout is None
+
+    estimator.record_rtt(0.04)
+    assert estimator.srtt == 0.04
+    assert estimator.rttvar == 0.02
+    assert estimator.timeout == pytest.approx(0.12)
+
+    estimator.record_rtt(0.08)
+    assert estimator.rttvar == pytest.approx(0.75 * 0.02 + 0.25 * 0.04)
+    assert estimator.srtt == pytest.approx(0.875 * 0.04 + 0.125 * 0.08)
+    assert estimator.timeout == pytest.approx(estimator.srtt + 4 * estimator.rttvar)
+
+    # Steady round-trip times converge on a tight timeout (but not below the floor):
+    for _ in range(100):
+        estimator.record_rtt(0.01)
+    assert estimator.timeout == 0.1
+
+    # Timeouts back off (but not above the ceiling):
+    estimator.record_timeout()
+    assert estimator.timeout == 0.2
+    for _ in range(10):
+        estimator.record_timeout()
+    assert estimator.timeout == 10
+
+    estimator.record_rtt(60)
+    assert estimator.timeout == 10
+
+
+def test_rtt_estimation_timeout_before_samples():
+    """Test that timeouts before any round trip don't suggest a timeout."""
+    estimator = RTTEstimator()
+    estimator.record_timeout()
+    assert estimator.timeout is None
+
+
+@pytest.mark.asyncio
+async def test_adaptive_timeouts(aresponses, authenticated_local_client):
+    """Test that a controller's requests use its adaptive timeout."""
+    async with authenticated_local_client:
+        for _ in range(2):
+            authenticated_local_client.add(
+                f"{TEST_HOST}:{TEST_PORT}",
+                "/api/4/zone",
+                "get",
+                aresponses.Response(
+                    text=load_fixture("zone_response.json"), status=200
+                ),
+            )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                rtt_estimator_factory=lambda: RTTEstimator(min_timeout=0.1),
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            await controller.request("get", "zone")
+            estimator = controller.get_rtt_estimator("zone")
+            assert estimator.srtt is not None
+            assert estimator.timeout == 0.1
+            # Other endpoints have estimates of their own:
+            assert controller.get_rtt_estimator("zone/1/properties").srtt is None
+
+            async def _slow_read(*args, **kwargs):  # pylint: disable=unused-argument
+                await asyncio.sleep(0.5)
+
+            # An attempt that takes longer than the learned timeout times out (even
+            # though the client's own request_timeout is much longer):
+            with mock.patch.object(
+                aiohttp.ClientResponse, "read", _slow_read
+            ), pytest.raises(RequestTimeoutError):
+                await controller.request("get", "zone")
+            assert estimator.timeout == 0.2
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_deadline():
+    """Test that deadlines nest and flow into concurrent tasks."""
+    assert get_remaining_time() is None
+
+    with deadline(10):
+        assert 9 < get_remaining_time() <= 10
+
+        # Nested deadlines can only shorten the outer one:
+        with deadline(60):
+            assert get_remaining_time() <= 10
+        with deadline(1):
+            assert get_remaining_time() <= 1
+
+        async def _get_remaining_time():
+            return get_remaining_time()
+
+        remaining = await asyncio.gather(_get_remaining_time(), _get_remaining_time())
+        assert all(9 < value <= 10 for value in remaining)
+
+    assert get_remaining_time() is None
+
+
+def test_endpoint_timeouts():
+    """Test configuring timeouts per endpoint."""
+    client = Client(endpoint_timeouts={"diag/log": 120, "zone/*/properties": 5})
+    assert client.get_endpoint_timeout("diag/log") == 120
+    assert client.get_endpoint_timeout("zone/1/properties") == 5
+    assert client.get_endpoint_timeout("zone") is None
+    # Resolved timeouts are memoized:
+    assert client._resolved_endpoint_timeouts["zone/1/properties"] == 5
+
+
+@pytest.mark.asyncio
+async def test_endpoint_timeout_used(aresponses, authenticated_local_client):
+    """Test that an endpoint's timeout takes precedence over the learned one."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/diag/log",
+            "get",
+            aresponses.Response(
+                text=load_fixture("diag_log_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(
+                session=session,
+                endpoint_timeouts={"diag/log": 0.1},
+                rtt_estimator_factory=RTTEstimator,
+            )
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+            estimator = controller.get_rtt_estimator("diag/log")
+            estimator.record_rtt(10)
+
+            with mock.patch(
+                "async_timeout.timeout", wraps=async_timeout.timeout
+            ) as mock_timeout:
+                await controller.diagnostics.log()
+            mock_timeout.assert_called_once_with(0.1)
+            # Slow endpoints with their own timeouts don't skew the estimate:
+            assert estimator.srtt == 10
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_deadline_shared_by_concurrent_requests(
+    aresponses, authenticated_local_client
+):
+    """Test that concurrent requests share a deadline's budget."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone",
+            "get",
+            aresponses.Response(text=load_fixture("zone_response.json"), status=200),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/zone/properties",
+            "get",
+            aresponses.Response(
+                text=load_fixture("zone_properties_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = client.controllers[TEST_MAC]
+
+            async def _slow_read(*args, **kwargs):  # pylint: disable=unused-argument
+                await asyncio.sleep(5)
+
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            with mock.patch.object(
+                aiohttp.ClientResponse, "read", _slow_read
+            ), pytest.raises(RequestTimeoutError), deadline(0.2):
+                await controller.zones.all(details=True)
+            assert loop.time() - start < 1
+
+            # The (shared) requests themselves aren't bound by the deadline:
+            tasks = list(controller._in_flight_requests.values())
+            assert len(tasks) == 2
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            # Once the deadline has passed, requests fail without a network call:
+            with deadline(0), mock.patch.object(
+                session, "request"
+            ) as mock_request, pytest.raises(RequestTimeoutError):
+                await controller.zones.all()
+            mock_request.assert_not_called()
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
+@pytest.mark.asyncio
+async def test_deadline_per_coalesced_waiter():
+    """Test that a coalesced request isn't bound by the deadline of its starter."""
+
+    async def _zone(_):
+        await asyncio.sleep(0.2)
+        return json.loads(load_fixture("zone_response.json"))
+
+    transport = create_local_transport()
+    transport.add_route("get", "/api/4/zone", _zone)
+    client = Client(transport=transport)
+    await client.load_local(TEST_HOST, TEST_PASSWORD, port=TEST_PORT)
+    controller = client.controllers[TEST_MAC]
+
+    async def _get_zones_within(seconds):
+        with deadline(seconds):
+            return await controller.request("get", "zone")
+
+    impatient = asyncio.create_task(_get_zones_within(0.05))
+    await asyncio.sleep(0)
+    patient = asyncio.create_task(controller.request("get", "zone"))
+
+    with pytest.raises(RequestTimeoutError):
+        await impatient
+    data = await patient
+    assert len(data["zones"]) == 12
+    assert controller.coalesced_requests == 1
+
+    # A deadline that has already passed doesn't start (or join) a request at all:
+    with deadline(0), pytest.raises(RequestTimeoutError):
+        await controller.request("get", "zone")
+    assert not controller._in_flight_requests
+
+
+@pytest.mark.asyncio
+async def test_deadline_per_login_waiter():
+    """Test that a shared (cloud) login isn't bound by the deadline of its starter."""
+    logged_in = asyncio.Event()
+
+    async def _login(_):
+        await asyncio.sleep(0.2)
+        logged_in.set()
+        return json.loads(load_fixture("remote_auth_login_1_response.json"))
+
+    transport = create_cloud_transport()
+    transport.add_route("post", "/login/auth", _login)
+    client = Client(transport=transport)
+    account = client._get_remote_account(TEST_EMAIL, TEST_PASSWORD)
+
+    with deadline(0.05), pytest.raises(RequestTimeoutError):
+        await account.get_access_token()
+
+    async with async_timeout.timeout(1):
+        await logged_in.wait()
+    assert await account.get_access_token() == "12345abcdef"
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_attempts():
+    """Test that an attempt's timeout is cut short by the deadline."""
+    calls = []
+
+    async def _start_zone(_):
+        calls.append(None)
+        await asyncio.sleep(1)
+
+    transport = create_local_transport()
+    transport.add_route("post", "/api/4/zone/1/start", _start_zone)
+    client = Client(transport=transport)
+    url = f"http://{TEST_HOST}/api/4/zone/1/start"
+    estimator = RTTEstimator()
+    estimator.record_rtt(0.5)
+
+    with deadline(0.05), pytest.raises(RequestTimeoutError):
+        await client._request("post", url, rtt_estimator=estimator)
+    assert len(calls) == 1
+    # A timeout caused by the deadline says nothing about round trips:
+    assert estimator.timeout == 1.5
+
+    with deadline(0), pytest.raises(RequestTimeoutError):
+        await client._request("post", url, rtt_estimator=estimator)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_wait_with_deadline():
+    """Test that only timeouts caused by the deadline are reported as such."""
+
+    async def _time_out():
+        raise asyncio.TimeoutError
+
+    with deadline(10), pytest.raises(asyncio.TimeoutError) as err:
+        await wait_with_deadline(_time_out)
+    assert not isinstance(err.value, RequestTimeoutError)
@@ -0,0 +1,117 @@
+"""Define tests for TLS session resumption."""
+import os
+import ssl
+import warnings
+
+from aiohttp import web
+import pytest
+
+from regenmaschine import Client
+from regenmaschine.connection import ConnectionPolicy
+from regenmaschine.tls import (
+    ResumableSSLObject,
+    SessionCachingSSLContext,
+    create_legacy_ssl_context,
+    get_legacy_ssl_context,
+)
+
+from tests.common import load_fixture
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+async def _start_tls_server(maximum_version: ssl.TLSVersion) -> tuple:
+    """Start a local TLS server that mimics the apiVer endpoint."""
+
+    async def api_version(_: web.Request) -> web.Response:
+        """Return a canned apiVer response."""
+        return web.Response(text=load_fixture("api_version_response.json"))
+
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.maximum_version = maximum_version
+    server_context.load_cert_chain(
+        os.path.join(FIXTURES_PATH, "tls_cert.pem"),
+        os.path.join(FIXTURES_PATH, "tls_key.pem"),
+    )
+
+    app = web.Application()
+    app.router.add_get("/api/4/apiVer", api_version)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=server_context)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+    return runner, f"https://127.0.0.1:{port}/api/4/apiVer"
+
+
+def test_legacy_ssl_context():
+    """Test the configuration of the legacy-compatible SSL context."""
+    context = create_legacy_ssl_context()
+    assert isinstance(context, SessionCachingSSLContext)
+    assert not context.check_hostname
+    assert context.verify_mode == ssl.CERT_NONE
+
+
+def test_session_caching_ssl_context_protocol():
+    """Test that session-caching SSL contexts default to the client protocol."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        context = SessionCachingSSLContext()
+    assert context.protocol == ssl.PROTOCOL_TLS_CLIENT
+    assert not context.sessions
+
+
+def test_session_not_stored():
+    """Test that sessions are only stored when there's somewhere to store them."""
+    context = create_legacy_ssl_context()
+    # Without a server hostname (and before any handshake), there's nothing to store:
+    sslobj = context.wrap_bio(ssl.MemoryBIO(), ssl.MemoryBIO())
+    sslobj._store_session()  # pylint: disable=protected-access
+    assert not context.sessions
+
+    # Contexts that don't cache sessions are left alone:
+    plain_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    plain_context.sslobject_class = ResumableSSLObject
+    sslobj = plain_context.wrap_bio(
+        ssl.MemoryBIO(), ssl.MemoryBIO(), server_hostname="localhost"
+    )
+    sslobj._store_session()  # pylint: disable=protected-access
+    assert not hasattr(plain_context, "sessions")
+
+
+def test_shared_ssl_context():
+    """Test that the legacy-compatible SSL context is shared by all clients."""
+    client_1 = Client()
+    client_2 = Client()
+    assert client_1.ssl_context is client_2.ssl_context
+    assert client_1.ssl_context is get_legacy_ssl_context()
+
+    custom_context = ssl.create_default_context()
+    client_3 = Client(ssl_context=custom_context)
+    assert client_3.ssl_context is custom_context
+    assert client_3.tls_handshakes == {"full": 0, "resumed": 0}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "maximum_version", [ssl.TLSVersion.TLSv1_2, ssl.TLSVersion.TLSv1_3]
+)
+async def test_tls_session_resumption(maximum_version):
+    """Test that reconnections to a host resume the cached TLS session."""
+    runner, url = await _start_tls_server(maximum_version)
+
+    try:
+        # Force a new connection (and handshake) for every request:
+        async with Client(
+            connection_policy=ConnectionPolicy(force_close=True),
+            ssl_context=create_legacy_ssl_context(),
+        ) as client:
+            for _ in range(3):
+                data = await client._request(  # pylint: disable=protected-access
+                    "get", url
+                )
+                assert data["apiVer"] == "4.5.0"
+
+            assert client.tls_handshakes == {"full": 1, "resumed": 2}
+    finally:
+        await runner.cleanup()
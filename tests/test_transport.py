@@ -0,0 +1,287 @@
+"""Define tests for transports."""
+# pylint: disable=protected-access
+import asyncio
+import gzip
+import json
+
+import aiohttp
+import pytest
+
+from regenmaschine import Client, transport as transport_module
+from regenmaschine.controller import LocalController, RemoteController
+from regenmaschine.errors import RequestError, RequestTimeoutError, TransientError
+from regenmaschine.middleware import Request, Response
+from regenmaschine.tls import get_legacy_ssl_context
+from regenmaschine.transport import (
+    AiohttpTransport,
+    HTTPXTransport,
+    InMemoryTransport,
+    Transport,
+)
+
+import tests.async_mock as mock
+from tests.common import (
+    TEST_EMAIL,
+    TEST_HOST,
+    TEST_MAC,
+    TEST_NAME,
+    TEST_PASSWORD,
+    TEST_PORT,
+    TEST_SPRINKLER_ID,
+    TEST_URL,
+    load_fixture,
+)
+
+
+def create_local_transport() -> InMemoryTransport:
+    """Return an in-memory transport that can load a local controller."""
+    transport = InMemoryTransport()
+    for method, path, fixture in (
+        ("post", "/api/4/auth/login", "auth_login_response.json"),
+        ("get", "/api/4/apiVer", "api_version_response.json"),
+        ("get", "/api/4/provision/name", "provision_name_response.json"),
+        ("get", "/api/4/provision/wifi", "provision_wifi_response.json"),
+    ):
+        transport.add_route(
+            method, path, lambda _, data=json.loads(load_fixture(fixture)): data
+        )
+    return transport
+
+
+def create_cloud_transport() -> InMemoryTransport:
+    """Return an in-memory transport that can load a remote controller."""
+    transport = InMemoryTransport()
+    for method, path, fixture in (
+        ("post", "/login/auth", "remote_auth_login_1_response.json"),
+        ("post", "/devices/get-sprinklers", "remote_sprinklers_response.json"),
+        ("post", "/devices/login-sprinkler", "remote_auth_login_2_response.json"),
+        ("get", f"/{TEST_SPRINKLER_ID}/api/4/apiVer", "api_version_response.json"),
+    ):
+        transport.add_route(
+            method, path, lambda _, data=json.loads(load_fixture(fixture)): data
+        )
+    return transport
+
+
+def test_default_transport():
+    """Test that requests are sent with aiohttp by default."""
+    client = Client()
+    assert isinstance(client.transport, AiohttpTransport)
+
+    transport = InMemoryTransport()
+    client = Client(transport=transport)
+    assert client.transport is transport
+    assert client.get_idle_close_window(TEST_HOST) is None
+    assert client.ssl_context is get_legacy_ssl_context()
+    assert client.tls_handshakes == {"full": 0, "resumed": 0}
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_transport_errors():
+    """Test the aiohttp transport's handling of unknown hosts and client errors."""
+    transport = AiohttpTransport()
+    assert transport.get_idle_close_window(TEST_HOST) is None
+    # Retiring the connections of a host without an owned session does nothing:
+    await transport._retire_connections(TEST_HOST)
+
+    session = mock.Mock()
+    session.request.side_effect = aiohttp.ClientResponseError(
+        mock.Mock(), (), status=400
+    )
+    with pytest.raises(RequestError) as err:
+        await transport._send_with_session(
+            session, Request("get", f"{TEST_URL}/api/4/apiVer", TEST_HOST, {})
+        )
+    assert not isinstance(err.value, TransientError)
+
+
+@pytest.mark.asyncio
+async def test_in_memory_transport():
+    """Test loading and using a controller over an in-memory transport."""
+    transport = create_local_transport()
+
+    async def _zone(request):
+        assert request.kwargs["params"]["access_token"]
+        return json.loads(load_fixture("zone_response.json"))
+
+    transport.add_route("get", "/api/4/zone", _zone)
+    transport.add_route(
+        "get",
+        "/api/4/program",
+        lambda request: Response(
+            200, request.url, None, body=load_fixture("program_response.json").encode()
+        ),
+        host=TEST_HOST,
+    )
+
+    async with Client(transport=transport) as client:
+        await client.load_local(TEST_HOST, TEST_PASSWORD, port=TEST_PORT)
+        controller = client.controllers[TEST_MAC]
+        assert controller.name == TEST_NAME
+
+        data = await controller.request("get", "zone")
+        assert len(data["zones"]) == 12
+
+        data = await controller.request("get", "program")
+        assert len(data["programs"]) == 2
+
+        # Requests without a route get a 404:
+        with pytest.raises(RequestError, match="404"):
+            await controller.request("get", "restrictions/global")
+
+
+@pytest.mark.asyncio
+async def test_in_memory_transport_errors():
+    """Test that responses from an in-memory transport are handled like any other."""
+    transport = create_local_transport()
+
+    async def _slow(_):
+        await asyncio.sleep(0.5)
+
+    transport.add_route("get", "/api/4/zone", _slow)
+    transport.add_route(
+        "get",
+        "/api/4/program",
+        lambda request: Response(200, request.url, None, body=b"<html></html>"),
+    )
+
+    client = Client(
+        transport=transport, endpoint_timeouts={"zone": 0.1}, request_timeout=10
+    )
+    await client.load_local(TEST_HOST, TEST_PASSWORD, port=TEST_PORT)
+    controller = client.controllers[TEST_MAC]
+
+    with pytest.raises(RequestTimeoutError):
+        await controller.request("get", "zone")
+    with pytest.raises(RequestError, match="Unable to parse response as JSON"):
+        await controller.request("get", "program")
+
+
+@pytest.mark.asyncio
+async def test_custom_transport():
+    """Test that the client dispatches requests (and closes) through a transport."""
+
+    class _Transport(Transport):
+        def __init__(self) -> None:
+            self.closed = False
+            self.requests: list[Request] = []
+
+        async def close(self) -> None:
+            self.closed = True
+
+        async def send(self, request: Request) -> Response:
+            self.requests.append(request)
+            return Response(503, request.url, None, {"Retry-After": "2"})
+
+    # Transports must implement send():
+    with pytest.raises(TypeError):
+        Transport()  # pylint: disable=abstract-class-instantiated
+
+    transport = _Transport()
+    async with Client(transport=transport) as client:
+        with pytest.raises(RequestError, match="503"):
+            await client._request("get", f"{TEST_URL}/api/4/apiVer")
+
+    assert transport.closed
+    assert [request.url for request in transport.requests] == [
+        f"{TEST_URL}/api/4/apiVer"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cloud_transport():
+    """Test that requests to the cloud are sent through the cloud transport."""
+    transport = create_local_transport()
+    cloud_transport = create_cloud_transport()
+
+    async with Client(transport=transport, cloud_transport=cloud_transport) as client:
+        assert client.get_transport("api.rainmachine.com") is cloud_transport
+        assert client.get_transport("my.rainmachine.com") is cloud_transport
+        assert client.get_transport(TEST_HOST) is transport
+
+        # Each transport only has routes for its own hosts:
+        await client.load_local(TEST_HOST, TEST_PASSWORD, port=TEST_PORT)
+        assert isinstance(client.controllers[TEST_MAC], LocalController)
+        await client.load_remote(TEST_EMAIL, TEST_PASSWORD, skip_existing=False)
+        assert isinstance(client.controllers[TEST_MAC], RemoteController)
+
+
+@pytest.mark.asyncio
+async def test_httpx_transport():
+    """Test sending requests with httpx."""
+    httpx = pytest.importorskip("httpx")
+
+    class _Stream(httpx.AsyncByteStream):
+        """Define a response stream (that httpx doesn't read up front)."""
+
+        def __init__(self, body):
+            self._body = body
+
+        async def __aiter__(self):
+            yield self._body
+
+    def _handler(request):
+        if request.url.path.endswith("/zone"):
+            raise httpx.ConnectError("Connection refused", request=request)
+        if request.url.path.endswith("/program"):
+            return httpx.Response(418, stream=_Stream(b""), request=request)
+        if request.url.path.endswith("/restrictions/global"):
+            raise httpx.DecodingError("Malformed response", request=request)
+        if request.method == "POST":
+            # Encoded bodies are sent as-is:
+            assert json.loads(request.content) == {"pwd": TEST_PASSWORD}
+            return httpx.Response(200, stream=_Stream(b"{}"), request=request)
+        assert request.url.params["access_token"] == "token"
+        assert request.headers["Accept-Encoding"] == "identity"
+        # The transport should hand over the raw (still compressed) body:
+        return httpx.Response(
+            200,
+            headers={"Content-Encoding": "gzip"},
+            stream=_Stream(
+                gzip.compress(load_fixture("api_version_response.json").encode())
+            ),
+            request=request,
+        )
+
+    httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+    async with Client(transport=HTTPXTransport(httpx_client)) as client:
+        data = await client._request(
+            "get", f"{TEST_URL}/api/4/apiVer", access_token="token"
+        )
+        assert data["apiVer"] == "4.5.0"
+        stats = client.get_transfer_stats(TEST_HOST)
+        assert stats.responses == 1
+        assert stats.decoded_bytes == len(load_fixture("api_version_response.json"))
+        assert stats.wire_bytes == len(
+            gzip.compress(load_fixture("api_version_response.json").encode())
+        )
+
+        with pytest.raises(TransientError):
+            await client._request("get", f"{TEST_URL}/api/4/zone")
+        with pytest.raises(RequestError, match='418, message="I\'m a teapot"'):
+            await client._request("get", f"{TEST_URL}/api/4/program")
+        with pytest.raises(RequestError) as err:
+            await client._request("get", f"{TEST_URL}/api/4/restrictions/global")
+        assert not isinstance(err.value, TransientError)
+
+        assert (
+            await client._request(
+                "post", f"{TEST_URL}/api/4/auth/login", json={"pwd": TEST_PASSWORD}
+            )
+            == {}
+        )
+
+    # The transport doesn't close a client it doesn't own:
+    assert not httpx_client.is_closed
+    await httpx_client.aclose()
+
+    transport = HTTPXTransport()
+    await transport.close()
+    assert transport._client.is_closed
+
+
+def test_httpx_transport_requires_httpx(monkeypatch):
+    """Test that the httpx transport can't be created without httpx."""
+    monkeypatch.setattr(transport_module, "httpx", None)
+    with pytest.raises(RuntimeError, match="requires httpx"):
+        HTTPXTransport()
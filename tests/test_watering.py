@@ -5,6 +5,7 @@ import aiohttp
 import pytest
 
 from regenmaschine import Client
+from regenmaschine.cache import HistoryCache
 
 from .common import TEST_HOST, TEST_PASSWORD, TEST_PORT, load_fixture
 
@@ -36,6 +37,42 @@ async def test_watering_log_details(aresponses, authenticated_local_client):
             assert len(data) == 2
 
 
+@pytest.mark.asyncio
+async def test_watering_without_range(aresponses, authenticated_local_client):
+    """Test getting the watering log and past runs without a date range."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/watering/log",
+            "get",
+            aresponses.Response(
+                text=load_fixture("watering_log_response.json"), status=200
+            ),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/watering/past",
+            "get",
+            aresponses.Response(
+                text=load_fixture("watering_past_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session, history_cache_factory=HistoryCache)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = next(iter(client.controllers.values()))
+
+            # Without a range, the history cache isn't involved:
+            assert len(await controller.watering.log()) == 2
+            assert len(await controller.watering.runs()) == 8
+            assert len(controller.history) == 0
+
+        authenticated_local_client.assert_no_unused_routes()
+
+
 @pytest.mark.asyncio
 async def test_watering_pause(aresponses, authenticated_local_client):
     """Test pausing and unpausing watering."""
@@ -147,3 +184,45 @@ async def test_watering_stop(aresponses, authenticated_local_client):
 
             data = await controller.watering.stop_all()
             assert data["message"] == "OK"
+
+
+@pytest.mark.asyncio
+async def test_watering_history_cache(aresponses, authenticated_local_client):
+    """Test that watering logs and runs for past days are cached."""
+    async with authenticated_local_client:
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/watering/log/details/2018-06-01/2",
+            "get",
+            aresponses.Response(
+                text=load_fixture("watering_log_response.json"), status=200
+            ),
+        )
+        authenticated_local_client.add(
+            f"{TEST_HOST}:{TEST_PORT}",
+            "/api/4/watering/past/2018-06-03/2",
+            "get",
+            aresponses.Response(
+                text=load_fixture("watering_past_response.json"), status=200
+            ),
+        )
+
+        async with aiohttp.ClientSession() as session:
+            client = Client(session=session, history_cache_factory=HistoryCache)
+            await client.load_local(
+                TEST_HOST, TEST_PASSWORD, port=TEST_PORT, use_ssl=False
+            )
+            controller = next(iter(client.controllers.values()))
+
+            for _ in range(2):
+                data = await controller.watering.log(
+                    datetime.date(2018, 6, 1), 2, details=True
+                )
+                assert [day["date"] for day in data] == ["2018-06-01", "2018-06-02"]
+
+                data = await controller.watering.runs(datetime.date(2018, 6, 3), 2)
+                assert len(data) == 8
+
+            assert controller.history.hits == 4
+
+        authenticated_local_client.assert_no_unused_routes()